@@ -0,0 +1,166 @@
+"""Tarama çıktısının güven kalibrasyonu ve uyum metrikleri (çevrimdışı, API çağrısı yok).
+
+Çıktı dosyası + isteğe bağlı insan etiketli alt küme. İnceleme politikası: güveni
+eşiğin altındaki ve Uncertain satırlar insana gider (insan kararı doğru sayılır),
+kalanlarda model kararı geçerlidir. Tüm eşikler sıralı dizide searchsorted ile
+tek geçişte hesaplanır.
+"""
+
+from __future__ import annotations
+
+import csv
+import itertools
+import sys
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List
+
+try:
+    import numpy as np
+except ImportError:
+    np = None  # type: ignore
+
+CALIBRATION_BINS = 10
+THRESHOLD_GRID = 101  # 0.00, 0.01, … 1.00
+MIN_LABELED_POSITIVES = 20  # altında eşik önerisi güvenilir sayılmaz
+DECISION_CODE = {"Exclude": 0, "Include": 1, "Uncertain": 2}
+LABEL_COLUMNS = ("etiket", "label", "human", "insan", "karar", "decision")
+# Uncertain/Maybe insan etiketi tam metne geçtiği için pozitif sayılır
+LABEL_VALUES = {
+    "include": 1, "dahil": 1, "yes": 1, "evet": 1, "1": 1, "true": 1,
+    "uncertain": 1, "maybe": 1, "belirsiz": 1,
+    "exclude": 0, "hariç": 0, "haric": 0, "no": 0, "hayır": 0, "hayir": 0, "0": 0, "false": 0,
+}
+
+
+@dataclass
+class DecisionArrays:
+    ids: List[str]
+    index: Dict[str, int]  # ID → satır
+    decision: Any    # int8: 0 Exclude, 1 Include, 2 Uncertain
+    confidence: Any  # float64 (0-1); güveni olmayan satır 0 → her eşikte incelenir
+    flagged: Any     # bool: modelin needs_human_review bayrağı
+
+
+def decision_arrays(ids: List[str], decisions: Iterable[str], confidence,
+                    flagged) -> DecisionArrays:
+    # Tekrarlanan ID'lerde ilk satır geçerlidir (read_prior_results ile aynı)
+    index: Dict[str, int] = {}
+    for i, x in enumerate(ids):
+        index.setdefault(x, i)
+    decision = np.fromiter((DECISION_CODE.get(d, 2) for d in decisions), dtype=np.int8, count=len(ids))
+    confidence = np.clip(np.nan_to_num(np.asarray(confidence, dtype=np.float64)), 0.0, 1.0)
+    flagged = np.asarray(flagged, dtype=bool)
+    if len(index) < len(ids):
+        keep = np.fromiter(index.values(), dtype=np.int64, count=len(index))
+        ids = [ids[i] for i in keep]
+        decision, confidence, flagged = decision[keep], confidence[keep], flagged[keep]
+        index = {x: i for i, x in enumerate(ids)}
+    return DecisionArrays(ids, index, decision, confidence, flagged)
+
+
+def _table_rows(path: Path) -> Iterator[List[Any]]:
+    if path.suffix.lower() in {".xlsx", ".xls"}:
+        try:
+            from openpyxl import load_workbook
+        except ImportError:
+            sys.exit("Excel okumak için openpyxl gerekli: pip install -r requirements.txt")
+        wb = load_workbook(path, read_only=True, data_only=True)
+        try:
+            yield from (list(row) for row in wb.worksheets[0].iter_rows(values_only=True))
+        finally:
+            wb.close()
+        return
+    with path.open(encoding="utf-8-sig", errors="replace", newline="") as f:
+        lines = (line for line in f if not line.startswith("#"))  # çıktı metadata satırları
+        first = next(lines, "")
+        yield from csv.reader(itertools.chain([first], lines),
+                              delimiter=max(("\t", ",", ";"), key=first.count))
+
+
+def read_labels(path: Path) -> Dict[str, int]:
+    # ID + etiket sütunu (Etiket / Label / Karar …); tanınmayan değerler atlanır
+    rows = _table_rows(path)
+    header = [str(c or "").strip().lower() for c in next(rows, None) or ()]
+    if "id" not in header:
+        sys.exit(f"❌ Etiket dosyasında 'ID' sütunu yok: {path}")
+    col = next((header.index(c) for c in LABEL_COLUMNS if c in header), None)
+    if col is None:
+        sys.exit(f"❌ Etiket sütunu bulunamadı ({' / '.join(LABEL_COLUMNS)}): {path}")
+    id_col = header.index("id")
+    labels = {}
+    for row in rows:
+        if max(id_col, col) >= len(row) or row[id_col] is None:
+            continue
+        value = LABEL_VALUES.get(str(row[col] or "").strip().casefold())
+        if value is not None:
+            labels[str(row[id_col]).strip()] = value
+    return labels
+
+
+def join_ids(ids: List[str], index: Dict[str, int]) -> tuple:
+    # (bu dizideki satırlar, karşı taraftaki satırlar) — ortak ID'ler
+    other = np.fromiter((index.get(x, -1) for x in ids), dtype=np.int64, count=len(ids))
+    mine = np.flatnonzero(other >= 0)
+    return mine, other[mine]
+
+
+def _count_at_least(values, grid):
+    # Eşik başına values >= t sayısı
+    s = np.sort(values)
+    return len(s) - np.searchsorted(s, grid, side="left")
+
+
+def calibration_curve(confidence, correct, bins: int = CALIBRATION_BINS) -> tuple:
+    # (bin başına n, ort. güven, doğruluk, ECE)
+    idx = np.minimum((confidence * bins).astype(np.int64), bins - 1)
+    n = np.bincount(idx, minlength=bins)
+    mean_conf = np.bincount(idx, confidence, bins) / np.maximum(n, 1)
+    accuracy = np.bincount(idx, correct, bins) / np.maximum(n, 1)
+    ece = float(np.abs(accuracy - mean_conf) @ n / max(1, n.sum()))
+    return n, mean_conf, accuracy, ece
+
+
+def review_curve(arr: DecisionArrays, rows, y, grid) -> Dict[str, Any]:
+    # Eşik başına: insan incelemesi oranı (tüm çıktı) ve politika recall/precision'ı
+    # (etiketli alt küme; incelenen satırlar doğru, kalanlarda model kararı)
+    auto = arr.decision != 2
+    workload = 1 - _count_at_least(arr.confidence[auto], grid) / max(1, len(auto))
+    d, c = arr.decision[rows], arr.confidence[rows]
+    positives = int(y.sum())
+    missed = _count_at_least(c[y & (d == 0)], grid)        # otomatik Exclude edilen Include'lar
+    false_inc = _count_at_least(c[~y & (d == 1)], grid)    # otomatik Include edilen Exclude'lar
+    auto_n = _count_at_least(c[d != 2], grid)
+    wrong = missed + false_inc
+    found = positives - missed
+    return {
+        "threshold": grid,
+        "workload": workload,
+        "recall": found / max(1, positives),
+        "precision": found / np.maximum(1, found + false_inc),
+        "auto_accuracy": 1 - wrong / np.maximum(1, auto_n),
+    }
+
+
+def wss_at(score, y, recall: float = 0.95) -> float:
+    # Work Saved over Sampling: skora göre sıralı okumada hedef recall'a ulaşınca
+    # okunmadan kalan oran − (1 − recall)
+    if not y.any():
+        return float("nan")
+    found = np.cumsum(y[np.argsort(-score, kind="stable")])
+    screened = int(np.searchsorted(found, np.ceil(recall * found[-1]))) + 1
+    return (len(y) - screened) / len(y) - (1 - recall)
+
+
+def cohen_kappa(a, b, k: int = 3) -> tuple:
+    m = np.bincount(a.astype(np.int64) * k + b, minlength=k * k).reshape(k, k)
+    n = max(1, m.sum())
+    po = np.trace(m) / n
+    pe = float(m.sum(axis=1) @ m.sum(axis=0)) / n ** 2
+    return (po - pe) / (1 - pe) if pe < 1 else 1.0, m
+
+
+def include_score(arr: DecisionArrays):
+    # Sıralama skoru: güvenli Include en üstte, Uncertain ortada, güvenli Exclude en altta
+    c = arr.confidence
+    return np.where(arr.decision == 1, 1 + c, np.where(arr.decision == 2, 1.0, 1 - c))
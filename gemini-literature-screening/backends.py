@@ -0,0 +1,612 @@
+"""Gemini API istemcisi ve backend katmanı (gemini | mock).
+
+ApiClient bağlantı havuzu ve retry'ı, Backend REST işlemlerini sağlar; MockBackend
+aynı istekleri ağa çıkmadan MockTransport üzerinde yanıtlar.
+"""
+
+from __future__ import annotations
+
+import collections
+import gzip
+import hashlib
+import itertools
+import json
+import math
+import random
+import re
+import threading
+import time
+import zlib
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from metrics import metrics
+from schema import DECISIONS, compact_api_result
+
+API_BASE = "https://generativelanguage.googleapis.com/v1beta"
+UPLOAD_BASE = "https://generativelanguage.googleapis.com/upload/v1beta"
+DOWNLOAD_CHUNK_BYTES = 1 << 20
+
+
+def estimate_tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+
+# ============================================================
+# HTTP CLIENT — bağlantı havuzu, gzip, jitter'lı retry
+# ============================================================
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+GZIP_MIN_BYTES = 4096
+
+
+class ApiClient:
+    """Tüm API çağrıları için ortak, keep-alive bağlantılı HTTP katmanı."""
+
+    def __init__(self, connect_timeout: float = 10.0, read_timeout: float = 180.0,
+                 retries: int = 5, backoff: float = 2.0, pool_size: int = 16,
+                 gzip_requests: bool = True, session: Any = None,
+                 retry_statuses: Iterable[int] = RETRY_STATUSES):
+        self.timeout = (connect_timeout, read_timeout)
+        self.retries = retries
+        self.backoff = backoff
+        self.retry_statuses = tuple(retry_statuses)
+        self.gzip_requests = gzip_requests
+        if session is not None:  # ör. MockTransport
+            self.session = session
+            return
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers["Accept-Encoding"] = "gzip, deflate"
+
+    def post(self, url: str, json_body: Any = None, **kwargs) -> requests.Response:
+        return self.request("POST", url, json_body=json_body, **kwargs)
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        return self.request("GET", url, **kwargs)
+
+    def request(self, method: str, url: str, json_body: Any = None, data: Any = None,
+                headers: Optional[Dict[str, str]] = None, timeout: Optional[float] = None,
+                stream: bool = False, retries: Optional[int] = None) -> requests.Response:
+        # Ağ hatası ve retry_statuses yanıtlarında exponential backoff + jitter ile
+        # tekrar dener (Retry-After varsa ona uyar); son yanıt çağırana döner.
+        headers = dict(headers or {})
+        if json_body is not None:
+            data = json.dumps(json_body, ensure_ascii=False).encode("utf-8")
+            headers["Content-Type"] = "application/json; charset=utf-8"
+            if self.gzip_requests and len(data) >= GZIP_MIN_BYTES:
+                data = gzip.compress(data, compresslevel=5)
+                headers["Content-Encoding"] = "gzip"
+        limit = self.retries if retries is None else retries
+        timeout = self.timeout if timeout is None else (self.timeout[0], timeout)
+
+        endpoint = _endpoint(url)
+        attempt = 0
+        while True:
+            if hasattr(data, "seek"):
+                data.seek(0)
+            t0 = time.perf_counter()
+            try:
+                resp = self.session.request(method, url, data=data, headers=headers,
+                                            timeout=timeout, stream=stream)
+            except requests.RequestException as e:
+                metrics().inc("http_network_errors_total")
+                metrics().event("request", endpoint=endpoint, status=0, attempt=attempt,
+                                seconds=round(time.perf_counter() - t0, 3), error=str(e)[:200])
+                if attempt >= limit:
+                    raise
+                wait = self._wait(attempt)
+                print(f"  ⏳ Ağ hatası: {e}, {wait:.1f}s sonra tekrar... ({attempt + 1}/{limit})")
+            else:
+                elapsed = time.perf_counter() - t0
+                metrics().observe("http_request_seconds", elapsed)
+                metrics().inc("http_responses_total", status=resp.status_code)
+                metrics().event("request", endpoint=endpoint, status=resp.status_code,
+                                attempt=attempt, seconds=round(elapsed, 3))
+                if resp.status_code not in self.retry_statuses or attempt >= limit:
+                    return resp
+                wait = self._wait(attempt, resp.headers.get("Retry-After"))
+                label = "Rate limit" if resp.status_code == 429 else "Sunucu hatası"
+                print(f"  ⏳ {label} ({resp.status_code}), {wait:.1f}s sonra tekrar... "
+                      f"({attempt + 1}/{limit})")
+                resp.close()
+            metrics().inc("http_retries_total")
+            time.sleep(wait)
+            attempt += 1
+
+    def _wait(self, attempt: int, retry_after: Optional[str] = None) -> float:
+        if retry_after:
+            try:
+                return float(retry_after)
+            except ValueError:
+                pass
+        # Full jitter: paralel isteklerin aynı anda tekrar denemesini önler
+        return min(60.0, self.backoff * 2 ** attempt) * random.uniform(0.5, 1.0)
+
+
+def _endpoint(url: str) -> str:
+    # Metriklerde API key / sorgu parametresi tutulmaz: "models/x:generateContent" gibi
+    path = url.split("?", 1)[0]
+    return path.split("/v1beta/", 1)[-1] if "/v1beta/" in path else path.rsplit("/", 2)[-2]
+
+
+_http: Optional[ApiClient] = None
+
+
+def http_client() -> ApiClient:
+    global _http
+    if _http is None:
+        _http = ApiClient()
+    return _http
+
+
+def configure_http(args) -> ApiClient:
+    global _http
+    _http = ApiClient(read_timeout=args.timeout, retries=args.http_retries,
+                      pool_size=max(16, args.concurrency * 2),
+                      gzip_requests=not args.no_gzip)
+    return _http
+
+
+# ============================================================
+# BACKENDS — API sağlayıcı katmanı (gemini | mock)
+# ============================================================
+class RateLimited(RuntimeError):
+    """429: kota aşıldı. retry_after saniye sonra tekrar denenebilir; daily ise günlük kota bitti."""
+
+    def __init__(self, message: str, retry_after: float = 0.0, daily: bool = False):
+        super().__init__(message)
+        self.retry_after = retry_after
+        self.daily = daily
+
+
+class ContextCacheGone(RuntimeError):
+    """İstekteki cachedContent artık yok (süresi dolmuş / silinmiş)."""
+
+
+# Backend çağrılarının beklenen hata türleri (HTTP hatası, 429, ağ / JSON hatası)
+BACKEND_ERRORS = (RuntimeError, requests.RequestException)
+
+
+class Backend(ABC):
+    """Tarama hattının kullandığı API işlemleri.
+
+    İstek/yanıt gövdeleri Gemini `generateContent` şeklindedir; başka bir
+    sağlayıcı bu sınıfı türetip gövdeleri kendi formatına çevirir.
+    """
+
+    name = ""
+
+    @abstractmethod
+    def generate_content(self, model_id: str, body: Dict[str, Any]) -> Dict[str, Any]:
+        """Tek bir generateContent isteği; yanıt gövdesini döner."""
+
+    @abstractmethod
+    def create_cached_content(self, body: Dict[str, Any]) -> Dict[str, Any]:
+        """Context cache oluşturur; `name` ve `usageMetadata` içeren gövdeyi döner."""
+
+    @abstractmethod
+    def upload_file(self, path: Path, display_name: str) -> str:
+        """Batch girdi dosyasını yükler; dosya adını döner."""
+
+    @abstractmethod
+    def create_batch(self, model_id: str, file_name: str, display_name: str) -> str:
+        """Yüklenmiş dosyadan batch job başlatır; job adını döner."""
+
+    @abstractmethod
+    def get_batch(self, job_name: str) -> Dict[str, Any]:
+        """Job durumunu döner."""
+
+    @abstractmethod
+    def cancel_batch(self, job_name: str) -> None:
+        """Job'ı iptal eder."""
+
+    @abstractmethod
+    def download_file(self, file_name: str, dest: Path) -> None:
+        """Çıktı dosyasını dest'e indirir (yarım kalan indirme kaldığı yerden sürer)."""
+
+
+class GeminiBackend(Backend):
+    """Gemini REST API (v1beta)."""
+
+    name = "gemini"
+
+    def __init__(self, api_key: str, client: Optional[ApiClient] = None):
+        self.api_key = api_key
+        self.client = client or http_client()
+
+    @staticmethod
+    def _url(path: str, base: str = API_BASE, query: str = "") -> str:
+        return f"{base}/{path}" + (f"?{query}" if query else "")
+
+    def _headers(self, extra: Optional[Dict[str, str]] = None) -> Dict[str, str]:
+        # Key URL'de değil header'da gider: hata mesajlarına / metrik dosyasına sızmaz
+        return {"x-goog-api-key": self.api_key, **(extra or {})}
+
+    @staticmethod
+    def _error(resp) -> str:
+        if resp.headers.get("Content-Type", "").startswith("application/json"):
+            try:
+                return resp.json().get("error", {}).get("message", resp.text)
+            except ValueError:
+                pass
+        return resp.text[:200]
+
+    @classmethod
+    def _rate_limited(cls, resp) -> RateLimited:
+        # Bekleme süresi Retry-After'dan ya da hata detayındaki RetryInfo'dan okunur;
+        # QuotaFailure'da "PerDay" kotası geçiyorsa anahtarın günlük kotası bitmiştir
+        retry_after, daily = 0.0, False
+        try:
+            retry_after = float(resp.headers.get("Retry-After") or 0)
+        except ValueError:
+            pass
+        try:
+            details = resp.json().get("error", {}).get("details", [])
+        except ValueError:
+            details = []
+        for d in details:
+            kind = d.get("@type", "")
+            if kind.endswith("RetryInfo") and not retry_after:
+                try:
+                    retry_after = float(str(d.get("retryDelay", "0")).rstrip("s") or 0)
+                except ValueError:
+                    pass
+            elif kind.endswith("QuotaFailure"):
+                daily = any("PerDay" in v.get("quotaId", "") for v in d.get("violations", []))
+        return RateLimited(f"API 429: {cls._error(resp)}", retry_after, daily)
+
+    def generate_content(self, model_id: str, body: Dict[str, Any]) -> Dict[str, Any]:
+        resp = self.client.post(self._url(f"models/{model_id}:generateContent"), body,
+                                headers=self._headers())
+        if resp.status_code == 429:
+            raise self._rate_limited(resp)
+        if resp.status_code in (403, 404) and body.get("cachedContent"):
+            # Süresi dolan / silinen cache NOT_FOUND ya da PERMISSION_DENIED döner
+            raise ContextCacheGone(f"API {resp.status_code}: {self._error(resp)}")
+        if not resp.ok:
+            raise RuntimeError(f"API {resp.status_code}: {self._error(resp)}")
+        return resp.json()
+
+    def create_cached_content(self, body: Dict[str, Any]) -> Dict[str, Any]:
+        resp = self.client.post(self._url("cachedContents"), body, headers=self._headers())
+        if not resp.ok:
+            raise RuntimeError(f"{resp.status_code}: {self._error(resp)}")
+        return resp.json()
+
+    def upload_file(self, path: Path, display_name: str) -> str:
+        # Resumable upload: önce oturum açılır, dosya akış olarak tek parçada gönderilir
+        size = path.stat().st_size
+        start = self.client.post(
+            self._url("files", UPLOAD_BASE),
+            {"file": {"display_name": display_name}},
+            headers=self._headers({
+                "X-Goog-Upload-Protocol": "resumable",
+                "X-Goog-Upload-Command": "start",
+                "X-Goog-Upload-Header-Content-Length": str(size),
+                "X-Goog-Upload-Header-Content-Type": "application/jsonl",
+            }),
+        )
+        upload_url = start.headers.get("x-goog-upload-url", "") if start.ok else ""
+        if not upload_url:
+            raise RuntimeError(f"File upload başlatılamadı ({start.status_code}): {start.text[:200]}")
+        with path.open("rb") as f:
+            resp = self.client.post(
+                upload_url,
+                headers={
+                    "Content-Length": str(size),
+                    "X-Goog-Upload-Offset": "0",
+                    "X-Goog-Upload-Command": "upload, finalize",
+                },
+                data=f,
+                timeout=600,
+            )
+        if not resp.ok:
+            raise RuntimeError(f"File upload {resp.status_code}: {resp.text[:200]}")
+        return resp.json()["file"]["name"]
+
+    def create_batch(self, model_id: str, file_name: str, display_name: str) -> str:
+        body = {"batch": {"display_name": display_name,
+                          "input_config": {"file_name": file_name}}}
+        resp = self.client.post(self._url(f"models/{model_id}:batchGenerateContent"), body,
+                                headers=self._headers())
+        if not resp.ok:
+            raise RuntimeError(f"Batch submit {resp.status_code}: {self._error(resp)}")
+        return resp.json()["name"]
+
+    def get_batch(self, job_name: str) -> Dict[str, Any]:
+        resp = self.client.get(self._url(job_name), headers=self._headers(), timeout=60)
+        if not resp.ok:
+            raise RuntimeError(f"Status {resp.status_code}: {self._error(resp)}")
+        return resp.json()
+
+    def cancel_batch(self, job_name: str) -> None:
+        resp = self.client.post(self._url(f"{job_name}:cancel"), headers=self._headers())
+        if not resp.ok:
+            raise RuntimeError(f"Batch cancel {resp.status_code}: {self._error(resp)}")
+
+    def download_file(self, file_name: str, dest: Path) -> None:
+        # Dosya parça parça diske yazılır; yarım kalan indirme Range ile kaldığı yerden sürer
+        have = dest.stat().st_size if dest.exists() else 0
+        url = self._url(f"{file_name}:download", query="alt=media")
+        headers = self._headers({"Range": f"bytes={have}-"} if have else None)
+        with self.client.get(url, headers=headers, stream=True, timeout=600) as resp:
+            if resp.status_code == 416:  # zaten tamamı inmiş
+                return
+            if not resp.ok:
+                raise RuntimeError(f"File fetch {resp.status_code}")
+            mode = "ab" if resp.status_code == 206 else "wb"
+            print(f"  → Output file indiriliyor: {file_name}"
+                  + (f" ({have:,} byte'tan devam)" if mode == "ab" else ""))
+            with dest.open(mode) as f:
+                for chunk in resp.iter_content(DOWNLOAD_CHUNK_BYTES):
+                    f.write(chunk)
+
+
+# ============================================================
+# MOCK BACKEND — ağsız, tekrarlanabilir yük / hata simülasyonu
+# ============================================================
+# Gemini uç noktalarını süreç içinde taklit eden sahte bir HTTP oturumu;
+# ApiClient'a verildiğinde retry, eşzamanlılık, paketleme ve resume kodu
+# gerçek API'dekiyle aynı yoldan çalışır. Hata kararları istek gövdesinin
+# hash'i + seed ile alındığından thread sırası sonucu değiştirmez.
+@dataclass
+class MockConfig:
+    latency: float = 0.0        # medyan yanıt süresi (saniye, lognormal)
+    sigma: float = 0.5          # lognormal yayılım
+    p429: float = 0.0           # isteğin 429 alma olasılığı
+    p503: float = 0.0           # isteğin 503 alma olasılığı
+    burst: int = 1              # hata seçilen istek kaç ardışık denemede hata alır
+    drop: float = 0.0           # yanıttan düşürülen makale oranı
+    malformed: float = 0.0      # yarım / bozuk JSON dönen yanıt oranı
+    batch_seconds: float = 0.0  # batch job'ın tamamlanma süresi
+    rpd: int = 0                # API key başına günlük generateContent kotası (0 = limitsiz)
+    retry_delay: float = 1.0    # 429 yanıtındaki RetryInfo bekleme süresi
+    seed: int = 0
+
+    @classmethod
+    def parse(cls, spec: str) -> "MockConfig":
+        # "latency=0.3,p429=0.05,burst=3,drop=0.01"
+        cfg = cls()
+        for part in filter(None, (p.strip() for p in (spec or "").split(","))):
+            key, _, value = part.partition("=")
+            if not hasattr(cfg, key):
+                raise ValueError(f"Bilinmeyen mock parametresi: {key}")
+            setattr(cfg, key, type(getattr(cfg, key))(value))
+        return cfg
+
+
+class _MockResponse:
+    def __init__(self, status: int, payload: Any = None, content: bytes = b"",
+                 headers: Optional[Dict[str, str]] = None):
+        self.status_code = status
+        self.ok = status < 400
+        self.headers = {"Content-Type": "application/json"} if payload is not None else {}
+        self.headers.update(headers or {})
+        self.content = json.dumps(payload).encode("utf-8") if payload is not None else content
+        self.text = self.content.decode("utf-8", errors="replace")
+
+    def json(self) -> Any:
+        return json.loads(self.content)
+
+    def iter_content(self, size: int) -> Iterator[bytes]:
+        for i in range(0, len(self.content), size):
+            yield self.content[i:i + size]
+
+    def close(self) -> None:
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc) -> None:
+        pass
+
+
+class MockTransport:
+    """Gemini REST uç noktalarını taklit eden sahte `requests.Session`."""
+
+    def __init__(self, config: MockConfig):
+        self.config = config
+        self.lock = threading.Lock()
+        self.files: Dict[str, bytes] = {}
+        self.jobs: Dict[str, Dict[str, Any]] = {}
+        self.attempts: collections.Counter = collections.Counter()
+        self.calls: collections.Counter = collections.Counter()  # uç nokta / durum sayacı
+        self.key_requests: collections.Counter = collections.Counter()  # API key başına istek
+        self.caches: set = set()  # oluşturulmuş context cache adları
+        self._ids = itertools.count(1)
+
+    def request(self, method: str, url: str, data: Any = None,
+                headers: Optional[Dict[str, str]] = None, timeout: Any = None,
+                stream: bool = False) -> _MockResponse:
+        headers = headers or {}
+        path = url.split("?", 1)[0]
+        if hasattr(data, "read"):
+            data = data.read()
+        if data and headers.get("Content-Encoding") == "gzip":
+            data = gzip.decompress(data)
+
+        if path.endswith(":generateContent"):
+            body = json.loads(data)
+            if body.get("cachedContent") and body["cachedContent"] not in self.caches:
+                return _MockResponse(403, {"error": {"message": "mock: CachedContent not found",
+                                                     "status": "PERMISSION_DENIED"}})
+            return self._generate(body, headers.get("x-goog-api-key", ""))
+        if path.endswith("/cachedContents"):
+            body = json.loads(data)
+            tokens = estimate_tokens(body["contents"][0]["parts"][0]["text"])
+            name = f"cachedContents/mock-{next(self._ids)}"
+            self.caches.add(name)
+            return self._ok("cachedContents", {"name": name,
+                                               "usageMetadata": {"totalTokenCount": tokens}})
+        if path.startswith(UPLOAD_BASE):
+            return self._ok("upload_start", {}, {"x-goog-upload-url": f"mock://upload/{next(self._ids)}"})
+        if path.startswith("mock://upload/"):
+            name = f"files/mock-in-{path.rsplit('/', 1)[1]}"
+            self.files[name] = data or b""
+            return self._ok("upload", {"file": {"name": name}})
+        if path.endswith(":batchGenerateContent"):
+            body = json.loads(data)["batch"]
+            name = f"batches/mock-{next(self._ids)}"
+            self.jobs[name] = {"input": body["input_config"]["file_name"],
+                               "ready_at": time.time() + self.config.batch_seconds}
+            return self._ok("batch_create", {"name": name})
+        if path.endswith(":cancel"):
+            job = self.jobs.get(path.split("/v1beta/", 1)[1][:-len(":cancel")])
+            if job is None:
+                return _MockResponse(404, {"error": {"message": f"mock: bilinmeyen job {path}"}})
+            job["cancelled"] = True
+            return self._ok("batch_cancel", {})
+        if path.endswith(":download"):
+            return self._download(path.split("/v1beta/", 1)[1][:-len(":download")], headers)
+        job_name = path.split("/v1beta/", 1)[-1]
+        if method == "GET" and job_name in self.jobs:
+            return self._batch_status(job_name)
+        return _MockResponse(404, {"error": {"message": f"mock: bilinmeyen uç nokta {path}"}})
+
+    def _ok(self, kind: str, payload: Any, headers: Optional[Dict[str, str]] = None) -> _MockResponse:
+        with self.lock:
+            self.calls[kind] += 1
+        return _MockResponse(200, payload, headers=headers)
+
+    def _rng(self, key: str) -> random.Random:
+        return random.Random(f"{self.config.seed}:{key}")
+
+    def _generate(self, body: Dict[str, Any], api_key: str = "") -> _MockResponse:
+        cfg = self.config
+        key = hashlib.sha256(json.dumps(body, sort_keys=True).encode("utf-8")).hexdigest()
+        with self.lock:
+            self.key_requests[api_key] += 1
+            over_quota = cfg.rpd and self.key_requests[api_key] > cfg.rpd
+            if over_quota:
+                self.calls["429"] += 1
+            else:
+                attempt = self.attempts[key]
+                self.attempts[key] += 1
+        if over_quota:
+            return self._rate_limited("GenerateRequestsPerDayPerProjectPerModel-FreeTier")
+        if cfg.latency > 0:
+            time.sleep(self._rng(f"{key}:{attempt}:latency").lognormvariate(
+                math.log(cfg.latency), cfg.sigma))
+
+        fault = self._rng(key).random()
+        if attempt < cfg.burst:
+            if fault < cfg.p429:
+                with self.lock:
+                    self.calls["429"] += 1
+                return self._rate_limited("GenerateRequestsPerMinutePerProjectPerModel-FreeTier")
+            if fault < cfg.p429 + cfg.p503:
+                with self.lock:
+                    self.calls["503"] += 1
+                return _MockResponse(503, {"error": {"message": "mock: Service unavailable"}})
+        return self._ok("generateContent", self._answer(body, f"{key}:{attempt}"))
+
+    def _rate_limited(self, quota_id: str) -> _MockResponse:
+        return _MockResponse(429, {"error": {
+            "message": "mock: Resource exhausted",
+            "details": [
+                {"@type": "type.googleapis.com/google.rpc.QuotaFailure",
+                 "violations": [{"quotaId": quota_id}]},
+                {"@type": "type.googleapis.com/google.rpc.RetryInfo",
+                 "retryDelay": f"{self.config.retry_delay:g}s"},
+            ]}})
+
+    def _answer(self, body: Dict[str, Any], key: str) -> Dict[str, Any]:
+        cfg = self.config
+        rng = self._rng(key)
+        prompt = body["contents"][0]["parts"][0]["text"]
+        ids = re.findall(r"^### id: (.*)$", prompt, re.M)
+        results = [_mock_result(i) for i in ids if rng.random() >= cfg.drop]
+        # Varsayılanın üstündeki sıcaklıklarda kararlar örnekleme gürültüsüyle değişir
+        noise = max(0.0, float((body.get("generationConfig") or {}).get("temperature", 0.2)) - 0.2) / 2
+        for r in results:
+            if rng.random() < noise:
+                r["decision"] = rng.choice(DECISIONS)
+                r["confidence"] = round(rng.uniform(0.4, 0.9), 2)
+                r["matched_inclusion_criteria"] = ["IC1"] if r["decision"] == "Include" else []
+                r["matched_exclusion_criteria"] = ["EC1"] if r["decision"] == "Exclude" else []
+        schema = (body.get("generationConfig") or {}).get("responseSchema")
+        if schema:
+            # İstenen şemanın anahtarları döner (kompakt / yalnız karar)
+            props = schema["properties"]["results"]["items"]["properties"]
+            if "d" in props:
+                results = [compact_api_result(r) for r in results]
+            results = [{k: v for k, v in r.items() if k in props} for r in results]
+        text = json.dumps({"results": results}, ensure_ascii=False)
+        if rng.random() < cfg.malformed:
+            text = text[:len(text) // 2]
+        cached = 0
+        if body.get("cachedContent"):
+            cached = 2048
+        return {
+            "candidates": [{"content": {"parts": [{"text": text}]}, "finishReason": "STOP"}],
+            "usageMetadata": {"promptTokenCount": estimate_tokens(prompt) + cached,
+                              "cachedContentTokenCount": cached,
+                              "candidatesTokenCount": estimate_tokens(text)},
+        }
+
+    def _batch_status(self, name: str) -> _MockResponse:
+        job = self.jobs[name]
+        if job.get("cancelled"):
+            return self._ok("batch_status", {"name": name, "metadata": {"state": "JOB_STATE_CANCELLED"}})
+        if time.time() < job["ready_at"]:
+            return self._ok("batch_status", {"name": name, "metadata": {"state": "JOB_STATE_RUNNING"}})
+        out_name = f"files/mock-out-{name.rsplit('-', 1)[1]}"
+        if out_name not in self.files:
+            lines = []
+            for raw in self.files[job["input"]].splitlines():
+                entry = json.loads(raw)
+                if self._rng(f"{name}:{entry['key']}").random() < self.config.drop:
+                    continue
+                response = self._answer(entry["request"], f"{name}:{entry['key']}:r")
+                lines.append(json.dumps({"key": entry["key"], "response": response},
+                                        ensure_ascii=False))
+            self.files[out_name] = ("\n".join(lines) + "\n").encode("utf-8")
+        return self._ok("batch_status", {"name": name,
+                                         "metadata": {"state": "JOB_STATE_SUCCEEDED"},
+                                         "response": {"responsesFile": out_name}})
+
+    def _download(self, name: str, headers: Dict[str, str]) -> _MockResponse:
+        content = self.files.get(name)
+        if content is None:
+            return _MockResponse(404, {"error": {"message": f"mock: dosya yok {name}"}})
+        start = int(headers.get("Range", "bytes=0-")[6:].rstrip("-") or 0)
+        if start >= len(content) and start:
+            return _MockResponse(416)
+        with self.lock:
+            self.calls["download"] += 1
+        return _MockResponse(206 if start else 200, content=content[start:])
+
+
+def _mock_result(article_id: str) -> Dict[str, Any]:
+    h = zlib.crc32(article_id.encode("utf-8"))
+    decision = ("Include", "Exclude", "Uncertain")[h % 3]
+    return {
+        "id": article_id,
+        "summary_tr": "Mock özet",
+        "decision": decision,
+        "confidence": round(0.5 + (h >> 4) % 50 / 100, 2),
+        "matched_inclusion_criteria": ["IC1"] if decision == "Include" else [],
+        "matched_exclusion_criteria": ["EC1"] if decision == "Exclude" else [],
+        "needs_human_review": decision == "Uncertain",
+        "rationale": "mock backend",
+    }
+
+
+class MockBackend(GeminiBackend):
+    """Ağ ve API key gerektirmeyen, MockTransport üzerinde çalışan backend."""
+
+    name = "mock"
+
+    def __init__(self, config: Optional[MockConfig] = None, api_key: str = "mock",
+                 transport: Optional[MockTransport] = None, **client_kwargs):
+        self.transport = transport or MockTransport(config or MockConfig())
+        client_kwargs.setdefault("backoff", 0.05)
+        super().__init__(api_key, ApiClient(session=self.transport, **client_kwargs))
@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+"""
+Gemini Literature Screening — yerel hot path benchmark'ı
+
+API çağrıları dışındaki aşamaları (okuma, prompt kurma, yanıt parse, sonuç
+birleştirme, state kaydetme, çıktı yazma) sentetik korpus üzerinde ölçer.
+Her aşama için süre ve tepe bellek raporlanır, JSON olarak kaydedilebilir ve
+önceki bir ölçüme (baseline) göre gerilemeler işaretlenir.
+
+Kullanım örneği:
+    python bench.py --sizes 20000,100000 --abstract-words 250 --json bench.json
+    python bench.py --sizes 20000 --baseline bench.json   # gerileme varsa çıkış kodu 1
+"""
+
+from __future__ import annotations
+
+import argparse
+import csv
+import gc
+import importlib.util
+import json
+import platform
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from dataclasses import asdict
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+
+import backends
+import cli
+
+STAGES = ("read_articles", "build_batch_prompt", "parse_model_response",
+          "merge_result", "save_state", "write_results_csv", "write_results_xlsx",
+          "write_results_parquet")
+NOISE_FLOOR_SEC = 0.05  # bunun altındaki farklar gerileme sayılmaz
+
+
+# ============================================================
+# SENTETİK KORPUS
+# ============================================================
+def make_vocabulary(size: int, rng: random.Random) -> List[str]:
+    letters = "abcçdefgğhıijklmnoöprsştuüvyz"
+    return ["".join(rng.choice(letters) for _ in range(rng.randint(3, 11))) for _ in range(size)]
+
+
+def write_corpus(path: Path, n: int, abstract_words: int, seed: int = 0) -> None:
+    # Zipf benzeri kelime dağılımı: gerçek özetlerdeki gibi az sayıda sık kelime
+    rng = random.Random(seed)
+    vocab = make_vocabulary(5000, rng)
+    weights = [1 / (i + 1) for i in range(len(vocab))]
+    with path.open("w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["ID", "Title", "Abstract", "Authors", "Year"])
+        for i in range(n):
+            words = rng.choices(vocab, weights, k=abstract_words + 10)
+            writer.writerow([
+                f"A{i:07d}",
+                " ".join(words[:10]).capitalize(),
+                " ".join(words[10:]),
+                f"Yazar {rng.randint(1, 5000)}; Yazar {rng.randint(1, 5000)}",
+                str(rng.randint(1990, 2025)),
+            ])
+
+
+def synthetic_response(articles: List[cli.Article]) -> str:
+    return json.dumps({"results": [backends._mock_result(a.ID) for a in articles]}, ensure_ascii=False)
+
+
+# ============================================================
+# ÖLÇÜM
+# ============================================================
+def measure(fn: Callable[[], Any], repeat: int, memory: bool) -> Dict[str, float]:
+    # Süre tracemalloc kapalıyken ölçülür (en iyi tekrar), tepe bellek ayrı bir koşuda
+    best = float("inf")
+    for _ in range(repeat):
+        gc.collect()
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    peak = 0.0
+    if memory:
+        gc.collect()
+        tracemalloc.start()
+        fn()
+        peak = tracemalloc.get_traced_memory()[1] / 1e6
+        tracemalloc.stop()
+    return {"seconds": round(best, 4), "peak_mb": round(peak, 2)}
+
+
+def run_size(n: int, args, workdir: Path) -> List[Dict[str, Any]]:
+    corpus = workdir / f"corpus_{n}.csv"
+    write_corpus(corpus, n, args.abstract_words, args.seed)
+    articles = cli.read_articles(corpus)
+    batches = [articles[i:i + args.batch_size] for i in range(0, n, args.batch_size)]
+    responses = [synthetic_response(b) for b in batches]
+    api_results = [r for text in responses for r in cli.parse_model_response(text)]
+    results = [cli.merge_result(a, r) for a, r in zip(articles, api_results)]
+    instructions = cli.build_instructions(
+        [{"code": "IC1", "text": "Randomize kontrollü çalışma"}],
+        [{"code": "EC1", "text": "Hayvan çalışması"}],
+    )
+    state = cli.State(model_id=args.model, mode="sync", file_hash="bench", total_count=n)
+
+    def save_all() -> None:
+        path = workdir / f"state_{n}.json"
+        store = cli.StateStore(path)
+        state.results = []
+        for batch_results in (results[i:i + args.batch_size] for i in range(0, n, args.batch_size)):
+            state.results.extend(asdict(r) for r in batch_results)
+            store.save(state)
+        store.delete()
+
+    def write(suffix: str) -> Callable[[], None]:
+        return lambda: cli.write_results(results, state, instructions, [], [],
+                                         workdir / f"out_{n}{suffix}")
+
+    stages: Dict[str, Callable[[], Any]] = {
+        "read_articles": lambda: cli.read_articles(corpus),
+        "build_batch_prompt": lambda: [cli.build_batch_prompt(b, instructions) for b in batches],
+        "parse_model_response": lambda: [cli.parse_model_response(t) for t in responses],
+        "merge_result": lambda: [cli.merge_result(a, r) for a, r in zip(articles, api_results)],
+        "save_state": save_all,
+        "write_results_csv": write(".csv"),
+        "write_results_xlsx": write(".xlsx"),
+        "write_results_parquet": write(".parquet"),
+    }
+    rows = []
+    for name in args.stages:
+        if name == "write_results_xlsx" and importlib.util.find_spec("openpyxl") is None:
+            continue
+        if name == "write_results_parquet" and importlib.util.find_spec("pyarrow") is None:
+            continue
+        m = measure(stages[name], args.repeat, not args.no_memory)
+        rows.append({"stage": name, "n": n, **m,
+                     "us_per_article": round(m["seconds"] / n * 1e6, 2)})
+        print(f"  {name:<22} n={n:<8,} {m['seconds']:>9.3f} s  {m['peak_mb']:>9.1f} MB")
+    return rows
+
+
+def compare(rows: List[Dict[str, Any]], baseline: Dict[str, Any],
+            threshold: float) -> List[str]:
+    base = {(r["stage"], r["n"]): r for r in baseline.get("results", [])}
+    regressions = []
+    print(f"\n{'Aşama':<22} {'n':>8} {'süre Δ':>10} {'bellek Δ':>10}")
+    for r in rows:
+        b = base.get((r["stage"], r["n"]))
+        if not b:
+            continue
+        dt = (r["seconds"] - b["seconds"]) / b["seconds"] if b["seconds"] else 0.0
+        measured = r["peak_mb"] > 0 and b.get("peak_mb", 0) > 0
+        dm = (r["peak_mb"] - b["peak_mb"]) / b["peak_mb"] if measured else 0.0
+        slow = dt > threshold and r["seconds"] - b["seconds"] > NOISE_FLOOR_SEC
+        fat = measured and dm > threshold
+        flag = "  ⚠️  GERİLEME" if slow or fat else ""
+        mem = f"{dm:>+10.1%}" if measured else f"{'—':>10}"
+        print(f"{r['stage']:<22} {r['n']:>8,} {dt:>+10.1%} {mem}{flag}")
+        if flag:
+            regressions.append(f"{r['stage']} (n={r['n']})")
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Screening pipeline yerel benchmark'ı")
+    parser.add_argument("--sizes", default="20000",
+                        help="Virgülle ayrılmış korpus boyutları (ör. 20000,100000,200000)")
+    parser.add_argument("--abstract-words", type=int, default=200,
+                        help="Özet başına kelime sayısı")
+    parser.add_argument("--batch-size", type=int, default=10,
+                        help="Prompt / state kaydı başına makale sayısı")
+    parser.add_argument("--stages", default=",".join(STAGES),
+                        help="Ölçülecek aşamalar (virgülle ayrılmış)")
+    parser.add_argument("--repeat", type=int, default=1,
+                        help="Süre ölçümünde tekrar sayısı (en iyisi alınır)")
+    parser.add_argument("--no-memory", action="store_true",
+                        help="tracemalloc ile tepe bellek ölçümünü atla")
+    parser.add_argument("--model", default="gemini-3.1-flash-lite-preview",
+                        choices=list(cli.MODELS.keys()))
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", type=Path, help="Sonuçları JSON olarak kaydet")
+    parser.add_argument("--baseline", type=Path, help="Karşılaştırılacak önceki JSON")
+    parser.add_argument("--threshold", type=float, default=0.20,
+                        help="Gerileme eşiği (göreli artış, 0.20 = %%20)")
+    args = parser.parse_args()
+    args.stages = [s.strip() for s in args.stages.split(",") if s.strip()]
+    unknown = set(args.stages) - set(STAGES)
+    if unknown:
+        parser.error(f"Bilinmeyen aşama: {', '.join(sorted(unknown))}")
+
+    sizes = [int(x) for x in args.sizes.split(",") if x.strip()]
+    rows: List[Dict[str, Any]] = []
+    with tempfile.TemporaryDirectory(prefix="screening-bench-") as tmp:
+        for n in sizes:
+            print(f"\n📚 n={n:,} makale, özet ~{args.abstract_words} kelime")
+            rows += run_size(n, args, Path(tmp))
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "abstract_words": args.abstract_words,
+            "batch_size": args.batch_size,
+            "repeat": args.repeat,
+        },
+        "results": rows,
+    }
+    if args.json:
+        args.json.write_text(json.dumps(report, indent=2, ensure_ascii=False), encoding="utf-8")
+        print(f"\n💾 Sonuçlar kaydedildi: {args.json}")
+
+    if args.baseline:
+        baseline = json.loads(args.baseline.read_text(encoding="utf-8"))
+        regressions = compare(rows, baseline, args.threshold)
+        if regressions:
+            print(f"\n❌ {len(regressions)} gerileme: {', '.join(regressions)}")
+            return 1
+        print("\n✅ Baseline'a göre gerileme yok")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
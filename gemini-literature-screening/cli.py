@@ -20,17 +20,28 @@ Kullanım örneği:
 from __future__ import annotations
 
 import argparse
+import atexit
+import collections
 import csv
+import functools
 import hashlib
+import importlib.util
+import itertools
 import json
+import math
 import os
 import re
+import sqlite3
 import sys
+import threading
 import time
-from dataclasses import asdict, dataclass, field
-from datetime import datetime, timezone
+import uuid
+import zoneinfo
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass, field, fields
+from datetime import datetime, timedelta, timezone
 from pathlib import Path
-from typing import Any, Dict, List, Optional
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
 
 import requests
 
@@ -39,6 +50,26 @@ try:
 except ImportError:
     pd = None  # type: ignore
 
+try:
+    import numpy as np
+except ImportError:
+    np = None  # type: ignore
+
+try:
+    import orjson
+except ImportError:
+    orjson = None  # type: ignore
+
+from analysis import (CALIBRATION_BINS, MIN_LABELED_POSITIVES, THRESHOLD_GRID, calibration_curve,
+                      cohen_kappa, decision_arrays, include_score, join_ids, read_labels,
+                      review_curve, wss_at)
+from backends import (BACKEND_ERRORS, RETRY_STATUSES, ApiClient, Backend, ContextCacheGone,
+                      GeminiBackend, MockBackend, MockConfig, MockTransport, RateLimited,
+                      configure_http, estimate_tokens, http_client)
+from metrics import configure_metrics, metrics
+from schema import (ARTICLE_FIELDS, COMPACT_DECISIONS, COMPACT_KEYS, DECISIONS, FREE_TEXT_FIELDS,
+                    NON_MODEL_FIELDS, compact_api_result, expand_compact)
+
 # ============================================================
 # MODEL CATALOG (USD / 1M token, ai.google.dev/gemini-api/docs/pricing)
 # ============================================================
@@ -47,6 +78,7 @@ MODELS: Dict[str, Dict[str, Any]] = {
         "label": "Gemini 3.1 Pro (Preview)",
         "standard": {"input": 2.00, "output": 12.00},
         "batch":    {"input": 1.00, "output": 6.00},
+        "cache":    {"input": 0.20, "storage_hour": 4.50, "min_tokens": 4096},
         "free_tier": False,
         "rpm": 0, "rpd": 0, "tpm": 0,
     },
@@ -54,6 +86,7 @@ MODELS: Dict[str, Dict[str, Any]] = {
         "label": "Gemini 3.1 Flash Lite (Preview)",
         "standard": {"input": 0.25, "output": 1.50},
         "batch":    {"input": 0.125, "output": 0.75},
+        "cache":    {"input": 0.025, "storage_hour": 1.00, "min_tokens": 1024},
         "free_tier": True,
         "rpm": 15, "rpd": 500, "tpm": 250_000,
     },
@@ -61,6 +94,7 @@ MODELS: Dict[str, Dict[str, Any]] = {
         "label": "Gemini 2.5 Flash",
         "standard": {"input": 0.30, "output": 2.50},
         "batch":    {"input": 0.15, "output": 1.25},
+        "cache":    {"input": 0.03, "storage_hour": 1.00, "min_tokens": 1024},
         "free_tier": True,
         "rpm": 5, "rpd": 20, "tpm": 250_000,
     },
@@ -68,12 +102,19 @@ MODELS: Dict[str, Dict[str, Any]] = {
         "label": "Gemini 2.5 Flash Lite",
         "standard": {"input": 0.10, "output": 0.40},
         "batch":    {"input": 0.05, "output": 0.20},
+        "cache":    {"input": 0.01, "storage_hour": 1.00, "min_tokens": 1024},
         "free_tier": True,
         "rpm": 10, "rpd": 20, "tpm": 250_000,
     },
 }
 
-API_BASE = "https://generativelanguage.googleapis.com/v1beta"
+SYNC_MAX_OUTPUT_TOKENS = 8192
+OUTPUT_TOKENS_PER_ARTICLE = 200  # summary_tr + rationale + alanlar, ortalama tahmin
+FIRST_PASS_MODEL = "gemini-2.5-flash-lite"  # iki geçişli taramada karar geçişi
+SECOND_PASS_SHARE = 0.3  # tahminde 2. geçişe kalacağı varsayılan makale oranı
+FIRST_PASS_TAG = "[1. geçiş"  # 1. geçişte kesinleşen satırların gerekçe öneki
+ENSEMBLE_TAG = "[Oylama"  # oylamayla kesinleşen satırların gerekçe öneki
+ENSEMBLE_SHARE = 0.3  # tahminde oylamaya gideceği varsayılan makale oranı
 
 # ============================================================
 # DATA CLASSES
@@ -100,11 +141,13 @@ class Result:
     matched_exclusion_criteria: List[str]
     needs_human_review: bool
     rationale: str
+    prompt_version: str = ""  # satırı üreten prompt (boş: bu çalışmanınki)
+    provenance: str = ""      # artımlı taramada önceki çıktıdan aktarılan satırın kaynağı
 
 @dataclass
 class State:
     model_id: str
-    mode: str  # sync | async
+    mode: str  # sync | async | hybrid
     file_hash: str
     total_count: int
     last_processed_batch_index: int = -1
@@ -112,48 +155,128 @@ class State:
     total_input_tokens: int = 0
     total_output_tokens: int = 0
     total_cost_usd: float = 0.0
-    batch_job_name: str = ""
+    batch_jobs: List[Dict[str, Any]] = field(default_factory=list)  # shard başına bir job
     batch_submitted_at: float = 0.0
-    batch_last_state: str = ""
     batch_key_map: Dict[str, Dict[str, Any]] = field(default_factory=dict)
     prompt_hash: str = ""
+    cache_hits: int = 0
+    cache_misses: int = 0
+    duplicate_count: int = 0
+    retry_queue: List[Dict[str, Any]] = field(default_factory=list)
+    retry_failed: int = 0
+    context_cache_name: str = ""
+    context_cache_tokens: int = 0
+    context_cache_expires: float = 0.0
+    total_cached_tokens: int = 0
+    compact_response: bool = False
+    screening_pass: int = 0  # 0: tek geçiş | 1: yalnız karar (ön tarama) | 2: ayrıntılı tarama
+    second_pass_model: str = ""
+    second_pass_threshold: float = 0.0
+    first_pass: Dict[str, Any] = field(default_factory=dict)  # kapanan 1. geçişin özeti
+    prefilter: Dict[str, Any] = field(default_factory=dict)  # BM25 ön eleme ayarları ve sayısı
+    key_pool: int = 0  # API key havuzundaki anahtar sayısı (0: tek key)
+    hybrid: Dict[str, Any] = field(default_factory=dict)  # hibrit mod planı (sync dilimi, hedef süre)
+    incremental: Dict[str, Any] = field(default_factory=dict)  # artımlı tarama özeti
+    fallback_requests: Dict[str, int] = field(default_factory=dict)  # havuzun yedek modele gönderdiği
+    ensemble: Dict[str, Any] = field(default_factory=dict)  # oylama ayarları (k, eşik, oylayanlar) ve özeti
+
+    @property
+    def decision_only(self) -> bool:
+        return self.screening_pass == 1
 
 # ============================================================
 # I/O HELPERS
 # ============================================================
+READ_CHUNK_ROWS = 5000
+
+
 def read_articles(path: Path) -> List[Article]:
+    return list(iter_articles(path))
+
+
+def iter_articles(path: Path, chunk_rows: int = READ_CHUNK_ROWS) -> Iterator[Article]:
     suffix = path.suffix.lower()
-    if suffix in {".xlsx", ".xls"}:
+    if suffix == ".xlsx":
+        return _iter_xlsx(path)
+    if suffix == ".xls":
         if pd is None:
             sys.exit("Excel okumak için pandas + openpyxl gerekli: pip install -r requirements.txt")
-        df = pd.read_excel(path, dtype=str).fillna("")
-    elif suffix in {".csv", ".tsv"}:
+        return _iter_frames([pd.read_excel(path, dtype=str)])
+    if suffix in {".csv", ".tsv"}:
         if pd is None:
             return _read_csv_stdlib(path)
         sep = "\t" if suffix == ".tsv" else _detect_delimiter(path)
-        df = pd.read_csv(path, dtype=str, sep=sep).fillna("")
-    else:
-        sys.exit(f"Desteklenmeyen dosya türü: {suffix}")
+        return _iter_frames(pd.read_csv(path, dtype=str, sep=sep, chunksize=chunk_rows))
+    sys.exit(f"Desteklenmeyen dosya türü: {suffix}")
+
 
-    cols = {c.lower().strip(): c for c in df.columns}
+def _resolve_columns(names: Iterable[str]) -> Dict[str, Optional[str]]:
+    cols = {str(c).lower().strip(): c for c in names if c is not None}
     if "title" not in cols or "abstract" not in cols:
         sys.exit("Dosya 'Title' ve 'Abstract' sütunlarını içermelidir!")
-    id_col = cols.get("id")
-    au_col = cols.get("authors") or cols.get("author")
-    yr_col = next((c for k, c in cols.items() if "year" in k), None)
-
-    articles = []
-    for i, row in df.iterrows():
-        a = Article(
-            ID=str(row[id_col]).strip() if id_col else str(i + 1),
-            Title=str(row[cols["title"]]).strip(),
-            Abstract=str(row[cols["abstract"]]).strip(),
-            Authors=str(row[au_col]).strip() if au_col else "",
-            Year=str(row[yr_col]).strip() if yr_col else "",
-        )
-        if a.Title or a.Abstract:
-            articles.append(a)
-    return articles
+    return {
+        "id": cols.get("id"),
+        "title": cols["title"],
+        "abstract": cols["abstract"],
+        "authors": cols.get("authors") or cols.get("author"),
+        "year": next((c for k, c in cols.items() if "year" in k), None),
+    }
+
+
+def _frame_column(df, name: Optional[str]) -> List[str]:
+    if not name:
+        return [""] * len(df)
+    return df[name].fillna("").astype(str).str.strip().tolist()
+
+
+def _iter_frames(frames) -> Iterator[Article]:
+    offset = 0
+    cols = None
+    for df in frames:
+        if cols is None:
+            cols = _resolve_columns(df.columns)
+        n = len(df)
+        ids = (_frame_column(df, cols["id"]) if cols["id"]
+               else [str(offset + i + 1) for i in range(n)])
+        values = [_frame_column(df, cols[k]) for k in ("title", "abstract", "authors", "year")]
+        for row in zip(ids, *values):
+            if row[1] or row[2]:
+                yield Article(*row)
+        offset += n
+
+
+def _iter_xlsx(path: Path) -> Iterator[Article]:
+    try:
+        from openpyxl import load_workbook
+    except ImportError:
+        sys.exit("Excel okumak için pandas + openpyxl gerekli: pip install -r requirements.txt")
+    wb = load_workbook(path, read_only=True, data_only=True)
+    try:
+        rows = wb.worksheets[0].iter_rows(values_only=True)
+        header = next(rows, None)
+        if not header:
+            return
+        cols = _resolve_columns(header)
+        index = {key: (header.index(c) if c is not None else None) for key, c in cols.items()}
+
+        def cell(row, key: str) -> str:
+            i = index[key]
+            if i is None or i >= len(row) or row[i] is None:
+                return ""
+            return str(row[i]).strip()
+
+        for n, row in enumerate(rows):
+            a = Article(
+                ID=cell(row, "id") if index["id"] is not None else str(n + 1),
+                Title=cell(row, "title"),
+                Abstract=cell(row, "abstract"),
+                Authors=cell(row, "authors"),
+                Year=cell(row, "year"),
+            )
+            if a.Title or a.Abstract:
+                yield a
+    finally:
+        wb.close()
 
 
 def _detect_delimiter(path: Path) -> str:
@@ -163,43 +286,62 @@ def _detect_delimiter(path: Path) -> str:
     return max(counts, key=counts.get)
 
 
-def _read_csv_stdlib(path: Path) -> List[Article]:
+def _read_csv_stdlib(path: Path) -> Iterator[Article]:
     delim = _detect_delimiter(path)
-    articles: List[Article] = []
     with path.open("r", encoding="utf-8-sig", errors="replace", newline="") as f:
         reader = csv.DictReader(f, delimiter=delim)
         if not reader.fieldnames:
-            return []
-        cols = {c.lower().strip(): c for c in reader.fieldnames}
-        if "title" not in cols or "abstract" not in cols:
-            sys.exit("Dosya 'Title' ve 'Abstract' sütunlarını içermelidir!")
-        id_col = cols.get("id")
-        au_col = cols.get("authors") or cols.get("author")
-        yr_col = next((c for k, c in cols.items() if "year" in k), None)
+            return
+        cols = _resolve_columns(reader.fieldnames)
         for i, row in enumerate(reader):
             a = Article(
-                ID=(row.get(id_col) or "").strip() if id_col else str(i + 1),
+                ID=(row.get(cols["id"]) or "").strip() if cols["id"] else str(i + 1),
                 Title=(row.get(cols["title"]) or "").strip(),
                 Abstract=(row.get(cols["abstract"]) or "").strip(),
-                Authors=(row.get(au_col) or "").strip() if au_col else "",
-                Year=(row.get(yr_col) or "").strip() if yr_col else "",
+                Authors=(row.get(cols["authors"]) or "").strip() if cols["authors"] else "",
+                Year=(row.get(cols["year"]) or "").strip() if cols["year"] else "",
             )
             if a.Title or a.Abstract:
-                articles.append(a)
-    return articles
+                yield a
+
+
+CSV_COLUMNS = ["ID", "Yazar(lar)", "Başlık", "Yıl", "Abstract (Orijinal)",
+               "Türkçe Özet", "Karar", "Güven", "IC", "EC",
+               "İnceleme", "Gerekçe", "Prompt Versiyon", "Kaynak"]
+EXCEL_COLUMNS = CSV_COLUMNS[:10] + ["İnceleme Gerekli"] + CSV_COLUMNS[11:]
+ARROW_SUFFIXES = {".parquet", ".arrow", ".feather"}
+ARROW_BATCH_ROWS = 50_000
 
 
 def write_results(results: List[Result], state: State, prompt_text: str,
-                  inclusion: List[Dict], exclusion: List[Dict], output: Path) -> None:
+                  inclusion: List[Dict], exclusion: List[Dict], output: Path,
+                  dedup: Optional[DedupResult] = None,
+                  source: Optional[Iterable[Article]] = None) -> None:
+    if dedup is not None and source is not None:
+        results = expand_duplicates(results, dedup, source)
     suffix = output.suffix.lower()
     if suffix in {".xlsx", ".xls"}:
-        if pd is None:
-            sys.exit("Excel yazmak için pandas + openpyxl gerekli")
         _write_excel(results, state, prompt_text, inclusion, exclusion, output)
+    elif suffix in ARROW_SUFFIXES:
+        _write_arrow(results, state, prompt_text, inclusion, exclusion, output)
     else:
         _write_csv(results, state, prompt_text, inclusion, exclusion, output)
 
 
+def _result_row(r: Result, prompt_hash: str) -> List[Any]:
+    return [
+        r.id, r.authors, r.title, r.year, r.abstract, r.summary_tr,
+        r.decision,
+        f"{r.confidence:.2f}" if r.confidence is not None else "",
+        ";".join(r.matched_inclusion_criteria),
+        ";".join(r.matched_exclusion_criteria),
+        "Yes" if r.needs_human_review else "No",
+        r.rationale,
+        r.prompt_version or prompt_hash,
+        r.provenance,
+    ]
+
+
 def _write_csv(results, state, prompt_text, inclusion, exclusion, output):
     meta = _build_metadata_rows(state, prompt_text, inclusion, exclusion)
     with output.open("w", encoding="utf-8-sig", newline="") as f:
@@ -207,47 +349,95 @@ def _write_csv(results, state, prompt_text, inclusion, exclusion, output):
             f.write(f"# {k}\t{str(v).replace(chr(10), ' ')}\n")
         f.write("#\n")
         writer = csv.writer(f)
-        writer.writerow(["ID", "Yazar(lar)", "Başlık", "Yıl", "Abstract (Orijinal)",
-                         "Türkçe Özet", "Karar", "Güven", "IC", "EC",
-                         "İnceleme", "Gerekçe", "Prompt Versiyon"])
-        for r in results:
-            writer.writerow([
-                r.id, r.authors, r.title, r.year, r.abstract, r.summary_tr,
-                r.decision,
-                f"{r.confidence:.2f}" if r.confidence is not None else "",
-                ";".join(r.matched_inclusion_criteria),
-                ";".join(r.matched_exclusion_criteria),
-                "Yes" if r.needs_human_review else "No",
-                r.rationale,
-                state.prompt_hash,
-            ])
+        writer.writerow(CSV_COLUMNS)
+        writer.writerows(_result_row(r, state.prompt_hash) for r in results)
 
 
 def _write_excel(results, state, prompt_text, inclusion, exclusion, output):
-    df = pd.DataFrame([{
-        "ID": r.id, "Yazar(lar)": r.authors, "Başlık": r.title, "Yıl": r.year,
-        "Abstract (Orijinal)": r.abstract, "Türkçe Özet": r.summary_tr,
-        "Karar": r.decision,
-        "Güven": f"{r.confidence:.2f}" if r.confidence is not None else "",
-        "IC": ";".join(r.matched_inclusion_criteria),
-        "EC": ";".join(r.matched_exclusion_criteria),
-        "İnceleme Gerekli": "Yes" if r.needs_human_review else "No",
-        "Gerekçe": r.rationale,
-        "Prompt Versiyon": state.prompt_hash,
-    } for r in results])
-
-    meta_rows = _build_metadata_rows(state, prompt_text, inclusion, exclusion)
-    meta_df = pd.DataFrame(meta_rows, columns=["Anahtar", "Değer"])
-
-    with pd.ExcelWriter(output, engine="openpyxl") as writer:
-        df.to_excel(writer, sheet_name="Screening", index=False)
-        meta_df.to_excel(writer, sheet_name="Metadata", index=False)
+    # write-only workbook: satırlar DataFrame kurulmadan doğrudan XML'e akıtılır
+    try:
+        from openpyxl import Workbook
+    except ImportError:
+        sys.exit("Excel yazmak için openpyxl gerekli: pip install -r requirements.txt")
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("Screening")
+    ws.append(EXCEL_COLUMNS)
+    for r in results:
+        ws.append(_result_row(r, state.prompt_hash))
+    meta = wb.create_sheet("Metadata")
+    meta.append(["Anahtar", "Değer"])
+    for row in _build_metadata_rows(state, prompt_text, inclusion, exclusion):
+        meta.append(row)
+    wb.save(output)
+
+
+def _write_arrow(results, state, prompt_text, inclusion, exclusion, output):
+    # Parquet / Arrow IPC (feather): tipli sütunlar, ARROW_BATCH_ROWS satırlık parçalar
+    # halinde yazılır. Metadata satırları şema metadata'sına JSON olarak gömülür.
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        sys.exit("Parquet/Arrow yazmak için pyarrow gerekli: pip install pyarrow")
+    schema = pa.schema([
+        ("id", pa.string()), ("authors", pa.string()), ("title", pa.string()),
+        ("year", pa.string()), ("abstract", pa.string()), ("summary_tr", pa.string()),
+        ("decision", pa.string()), ("confidence", pa.float64()),
+        ("matched_inclusion_criteria", pa.list_(pa.string())),
+        ("matched_exclusion_criteria", pa.list_(pa.string())),
+        ("needs_human_review", pa.bool_()), ("rationale", pa.string()),
+        ("prompt_version", pa.string()), ("provenance", pa.string()),
+    ]).with_metadata({"screening_metadata": json.dumps(
+        _build_metadata_rows(state, prompt_text, inclusion, exclusion), ensure_ascii=False,
+        default=str)})
+    if output.suffix.lower() == ".parquet":
+        writer = pq.ParquetWriter(str(output), schema, compression="zstd")
+    else:
+        writer = pa.ipc.new_file(str(output), schema)
+    try:
+        for chunk in _chunked(results, ARROW_BATCH_ROWS):
+            cols = [[getattr(r, f.name) for r in chunk] for f in fields(Result)]
+            cols[schema.get_field_index("prompt_version")] = [r.prompt_version or state.prompt_hash
+                                                               for r in chunk]
+            writer.write_batch(pa.RecordBatch.from_arrays(
+                [pa.array(c, type=f.type) for c, f in zip(cols, schema)], schema=schema))
+    finally:
+        writer.close()
+
+
+# ----- Kısmi çıktı: batch'ler tamamlandıkça sonuçlar CSV'ye eklenir
+def partial_output_path(output: Path) -> Path:
+    return output.with_name(f"{output.stem}.partial.csv")
+
+
+class PartialWriter:
+    """Çalışma sürerken state'e eklenen sonuçları `<çıktı>.partial.csv` dosyasına ekler."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.written: Optional[int] = None  # ilk kayıtta dosya baştan yazılır (resume)
+
+    def update(self, state: State) -> None:
+        if self.written is None or len(state.results) < self.written:
+            # Yeni çalışma / resume / iki geçiş arası: dosya mevcut sonuçlarla yeniden kurulur
+            with self.path.open("w", encoding="utf-8-sig", newline="") as f:
+                csv.writer(f).writerow(CSV_COLUMNS)
+            self.written = 0
+        new = state.results[self.written:]
+        if not new:
+            return
+        with self.path.open("a", encoding="utf-8", newline="") as f:
+            csv.writer(f).writerows(_result_row(Result(**r), state.prompt_hash) for r in new)
+        self.written = len(state.results)
+
+    def delete(self) -> None:
+        self.path.unlink(missing_ok=True)
 
 
 def _build_metadata_rows(state: State, prompt_text: str,
                          inclusion: List[Dict], exclusion: List[Dict]) -> List[List[Any]]:
     m = MODELS[state.model_id]
-    tier = "batch" if state.mode == "async" else "standard"
+    tier = {"async": "batch", "hybrid": "standard + batch"}.get(state.mode, "standard")
     rows = [
         ["Tarih (UTC)", datetime.now(timezone.utc).isoformat()],
         ["Model", state.model_id],
@@ -255,11 +445,83 @@ def _build_metadata_rows(state: State, prompt_text: str,
         ["Mod", state.mode],
         ["Tier", tier],
         ["Prompt versiyon (sha256[0:8])", state.prompt_hash],
-        ["Toplam makale", state.total_count],
+        ["Toplam makale", state.total_count + state.duplicate_count],
+    ]
+    if state.duplicate_count:
+        rows.append(["Tekrar (duplicate) makale", state.duplicate_count])
+    rows += [
         ["İşlenen makale", len(state.results)],
         ["Toplam input token", state.total_input_tokens],
         ["Toplam output token", state.total_output_tokens],
         ["Toplam maliyet (USD)", f"{state.total_cost_usd:.6f}"],
+    ]
+    fp = state.first_pass
+    if fp:
+        rows += [
+            ["Tarama", "iki geçişli (yalnız karar → ayrıntılı)"],
+            ["1. geçiş modeli", fp["model_id"]],
+            ["1. geçiş prompt versiyon", fp["prompt_hash"]],
+            ["1. geçiş token (input / output)", f"{fp['input_tokens']} / {fp['output_tokens']}"],
+            ["1. geçiş maliyeti (USD)", f"{fp['cost_usd']:.6f}"],
+            ["2. geçişe aktarılan makale", f"{fp['escalated']} / {fp['screened']}"],
+            ["2. geçiş eşiği (Exclude güveni)", state.second_pass_threshold],
+            ["2. geçiş maliyeti (USD)", f"{state.total_cost_usd - fp['cost_usd']:.6f}"],
+        ]
+    en = state.ensemble
+    if en:
+        rows += [
+            ["Oylama (örnek / güven eşiği / yöntem)",
+             f"{len(en['voters'])} / {en['threshold']} / {en['method']}"],
+            ["Oylayanlar (model@sıcaklık)", ", ".join(f"{m}@{t:g}" for m, t in en["voters"])],
+            ["Oylanan / kararı değişen", f"{en['voted']} / {en['changed']}"],
+            ["Oylama istekleri / maliyeti (USD)", f"{en['requests']} / {en['cost_usd']:.6f}"],
+        ]
+    if state.prefilter:
+        rows += [
+            ["Ön eleme (BM25, IC eşiği / sıralama)",
+             (f"{state.prefilter.get('threshold', 0)} / "
+              f"{'evet' if state.prefilter.get('sort') else 'hayır'}")],
+            ["Ön elemeyle Exclude", state.prefilter.get("excluded", 0)],
+        ]
+    inc = state.incremental
+    if inc:
+        rows += [
+            ["Artımlı tarama (önceki çıktı / prompt)", f"{inc['prior']} / {inc['prior_prompt'] or '?'}"],
+            ["Önceki çıktıdan aktarılan", inc["carried"]],
+            ["Yeniden tarama nedenleri",
+             ", ".join(f"{k}: {v}" for k, v in inc["rescreen"].items()) or "—"],
+            ["Ölçüt değişiklikleri", inc["criteria"]],
+        ]
+    if state.hybrid:
+        rows.append(["Hibrit (sync / batch / devralınan)",
+                     (f"{state.hybrid['sync_count']} / {len(state.batch_key_map)} / "
+                      f"{state.hybrid.get('taken_over', 0)}")])
+    if state.hybrid.get("deadline"):
+        rows.append(["Hedef bitiş (UTC)", datetime.fromtimestamp(
+            state.hybrid["deadline"], timezone.utc).isoformat(timespec="seconds")])
+    if state.key_pool:
+        rows.append(["API key havuzu", f"{state.key_pool} anahtar"])
+    if state.fallback_requests:
+        rows.append(["Yedek model istekleri",
+                     ", ".join(f"{k}: {v}" for k, v in state.fallback_requests.items())])
+    if state.cache_hits or state.cache_misses:
+        rows.append(["Cache hit / miss", f"{state.cache_hits} / {state.cache_misses}"])
+    if state.retry_queue or state.retry_failed:
+        rows.append(["Retry kuyruğu (bekleyen / başarısız)",
+                     f"{len(state.retry_queue)} / {state.retry_failed}"])
+    if state.context_cache_tokens or state.total_cached_tokens:
+        rows += [
+            ["Context cache", state.context_cache_name or "süresi doldu / silindi"],
+            ["Context cache token (talimat bloğu)", state.context_cache_tokens],
+            ["Cache'ten okunan input token", state.total_cached_tokens],
+        ]
+    if state.compact_response:
+        rows += [
+            ["Yanıt şeması", "kompakt"],
+            ["Makale başı output token (ort.)",
+             round(state.total_output_tokens / max(1, len(state.results)), 1)],
+        ]
+    rows += [
         ["Free Tier mevcut", "Evet" if m["free_tier"] else "Hayır"],
         ["", ""],
         ["Dahil etme kriterleri (IC):", ""],
@@ -267,10 +529,704 @@ def _build_metadata_rows(state: State, prompt_text: str,
     rows += [[c["code"], c["text"]] for c in inclusion]
     rows += [["", ""], ["Hariç tutma kriterleri (EC):", ""]]
     rows += [[c["code"], c["text"]] for c in exclusion]
+    if metrics().histograms["http_request_seconds"].count:
+        rows += [["", ""], ["Çalışma metrikleri (bu oturum):", ""]]
+        rows += metrics().summary()
     rows += [["", ""], ["Sistem promptu:", ""], ["", prompt_text]]
     return rows
 
 
+# ============================================================
+# DEDUPLICATION — exact (DOI / title+yıl+yazar) + near-duplicate (MinHash/LSH)
+# ============================================================
+DOI_RE = re.compile(r"10\.\d{4,9}/\S+", re.IGNORECASE)
+MINHASH_PERMS = 64
+LSH_BANDS = 16
+MIN_SHINGLE_TOKENS = 8
+EXACT_ABSTRACT_TOKENS = 20  # yazar yoksa birebir eşleşmede kullanılan özet başı
+
+
+@dataclass
+class DedupResult:
+    member_index: Dict[int, int] = field(default_factory=dict)   # girdi sırası → temsilci sırası
+    rep_ids: Dict[int, str] = field(default_factory=dict)        # temsilci sırası → ID
+
+    @property
+    def count(self) -> int:
+        return len(self.member_index)
+
+
+_PUNCT_TABLE = str.maketrans({c: " " for c in "!\"#$%&'()*+,-./:;<=>?@[\\]^_`{|}~“”‘’«»–—…·"})
+
+
+def _tokens(text: str) -> List[str]:
+    return text.lower().translate(_PUNCT_TABLE).split()
+
+
+def _exact_keys(a: Article) -> List[str]:
+    keys = []
+    m = DOI_RE.search(a.ID)
+    if m:
+        keys.append("doi:" + m.group(0).lower().rstrip(".,;"))
+    # Başlık tek başına yetmez ("Editorial", "Reply to …" gibi genel başlıklar çakışır):
+    # yıl + ilk yazar (yoksa özet başı) da eşleşmeli; yalnız başlık benzerliği MinHash'e kalır
+    title = " ".join(_tokens(a.Title))
+    author = _tokens(a.Authors)[:1]
+    detail = author[0] if author else " ".join(_tokens(a.Abstract)[:EXACT_ABSTRACT_TOKENS])
+    if len(title) >= 20 and a.Year.strip() and detail:
+        keys.append(f"title:{title}|{a.Year.strip()}|{detail}")
+    return keys
+
+
+class _UnionFind:
+    def __init__(self):
+        self.parent: Dict[int, int] = {}
+
+    def find(self, x: int) -> int:
+        root = x
+        while self.parent.get(root, root) != root:
+            root = self.parent[root]
+        while x != root:
+            self.parent[x], x = root, self.parent.get(x, x)
+        return root
+
+    def union(self, a: int, b: int) -> None:
+        ra, rb = self.find(a), self.find(b)
+        if ra != rb:
+            # Temsilci her zaman girdide önce gelen makaledir
+            self.parent[max(ra, rb)] = min(ra, rb)
+
+
+def _minhash_signatures(token_ids: List[Any]) -> Any:
+    # One-permutation MinHash: her kelime 3-gram'ı tek kez hash'lenir, hash'in üst bitleri
+    # MINHASH_PERMS kovadan birini seçer, kova başına minimum tutulur (O(n), k permütasyon yerine).
+    # Boş kovalar sağdaki ilk dolu kovadan doldurulur (rotation densification).
+    with np.errstate(over="ignore"):
+        shingles = [(t[:-2] * np.uint64(0x9E3779B97F4A7C15))
+                    ^ (t[1:-1] * np.uint64(0xC2B2AE3D27D4EB4F)) ^ t[2:] for t in token_ids]
+        lengths = np.fromiter((len(sh) for sh in shingles), dtype=np.int64, count=len(shingles))
+        h = np.concatenate(shingles) * np.uint64(0xFF51AFD7ED558CCD)
+        h ^= h >> np.uint64(33)
+        h *= np.uint64(0xC4CEB9FE1A85EC53)
+        h ^= h >> np.uint64(29)
+    bits = MINHASH_PERMS.bit_length() - 1
+    bins = (h >> np.uint64(64 - bits)).astype(np.int64)
+    owner = np.repeat(np.arange(len(shingles), dtype=np.int64), lengths)
+    sigs = np.full(len(shingles) * MINHASH_PERMS, np.iinfo(np.uint32).max, dtype=np.uint32)
+    np.minimum.at(sigs, owner * MINHASH_PERMS + bins, (h & np.uint64(0xFFFFFFFF)).astype(np.uint32))
+    sigs = sigs.reshape(len(shingles), MINHASH_PERMS)
+
+    empty = sigs == np.iinfo(np.uint32).max
+    filled = sigs.copy()
+    step = 0
+    while empty.any() and step < MINHASH_PERMS:
+        step += 1
+        shifted = np.roll(sigs, -step, axis=1)
+        take = empty & (shifted != np.iinfo(np.uint32).max)
+        filled[take] = shifted[take] ^ np.uint32(step * 0x9E3779B1 & 0xFFFFFFFF)
+        empty &= ~take
+    return filled
+
+
+def _lsh_candidates(sigs: Any, threshold: float) -> Iterator[tuple]:
+    rows = MINHASH_PERMS // LSH_BANDS
+    for band in range(LSH_BANDS):
+        # Aynı band'ı paylaşanlar aday çift; tüm imza benzerliği ile doğrulanır
+        keys = np.ascontiguousarray(sigs[:, band * rows:(band + 1) * rows]).view(
+            np.dtype((np.void, 4 * rows))).ravel()
+        order = np.argsort(keys, kind="stable")
+        sorted_keys = keys[order]
+        starts = np.flatnonzero(np.r_[True, sorted_keys[1:] != sorted_keys[:-1]])
+        ends = np.r_[starts[1:], len(order)]
+        for st, en in zip(starts[ends - starts > 1], ends[ends - starts > 1]):
+            group = order[st:en]
+            sim = (sigs[group[1:]] == sigs[group[0]]).mean(axis=1)
+            for g in group[1:][sim >= threshold]:
+                yield int(group[0]), int(g)
+
+
+def find_duplicates(articles: Iterable[Article], threshold: float = 0.85) -> DedupResult:
+    uf = _UnionFind()
+    seen_keys: Dict[str, int] = {}
+    ids: List[str] = []
+    vocab: Dict[str, int] = collections.defaultdict(itertools.count().__next__)
+    near_idx: List[int] = []
+    pending: List[Any] = []
+    sig_chunks = []
+
+    for i, a in enumerate(articles):
+        ids.append(a.ID)
+        for key in _exact_keys(a):
+            if key in seen_keys:
+                uf.union(seen_keys[key], i)
+            else:
+                seen_keys[key] = i
+        if np is None:
+            continue
+        tokens = _tokens(a.Title + " " + a.Abstract)
+        if len(tokens) >= MIN_SHINGLE_TOKENS:
+            near_idx.append(i)
+            pending.append(np.fromiter(map(vocab.__getitem__, tokens), dtype=np.uint64,
+                                       count=len(tokens)))
+            if len(pending) >= 2000:
+                sig_chunks.append(_minhash_signatures(pending))
+                pending = []
+
+    if np is None:
+        print("⚠️  numpy bulunamadı: sadece birebir (DOI / başlık+yıl+yazar) tekrar tespiti yapıldı", file=sys.stderr)
+    else:
+        if pending:
+            sig_chunks.append(_minhash_signatures(pending))
+        if len(near_idx) > 1:
+            sigs = np.concatenate(sig_chunks)
+            for x, y in _lsh_candidates(sigs, threshold):
+                uf.union(near_idx[x], near_idx[y])
+
+    result = DedupResult()
+    for i in list(uf.parent):
+        root = uf.find(i)
+        if root != i:
+            result.member_index[i] = root
+            result.rep_ids[root] = ids[root]
+    return result
+
+
+def iter_unique(articles: Iterable[Article], dedup: Optional[DedupResult]) -> Iterator[Article]:
+    for i, a in enumerate(articles):
+        if dedup is None or i not in dedup.member_index:
+            yield a
+
+
+def expand_duplicates(results: List[Result], dedup: Optional[DedupResult],
+                      source: Iterable[Article]) -> List[Result]:
+    # Temsilcinin sonucu kümedeki her tekrar makaleye kendi bibliyografik alanlarıyla kopyalanır
+    if not dedup or not dedup.count:
+        return results
+    by_id = {r.id: r for r in results}
+    expanded = list(results)
+    for i, article in enumerate(source):
+        rep = dedup.member_index.get(i)
+        if rep is None:
+            continue
+        rep_id = dedup.rep_ids[rep]
+        src = by_id.get(rep_id)
+        if src is None:
+            continue
+        expanded.append(Result(**{
+            **asdict(src),
+            "id": article.ID, "authors": article.Authors, "title": article.Title,
+            "year": article.Year, "abstract": article.Abstract,
+            "rationale": f"[Tekrar → {rep_id}] {src.rationale}",
+        }))
+    return expanded
+
+
+# ============================================================
+# PRE-FILTER — yerel BM25 ön eleme (IC/EC benzerliği, API çağrısı yok)
+# ============================================================
+BM25_K1 = 1.2
+BM25_B = 0.75
+STEM_CHARS = 5  # kaba kök: ilk 5 harf (Türkçe ekler ve İngilizce çoğullar birleşir)
+PREFILTER_TAG = "[Ön eleme · BM25]"
+STOPWORDS = frozenset("""
+    a an and are as at be by for from in is it of on or that the to with without
+    must should not only all any
+    ve veya ile ya da de ki bir bu şu için olan olarak olmalı olmayan içeren tüm her gibi
+""".split())
+
+
+@dataclass
+class PrefilterResult:
+    ids: List[str] = field(default_factory=list)          # satır → ID (girdi sırası)
+    index: Dict[str, int] = field(default_factory=dict)  # ID → satır
+    ic: Any = None  # makale başına en yüksek IC benzerliği (0-1)
+    ec: Any = None  # makale başına en yüksek EC benzerliği (0-1)
+    best_ec: Any = None  # en yüksek benzerlikteki EC sırası
+
+    def ic_score(self, article_id: str) -> float:
+        return float(self.ic[self.index[article_id]])
+
+    def below(self, threshold: float) -> set:
+        return {self.ids[i] for i in np.flatnonzero(self.ic < threshold)}
+
+
+def _stems(text: str) -> List[str]:
+    return [t[:STEM_CHARS] for t in _tokens(text) if len(t) > 1 and t not in STOPWORDS]
+
+
+def _term_column(word: str, terms: Dict[str, int]) -> int:
+    # Kök kelimenin ilk STEM_CHARS harfidir; daha kısa kökler yalnız kelimenin kendisiyle eşleşir
+    if len(word) < 2 or word in STOPWORDS:
+        return -1
+    if len(word) < STEM_CHARS:
+        return terms.get(word, -1)
+    return terms.get(word[:STEM_CHARS], -1)
+
+
+def score_articles(articles: Iterable[Article], inclusion: List[Dict],
+                   exclusion: List[Dict]) -> Optional[PrefilterResult]:
+    # Her ölçüt bir BM25 sorgusudur. Skor, ölçütün tüm terimlerini ortalama uzunlukta
+    # bir makalede birer kez içeren "ideal" skora bölünür: IDF ağırlıklı terim kapsamı,
+    # 0-1 aralığında ve eşik olarak yorumlanabilir.
+    if np is None:
+        print("⚠️  numpy bulunamadı: ön eleme (BM25) atlandı", file=sys.stderr)
+        return None
+    criteria = inclusion + exclusion
+    terms: Dict[str, int] = {}
+    crit_cols = [{terms.setdefault(t, len(terms)) for t in _stems(c["text"])} for c in criteria]
+    if not terms:
+        return None
+    # Kelimeler global id'ye çevrilir; id → ölçüt terimi sütunu tablosu (lut) yalnız yeni
+    # kelimeler için genişletilir, tf matrisi parça başına tek np.add.at ile dolar.
+    vocab: Dict[str, int] = collections.defaultdict(itertools.count().__next__)
+    lut = np.empty(0, dtype=np.int64)        # kelime id → terim sütunu (-1: yok)
+    content = np.empty(0, dtype=np.float32)  # kelime id → stopword değilse 1
+    result = PrefilterResult()
+    tf_chunks, len_chunks = [], []
+    for chunk in _chunked(articles, 10_000):
+        token_ids = []
+        for a in chunk:
+            result.index[a.ID] = len(result.ids)
+            result.ids.append(a.ID)
+            tokens = _tokens(a.Title + " " + a.Abstract)
+            token_ids.append(np.fromiter(map(vocab.__getitem__, tokens), dtype=np.int64,
+                                         count=len(tokens)))
+        if len(vocab) > len(lut):
+            new_words = list(vocab)[len(lut):]
+            lut = np.concatenate([lut, np.fromiter(
+                (_term_column(w, terms) for w in new_words), dtype=np.int64, count=len(new_words))])
+            content = np.concatenate([content, np.fromiter(
+                (len(w) > 1 and w not in STOPWORDS for w in new_words), dtype=np.float32,
+                count=len(new_words))])
+        ids = np.concatenate(token_ids) if token_ids else np.empty(0, dtype=np.int64)
+        owner = np.repeat(np.arange(len(chunk)), [len(t) for t in token_ids])
+        cols = lut[ids]
+        hit = cols >= 0
+        tf = np.zeros((len(chunk), len(terms)), dtype=np.float32)
+        np.add.at(tf, (owner[hit], cols[hit]), 1)
+        tf_chunks.append(tf)
+        len_chunks.append(np.bincount(owner, weights=content[ids], minlength=len(chunk)))
+    if not tf_chunks:
+        return result
+
+    dl = np.concatenate(len_chunks).astype(np.float32)
+    n = len(dl)
+    df = sum((chunk > 0).sum(axis=0) for chunk in tf_chunks)
+    # Korpusta hiç geçmeyen ölçüt terimi ayırt edici değildir; ideal skoru şişirmesin
+    idf = np.where(df > 0, np.log1p((n - df + 0.5) / (df + 0.5)), 0).astype(np.float32)
+    incidence = np.zeros((len(terms), len(criteria)), dtype=np.float32)
+    for j, cols in enumerate(crit_cols):
+        incidence[list(cols), j] = 1.0
+    ideal = np.maximum(idf @ incidence, 1e-6)
+    norm = BM25_K1 * (1 - BM25_B + BM25_B * dl / max(float(dl.mean()), 1.0))
+
+    scores = np.empty((n, len(criteria)), dtype=np.float32)
+    start = 0
+    for tf in tf_chunks:
+        end = start + len(tf)
+        w = tf * (BM25_K1 + 1) / (tf + norm[start:end, None]) * idf
+        scores[start:end] = np.minimum(w @ incidence / ideal, 1.0)
+        start = end
+    k = len(inclusion)
+    result.ic = scores[:, :k].max(axis=1) if k else np.ones(n, dtype=np.float32)
+    result.ec = scores[:, k:].max(axis=1) if exclusion else np.zeros(n, dtype=np.float32)
+    result.best_ec = scores[:, k:].argmax(axis=1) if exclusion else np.zeros(n, dtype=np.int64)
+    return result
+
+
+def order_by_relevance(articles: Iterable[Article], prefilter: PrefilterResult) -> Iterator[Article]:
+    # Kuyruk IC benzerliğine göre azalan sıralanır (girdi belleğe alınır)
+    return iter(sorted(articles, key=lambda a: -prefilter.ic_score(a.ID)))
+
+
+def apply_prefilter(state: State, articles: Iterable[Article], prefilter: PrefilterResult,
+                    threshold: float, exclusion: List[Dict]) -> int:
+    # Eşiğin altındaki makaleler API'ye gitmeden Exclude sonucu olarak state'e yazılır;
+    # run_sync / prepare_batch_shards onları "işlenmiş" sayıp atlar.
+    count = 0
+    for a in articles:
+        i = prefilter.index[a.ID]
+        score = float(prefilter.ic[i])
+        if score >= threshold:
+            continue
+        ec = [exclusion[int(prefilter.best_ec[i])]["code"]] if prefilter.ec[i] > 0 else []
+        state.results.append(asdict(Result(
+            id=a.ID, authors=a.Authors, title=a.Title, year=a.Year, abstract=a.Abstract,
+            summary_tr="", decision="Exclude", confidence=None,
+            matched_inclusion_criteria=[], matched_exclusion_criteria=ec,
+            needs_human_review=False,
+            rationale=f"{PREFILTER_TAG} IC benzerliği {score:.2f} < eşik {threshold:.2f}",
+        )))
+        count += 1
+    state.prefilter["excluded"] = count
+    return count
+
+
+def print_prefilter_summary(prefilter: PrefilterResult, threshold: float) -> None:
+    q = np.quantile(prefilter.ic, [0.1, 0.25, 0.5, 0.75, 0.9]) if len(prefilter.ic) else []
+    print("🔎 Ön eleme (BM25) IC benzerliği: "
+          + " | ".join(f"p{p} {v:.2f}" for p, v in zip((10, 25, 50, 75, 90), q)))
+    if threshold:
+        below = int((prefilter.ic < threshold).sum())
+        print(f"   Eşik {threshold:.2f} altı: {below:,} makale API'ye gönderilmeden Exclude")
+        if below > 0.9 * len(prefilter.ic):
+            print("   ⚠️  Makalelerin %90'ından fazlası eşiğin altında — ölçütler özetlerle "
+                  "aynı dilde mi? (--estimate-only ile eşiği deneyin)")
+
+
+# ============================================================
+# INCREMENTAL — önceki çıktıya göre yalnız etkilenen makaleleri yeniden tara
+# ============================================================
+# Önceki çıktı (CSV / XLSX / Parquet / Arrow) ve Metadata'sındaki IC/EC metinleri
+# okunur. Makale ID + içerik hash'i ve ölçüt metinleri karşılaştırılır; kararı
+# değişiklikten etkilenemeyecek satırlar kodları yeni numaralara çevrilerek aktarılır.
+CARRIED_TAG = "aktarıldı"  # provenance öneki
+CRITERION_CODE_RE = re.compile(r"^(IC|EC)\d+$")
+PRIOR_PROMPT_KEY = "Prompt versiyon (sha256[0:8])"
+
+
+@dataclass
+class PriorResults:
+    path: Path
+    rows: Dict[str, Result]
+    inclusion: Dict[str, str]  # kod → metin
+    exclusion: Dict[str, str]
+    prompt_hash: str = ""
+    model_id: str = ""
+
+
+@dataclass
+class CriteriaDiff:
+    ic_map: Dict[str, str]  # önceki kod → yeni kod (metni değişmeyen ölçütler)
+    ec_map: Dict[str, str]
+    added_ic: List[str]     # yeni kodlar
+    removed_ic: List[str]   # önceki kodlar
+    added_ec: List[str]
+    removed_ec: List[str]
+
+    @property
+    def changed(self) -> bool:
+        return bool(self.added_ic or self.removed_ic or self.added_ec or self.removed_ec)
+
+    def describe(self) -> str:
+        parts = [f"+{c}" for c in self.added_ic + self.added_ec]
+        parts += [f"−{c}" for c in self.removed_ic + self.removed_ec]
+        return ", ".join(parts) or "değişmedi"
+
+
+def read_prior_results(path: Path) -> PriorResults:
+    suffix = path.suffix.lower()
+    if suffix in {".xlsx", ".xls"}:
+        rows, meta = _read_prior_excel(path)
+    elif suffix in ARROW_SUFFIXES:
+        rows, meta = _read_prior_arrow(path)
+    else:
+        rows, meta = _read_prior_csv(path)
+    prior = PriorResults(path, {}, {}, {})
+    for key, value in meta:
+        key = str(key or "").strip()
+        if CRITERION_CODE_RE.match(key):
+            (prior.inclusion if key.startswith("IC") else prior.exclusion)[key] = str(value or "")
+        elif key == PRIOR_PROMPT_KEY:
+            prior.prompt_hash = str(value or "")
+        elif key == "Model":
+            prior.model_id = str(value or "")
+    for r in rows:
+        prior.rows.setdefault(r.id, r)
+    return prior
+
+
+def _prior_result(row: Dict[str, Any]) -> Result:
+    # CSV / Excel satırı (_result_row'un tersi); Excel'de "İnceleme" sütunu "İnceleme Gerekli"
+    def get(key: str) -> str:
+        value = row.get(key)
+        return "" if value is None else str(value).strip()
+
+    conf = get("Güven")
+    return Result(
+        id=get("ID"), authors=get("Yazar(lar)"), title=get("Başlık"), year=get("Yıl"),
+        abstract=get("Abstract (Orijinal)"), summary_tr=get("Türkçe Özet"),
+        decision=get("Karar"), confidence=float(conf) if conf else None,
+        matched_inclusion_criteria=[c for c in get("IC").split(";") if c],
+        matched_exclusion_criteria=[c for c in get("EC").split(";") if c],
+        needs_human_review=(get("İnceleme") or get("İnceleme Gerekli")) == "Yes",
+        rationale=get("Gerekçe"), prompt_version=get("Prompt Versiyon"),
+        provenance=get("Kaynak"),
+    )
+
+
+def _read_prior_csv(path: Path) -> tuple:
+    meta = []
+    with path.open(encoding="utf-8-sig", newline="") as f:
+        lines = []
+        for line in f:
+            if line.startswith("#"):
+                key, _, value = line[1:].strip(" \r\n").partition("\t")
+                meta.append((key, value))
+            else:
+                lines.append(line)
+    return [_prior_result(row) for row in csv.DictReader(lines)], meta
+
+
+def _read_prior_excel(path: Path) -> tuple:
+    try:
+        from openpyxl import load_workbook
+    except ImportError:
+        sys.exit("Excel okumak için openpyxl gerekli: pip install -r requirements.txt")
+    wb = load_workbook(path, read_only=True, data_only=True)
+    try:
+        rows = wb["Screening"].iter_rows(values_only=True)
+        header = next(rows, None) or ()
+        results = [_prior_result(dict(zip(header, row))) for row in rows]
+        meta = [tuple(row[:2]) for row in wb["Metadata"].iter_rows(min_row=2, values_only=True)
+                if len(row) >= 2] if "Metadata" in wb.sheetnames else []
+    finally:
+        wb.close()
+    return results, meta
+
+
+def _read_prior_arrow(path: Path) -> tuple:
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        sys.exit("Parquet/Arrow okumak için pyarrow gerekli: pip install pyarrow")
+    if path.suffix.lower() == ".parquet":
+        table = pq.read_table(str(path))
+    else:
+        with pa.memory_map(str(path)) as source:
+            table = pa.ipc.open_file(source).read_all()
+    raw = (table.schema.metadata or {}).get(b"screening_metadata")
+    meta = [tuple(row[:2]) for row in json.loads(raw)] if raw else []
+    names = {f.name for f in fields(Result)}
+    rows = [Result(**{k: v for k, v in row.items() if k in names}) for row in table.to_pylist()]
+    return rows, meta
+
+
+def _criterion_key(text: str) -> str:
+    return " ".join(text.split()).casefold()
+
+
+def diff_criteria(prior: PriorResults, inclusion: List[Dict], exclusion: List[Dict]) -> CriteriaDiff:
+    # Ölçütler koda göre değil metne göre eşlenir: araya satır eklenince kaydırılan
+    # kodlar değişiklik sayılmaz, yalnızca numaraları güncellenir
+    def side(old: Dict[str, str], new: List[Dict]) -> tuple:
+        new_codes = {_criterion_key(c["text"]): c["code"] for c in new}
+        old_texts = {_criterion_key(t) for t in old.values()}
+        mapping = {code: new_codes[_criterion_key(t)] for code, t in old.items()
+                   if _criterion_key(t) in new_codes}
+        added = [c["code"] for c in new if _criterion_key(c["text"]) not in old_texts]
+        removed = [code for code in old if code not in mapping]
+        return mapping, added, removed
+
+    ic_map, added_ic, removed_ic = side(prior.inclusion, inclusion)
+    ec_map, added_ec, removed_ec = side(prior.exclusion, exclusion)
+    return CriteriaDiff(ic_map, ec_map, added_ic, removed_ic, added_ec, removed_ec)
+
+
+def rescreen_reason(article: Article, prior: Optional[Result], diff: CriteriaDiff) -> str:
+    # Boş dönerse önceki sonuç aktarılır. Ölçüt değişikliğinde karar tablosu:
+    #   geçerli (metni değişmeyen) bir EC ile Exclude  → aktarılır, IC/EC eklemesi etkilemez
+    #   dayandığı tüm EC'ler değişmiş/kaldırılmış      → yeniden taranır
+    #   Uncertain                                     → yeniden taranır
+    #   IC eklendi / değişti / kaldırıldı              → EC'siz tüm kararlar yeniden taranır
+    #   EC eklendi                                    → Include'lar yeniden taranır
+    if prior is None:
+        return "yeni makale"
+    same = Article(prior.id, prior.title, prior.abstract, prior.authors, prior.year)
+    if article_content_hash(article) != article_content_hash(same):
+        return "içerik değişti"
+    if (prior.decision not in DECISIONS or prior.summary_tr == "Hata"
+            or prior.rationale.startswith((PREFILTER_TAG, "[Tekrar → "))):
+        return "önceki sonuç kullanılamaz"
+    if not diff.changed:
+        return ""
+    if prior.decision == "Exclude" and prior.matched_exclusion_criteria:
+        valid = any(c in diff.ec_map for c in prior.matched_exclusion_criteria)
+        return "" if valid else "ölçüt değişti"
+    if prior.decision == "Uncertain" or diff.added_ic or diff.removed_ic:
+        return "ölçüt değişti"
+    if diff.added_ec and prior.decision == "Include":
+        return "ölçüt değişti"
+    return ""
+
+
+def plan_incremental(articles: Iterable[Article], prior: PriorResults, diff: CriteriaDiff,
+                     skip: Optional[set] = None) -> tuple:
+    # (aktarılacak sonuçlar, yeniden tarama nedeni sayaçları, girdide bulunan önceki satır sayısı)
+    label = f"{CARRIED_TAG}: {prior.path.name}"
+    carried: List[Result] = []
+    reasons: collections.Counter = collections.Counter()
+    matched = 0
+    for a in articles:
+        row = prior.rows.get(a.ID)
+        matched += row is not None
+        if skip and a.ID in skip:
+            continue
+        reason = rescreen_reason(a, row, diff)
+        if reason:
+            reasons[reason] += 1
+            continue
+        carried.append(Result(**{
+            **asdict(row),
+            "matched_inclusion_criteria": [diff.ic_map[c] for c in row.matched_inclusion_criteria
+                                           if c in diff.ic_map],
+            "matched_exclusion_criteria": [diff.ec_map[c] for c in row.matched_exclusion_criteria
+                                           if c in diff.ec_map],
+            "prompt_version": row.prompt_version or prior.prompt_hash,
+            "provenance": label,
+        }))
+    return carried, reasons, matched
+
+
+def print_incremental_summary(prior: PriorResults, diff: CriteriaDiff, carried: int,
+                              reasons: collections.Counter, matched: int) -> None:
+    print(f"♻️  Artımlı tarama: {prior.path.name} ({len(prior.rows):,} satır, "
+          f"prompt {prior.prompt_hash or '?'}) | ölçütler: {diff.describe()}")
+    if not prior.inclusion and not prior.exclusion:
+        print("⚠️  Önceki çıktıda IC/EC metadata'sı yok, tüm ölçütler değişmiş sayılıyor")
+    print(f"   Aktarılan: {carried:,} | yeniden taranacak: {sum(reasons.values()):,}"
+          + "".join(f" | {k}: {v:,}" for k, v in reasons.most_common()))
+    if len(prior.rows) > matched:
+        print(f"   Girdide artık olmayan {len(prior.rows) - matched:,} önceki satır çıktıya yazılmaz")
+
+
+# ============================================================
+# ANALYSIS — --analyze raporu (hesaplar analysis.py'de)
+# ============================================================
+def read_decision_arrays(path: Path) -> tuple:
+    # (DecisionArrays, prompt hash). Analiz yalnız 4 sütunu kullanır: Parquet/Arrow ve
+    # CSV (pandas) sütun bazlı okunur, Result nesnesi kurulmaz; Excel genel okuyucuya düşer.
+    suffix = path.suffix.lower()
+    if suffix in ARROW_SUFFIXES:
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            sys.exit("Parquet/Arrow okumak için pyarrow gerekli: pip install pyarrow")
+        columns = ["id", "decision", "confidence", "needs_human_review"]
+        if suffix == ".parquet":
+            table = pq.read_table(str(path), columns=columns)
+        else:
+            with pa.memory_map(str(path)) as source:
+                table = pa.ipc.open_file(source).read_all().select(columns)
+        raw = (table.schema.metadata or {}).get(b"screening_metadata")
+        meta = dict(tuple(row[:2]) for row in json.loads(raw)) if raw else {}
+        arr = decision_arrays(
+            table.column("id").to_pylist(), table.column("decision").to_pylist(),
+            table.column("confidence").to_numpy(zero_copy_only=False),
+            table.column("needs_human_review").fill_null(False).to_numpy(zero_copy_only=False))
+        return arr, str(meta.get(PRIOR_PROMPT_KEY) or "")
+    if suffix in {".csv", ".tsv"} and pd is not None:
+        meta = {}
+        with path.open(encoding="utf-8-sig", newline="") as f:
+            while True:
+                pos = f.tell()
+                line = f.readline()
+                if not line.startswith("#"):
+                    break
+                key, _, value = line[1:].strip(" \r\n").partition("\t")
+                meta[key] = value
+            f.seek(pos)
+            df = pd.read_csv(f, dtype={"ID": str}, usecols=["ID", "Karar", "Güven", "İnceleme"],
+                             keep_default_na=False, na_values={"Güven": [""]})
+        arr = decision_arrays(df["ID"].str.strip().tolist(), df["Karar"].tolist(),
+                              pd.to_numeric(df["Güven"], errors="coerce").to_numpy(),
+                              (df["İnceleme"] == "Yes").to_numpy())
+        return arr, meta.get(PRIOR_PROMPT_KEY, "")
+    prior = read_prior_results(path)
+    rows = list(prior.rows.values())
+    arr = decision_arrays([r.id for r in rows], [r.decision for r in rows],
+                          [np.nan if r.confidence is None else r.confidence for r in rows],
+                          [r.needs_human_review for r in rows])
+    return arr, prior.prompt_hash
+
+
+def analyze_outputs(args) -> int:
+    if np is None:
+        sys.exit("Analiz için numpy gerekli: pip install numpy")
+    if not args.analyze.exists():
+        sys.exit(f"❌ Çıktı dosyası bulunamadı: {args.analyze}")
+    arr, prompt_hash = read_decision_arrays(args.analyze)
+    n = len(arr.ids)
+    if not n:
+        sys.exit("❌ Çıktı dosyasında sonuç yok.")
+    grid = np.linspace(0, 1, THRESHOLD_GRID)
+
+    print("\n" + "═" * 60)
+    print(f"📊 ANALİZ: {args.analyze.name} (prompt {prompt_hash or '?'}, {n:,} satır)")
+    print("═" * 60)
+    counts = np.bincount(arr.decision, minlength=3)
+    print(f"Include / Exclude / Uncertain: {counts[1]:,} / {counts[0]:,} / {counts[2]:,}")
+    q = np.quantile(arr.confidence, [0.1, 0.25, 0.5, 0.75, 0.9])
+    print("Güven: " + " | ".join(f"p{p} {v:.2f}" for p, v in zip((10, 25, 50, 75, 90), q)))
+    print(f"Model bayrağıyla inceleme: {(arr.flagged | (arr.decision == 2)).mean():.1%}")
+
+    for path in args.compare or []:
+        if not path.exists():
+            print(f"\n⚠️  Karşılaştırma dosyası bulunamadı: {path}")
+            continue
+        other, other_hash = read_decision_arrays(path)
+        mine, theirs = join_ids(arr.ids, other.index)
+        kappa, m = cohen_kappa(arr.decision[mine], other.decision[theirs])
+        print(f"\n🤝 {path.name} (prompt {other_hash or '?'}) ile uyum ({len(mine):,} ortak ID): Cohen's κ = {kappa:.3f}, "
+              f"aynı karar {np.trace(m) / max(1, m.sum()):.1%}")
+        print("   (satır: bu çıktı, sütun: karşılaştırılan)  Exclude  Include  Uncertain")
+        for name, row in zip(("Exclude", "Include", "Uncertain"), m):
+            print(f"   {name:<40}" + "".join(f"{v:>9,}" for v in row))
+
+    if not args.labels:
+        print("\nℹ️  --labels ile insan etiketli alt küme verilirse kalibrasyon, recall ve "
+              "eşik önerisi hesaplanır")
+        return 0
+    labels = read_labels(args.labels)
+    label_ids = list(labels)
+    theirs, rows = join_ids(label_ids, arr.index)
+    y = np.fromiter((labels[label_ids[i]] for i in theirs), dtype=bool, count=len(theirs))
+    positives = int(y.sum())
+    print(f"\n🏷️  Etiketli: {len(rows):,} satır ({positives:,} Include, "
+          f"{len(labels) - len(rows):,} etiket çıktıda yok)")
+    if not len(rows):
+        return 0
+
+    d, c = arr.decision[rows], arr.confidence[rows]
+    decided = d != 2
+    kappa, _ = cohen_kappa(d[decided], y[decided].astype(np.int64), 2)
+    print(f"İnsan ile uyum (Include/Exclude kararlarında): Cohen's κ = {kappa:.3f}")
+    print(f"WSS@95 (güvene göre sıralı okuma): {wss_at(include_score(arr)[rows], y):.1%}")
+
+    bins, mean_conf, accuracy, ece = calibration_curve(c[decided], (d[decided] == 1) == y[decided])
+    print(f"\nKalibrasyon (Include/Exclude kararları, ECE = {ece:.3f})")
+    print(f"   {'Güven':<12} {'n':>8} {'ort. güven':>11} {'doğruluk':>9}")
+    for i in np.flatnonzero(bins):
+        print(f"   {i / CALIBRATION_BINS:.1f}–{(i + 1) / CALIBRATION_BINS:.1f}    {bins[i]:>8,} "
+              f"{mean_conf[i]:>11.2f} {accuracy[i]:>9.1%}")
+
+    curve = review_curve(arr, rows, y, grid)
+    print("\nİnceleme eşiği (güven < eşik ve Uncertain → insan)")
+    print(f"   {'Eşik':<6} {'İnceleme':>9} {'Recall':>8} {'Precision':>10} {'Oto. doğruluk':>14}")
+    for i in range(0, THRESHOLD_GRID, 10):
+        print(f"   {grid[i]:<6.2f} {curve['workload'][i]:>9.1%} {curve['recall'][i]:>8.1%} "
+              f"{curve['precision'][i]:>10.1%} {curve['auto_accuracy'][i]:>14.1%}")
+
+    reviewed = arr.flagged[rows] | ~decided
+    current = 1 - int((y & ~reviewed & (d == 0)).sum()) / max(1, positives)
+    print(f"\nMevcut (model bayrağı): inceleme {(arr.flagged | (arr.decision == 2)).mean():.1%}, "
+          f"recall {current:.1%}")
+    ok = np.flatnonzero(curve["recall"] >= args.target_recall)
+    if not positives:
+        print("⚠️  Etiketlerde Include yok, eşik önerilemiyor")
+    elif not len(ok):
+        print(f"⚠️  Hiçbir eşikte recall ≥ {args.target_recall:.0%} değil: tüm satırları inceleyin")
+    else:
+        i = ok[0]
+        print(f"✅ Önerilen needs_human_review eşiği: güven < {grid[i]:.2f} "
+              f"→ inceleme {curve['workload'][i]:.1%}, recall {curve['recall'][i]:.1%}")
+        if positives < MIN_LABELED_POSITIVES:
+            print(f"⚠️  Yalnız {positives} etiketli Include var; öneri için daha fazla etiket gerekli")
+    return 0
+
+
 # ============================================================
 # PROMPT BUILDING
 # ============================================================
@@ -321,6 +1277,106 @@ KURALLAR:
 """
 
 
+COMPACT_OUTPUT_FORMAT = """## ÇIKTI FORMATI (KOMPAKT)
+
+Sadece şu JSON'u döndür (başka açıklama yok). Anahtarlar kısaltılmıştır:
+
+```json
+{"results": [{"i": "<verilen id>", "s": "<Türkçe özet>", "d": "I", "c": 0.85, "ic": [1], "ec": [], "h": false, "r": "<gerekçe>"}]}
+```
+
+ANAHTARLAR:
+- i: id, s: summary_tr, c: confidence, h: needs_human_review, r: rationale
+- d: karar kodu — I = Include, E = Exclude, U = Uncertain
+- ic / ec: eşleşen IC / EC ölçütlerinin NUMARALARI (IC2 → 2, EC3 → 3)
+
+KURALLAR:
+- c < 0.7 ise h=true
+- Title, Abstract, Authors, Year alanlarını ASLA tekrarlama
+- d="E" ise ec boş olamaz, d="I" ise ic boş olamaz
+"""
+
+DECISION_OUTPUT_FORMAT = """## ÇIKTI FORMATI (ÖN TARAMA — YALNIZ KARAR)
+
+Bu geçişte özet ve gerekçe İSTENMİYOR. summary_tr ve rationale alanlarını DÖNDÜRME.
+Sadece şu JSON'u döndür (başka açıklama yok):
+
+```json
+{"results": [{"id": "<verilen id>", "decision": "Include | Exclude | Uncertain", "confidence": 0.85, "matched_inclusion_criteria": [], "matched_exclusion_criteria": ["EC1"], "needs_human_review": false}]}
+```
+
+KURALLAR:
+- "Maybe" YOK, "Uncertain" kullan; emin değilsen Exclude deme
+- confidence < 0.7 ise needs_human_review=true
+- decision="Exclude" ise matched_exclusion_criteria boş olamaz
+- decision="Include" ise matched_inclusion_criteria boş olamaz
+"""
+
+
+COMPACT_DECISION_OUTPUT_FORMAT = """## ÇIKTI FORMATI (ÖN TARAMA — YALNIZ KARAR, KOMPAKT)
+
+Bu geçişte özet ve gerekçe İSTENMİYOR (s ve r anahtarlarını DÖNDÜRME).
+Sadece şu JSON'u döndür (başka açıklama yok):
+
+```json
+{"results": [{"i": "<verilen id>", "d": "E", "c": 0.85, "ic": [], "ec": [1], "h": false}]}
+```
+
+ANAHTARLAR:
+- i: id, c: confidence, h: needs_human_review
+- d: karar kodu — I = Include, E = Exclude, U = Uncertain (emin değilsen E deme)
+- ic / ec: eşleşen IC / EC ölçütlerinin NUMARALARI (IC2 → 2, EC3 → 3)
+
+KURALLAR:
+- c < 0.7 ise h=true
+- d="E" ise ec boş olamaz, d="I" ise ic boş olamaz
+"""
+
+# ----- Yanıt şeması (Result alanlarından türetilir; anahtar tabloları schema.py'de)
+@functools.lru_cache(maxsize=4)
+def response_schema(compact: bool = False, decision_only: bool = False) -> Dict[str, Any]:
+    props: Dict[str, Any] = {}
+    for f in fields(Result):
+        if (f.name in ARTICLE_FIELDS or f.name in NON_MODEL_FIELDS
+                or (decision_only and f.name in FREE_TEXT_FIELDS)):
+            continue
+        key = COMPACT_KEYS[f.name] if compact else f.name
+        if f.name == "decision":
+            prop = {"type": "STRING", "enum": list(COMPACT_DECISIONS if compact else DECISIONS)}
+        elif f.type.startswith("List"):
+            prop = {"type": "ARRAY", "items": {"type": "INTEGER" if compact else "STRING"}}
+        elif "float" in f.type:
+            prop = {"type": "NUMBER", "nullable": f.type.startswith("Optional")}
+        elif f.type == "bool":
+            prop = {"type": "BOOLEAN"}
+        else:
+            prop = {"type": "STRING"}
+        props[key] = prop
+    item = {"type": "OBJECT", "properties": props,
+            "required": list(props), "propertyOrdering": list(props)}
+    return {"type": "OBJECT", "properties": {"results": {"type": "ARRAY", "items": item}},
+            "required": ["results"]}
+
+
+def output_tokens_per_article(compact: bool = False, decision_only: bool = False) -> int:
+    # Serbest metin (özet/gerekçe) iki modda aynıdır; fark anahtar ve enum yükü
+    # kadardır ve örnek bir sonucun iki biçimi karşılaştırılarak ölçülür.
+    # Yalnız karar geçişinde serbest metin yoktur, yapısal yük tek başına kalır.
+    if not compact and not decision_only:
+        return OUTPUT_TOKENS_PER_ARTICLE
+    sample = {"id": "1234567", "summary_tr": "", "decision": "Uncertain", "confidence": 0.85,
+              "matched_inclusion_criteria": ["IC1", "IC2"],
+              "matched_exclusion_criteria": ["EC1"], "needs_human_review": False,
+              "rationale": ""}
+    if decision_only:
+        sample = {k: v for k, v in sample.items() if k not in FREE_TEXT_FIELDS}
+        return estimate_tokens(json.dumps(compact_api_result(sample) if compact else sample,
+                                          ensure_ascii=False))
+    saved = (estimate_tokens(json.dumps(sample, ensure_ascii=False))
+             - estimate_tokens(json.dumps(compact_api_result(sample), ensure_ascii=False)))
+    return OUTPUT_TOKENS_PER_ARTICLE - saved
+
+
 def load_criteria(path: Optional[Path]) -> List[Dict[str, str]]:
     if not path:
         return []
@@ -333,19 +1389,33 @@ def code_criteria(items: List[Dict[str, str]], prefix: str) -> List[Dict[str, st
     return [{"code": f"{prefix}{i+1}", "text": c["text"]} for i, c in enumerate(items)]
 
 
-def build_instructions(inclusion: List[Dict], exclusion: List[Dict]) -> str:
+def build_instructions(inclusion: List[Dict], exclusion: List[Dict],
+                       compact: bool = False, decision_only: bool = False) -> str:
     parts = [SYSTEM_PROMPT, "\n---\n\n## ✅ Dahil Etme Ölçütleri (IC):"]
     for c in inclusion:
         parts.append(f"- **{c['code']}**: {c['text']}")
     parts.append("\n## ❌ Hariç Tutma Ölçütleri (EC):")
     for c in exclusion:
         parts.append(f"- **{c['code']}**: {c['text']}")
-    parts.append("\n---\n\n" + OUTPUT_FORMAT)
+    if decision_only:
+        output_format = COMPACT_DECISION_OUTPUT_FORMAT if compact else DECISION_OUTPUT_FORMAT
+    else:
+        output_format = COMPACT_OUTPUT_FORMAT if compact else OUTPUT_FORMAT
+    parts.append("\n---\n\n" + output_format)
     return "\n".join(parts)
 
 
+def prompt_version(instructions: str) -> str:
+    return hashlib.sha256(instructions.encode("utf-8")).hexdigest()[:8]
+
+
 def build_batch_prompt(articles: List[Article], instructions: str) -> str:
-    parts = [instructions, "\n---\n\n## DEĞERLENDİRİLECEK MAKALELER:\n"]
+    return instructions + "\n" + build_articles_prompt(articles)
+
+
+def build_articles_prompt(articles: List[Article]) -> str:
+    # Talimat bloğu olmadan sadece makale kısmı (context cache kullanılırken gönderilen)
+    parts = ["\n---\n\n## DEĞERLENDİRİLECEK MAKALELER:\n"]
     for a in articles:
         parts.append(f"### id: {a.ID}")
         parts.append(f"Başlık: {a.Title}")
@@ -356,26 +1426,62 @@ def build_batch_prompt(articles: List[Article], instructions: str) -> str:
     return "\n".join(parts)
 
 
+_JSON_DECODER = json.JSONDecoder()
+
+
+def _loads(text: str) -> Any:
+    return orjson.loads(text) if orjson is not None else json.loads(text)
+
+
 def parse_model_response(text: str) -> List[Dict[str, Any]]:
-    text = re.sub(r"```json\s*", "", text, flags=re.IGNORECASE)
-    text = re.sub(r"```\s*", "", text)
-    text = text.strip()
-    m = re.search(r"\{[\s\S]*\}", text)
-    if m:
-        text = m.group(0)
+    # Hızlı yol: ilk '{' / '[' ile son '}' / ']' arası tek seferde parse edilir
+    # (```json çitleri ve ön/son açıklama metni böylece atlanır).
+    starts = [i for i in (text.find("{"), text.find("[")) if i >= 0]
+    start = min(starts) if starts else 0
+    end = max(text.rfind("}"), text.rfind("]")) + 1
     try:
-        data = json.loads(text)
-        if isinstance(data, dict) and isinstance(data.get("results"), list):
-            return data["results"]
-        if isinstance(data, list):
-            return data
-        return [data]
-    except json.JSONDecodeError as e:
+        data = _loads(text[start:end] if end > start else text)
+    except ValueError as e:
+        # Yarım (MAX_TOKENS) ya da kısmen bozuk yanıt: tamamlanmış nesneler kurtarılır
+        recovered = _recover_objects(text, start)
+        if recovered:
+            print(f"  ⚠️  JSON yarım/bozuk, {len(recovered)} tam sonuç kurtarıldı", file=sys.stderr)
+            metrics().inc("parse_recovered_total")
+            return [expand_compact(r) for r in recovered]
         print(f"  ⚠️  JSON parse hatası: {e}", file=sys.stderr)
+        metrics().inc("parse_failures_total")
         return []
+    if isinstance(data, dict) and isinstance(data.get("results"), list):
+        data = data["results"]
+    return [expand_compact(r) if isinstance(r, dict) else r
+            for r in (data if isinstance(data, list) else [data])]
+
+
+def _recover_objects(text: str, start: int = 0) -> List[Dict[str, Any]]:
+    # Her '{' konumundan raw_decode denenir; "id" alanlı tam nesne bulununca
+    # sonuna atlanır. Dış {"results": [...]} ve kesilen son nesne çözülemeyip
+    # atlanır; böylece kesilme noktasından önceki her sonuç geri alınır.
+    out: List[Dict[str, Any]] = []
+    pos = text.find("{", start)
+    while pos >= 0:
+        try:
+            obj, end = _JSON_DECODER.raw_decode(text, pos)
+        except ValueError:
+            pos = text.find("{", pos + 1)
+            continue
+        if isinstance(obj, dict) and ("id" in obj or "i" in obj):
+            out.append(obj)
+            pos = text.find("{", end)
+        elif isinstance(obj, dict) and isinstance(obj.get("results"), list):
+            out.extend(r for r in obj["results"] if isinstance(r, dict))
+            pos = text.find("{", end)
+        else:
+            pos = text.find("{", pos + 1)
+    return out
 
 
 def merge_result(article: Article, api_result: Dict[str, Any]) -> Result:
+    api_result = expand_compact(api_result)
     conf = api_result.get("confidence")
     return Result(
         id=article.ID,
@@ -396,252 +1502,1065 @@ def merge_result(article: Article, api_result: Dict[str, Any]) -> Result:
 # ============================================================
 # COST ACCUMULATION
 # ============================================================
-def add_usage(state: State, input_tokens: int, output_tokens: int) -> None:
-    m = MODELS[state.model_id]
-    tier = "batch" if state.mode == "async" else "standard"
+def add_usage(state: State, input_tokens: int, output_tokens: int,
+              tier: Optional[str] = None, cached_tokens: int = 0,
+              model_id: Optional[str] = None) -> None:
+    m = MODELS[model_id or state.model_id]
+    tier = tier or ("batch" if state.mode == "async" else "standard")
     p = m[tier]
+    # promptTokenCount cache'ten okunan tokenları da içerir; onlar cache fiyatından ücretlenir
+    cached_tokens = min(cached_tokens, input_tokens)
     state.total_input_tokens += input_tokens
     state.total_output_tokens += output_tokens
-    state.total_cost_usd += (input_tokens / 1e6) * p["input"] + (output_tokens / 1e6) * p["output"]
+    state.total_cached_tokens += cached_tokens
+    state.total_cost_usd += (((input_tokens - cached_tokens) / 1e6) * p["input"]
+                             + (cached_tokens / 1e6) * m["cache"]["input"]
+                             + (output_tokens / 1e6) * p["output"])
+
+
+def add_response_usage(state: State, response: Dict[str, Any], tier: Optional[str] = None) -> None:
+    usage = response.get("usageMetadata", {})
+    # Anahtar havuzu isteği yedek modele gönderdiyse o modelin fiyatı kullanılır.
+    # modelVersion'a bakılmaz: API tarihli sürüm adı (ör. "...-001") dönebilir.
+    model_id = response.get(FALLBACK_MODEL_KEY)
+    if model_id:
+        state.fallback_requests[model_id] = state.fallback_requests.get(model_id, 0) + 1
+    add_usage(state, usage.get("promptTokenCount", 0), usage.get("candidatesTokenCount", 0),
+              tier, usage.get("cachedContentTokenCount", 0), model_id)
+    if usage:
+        metrics().observe("request_input_tokens", usage.get("promptTokenCount", 0))
+        metrics().observe("request_output_tokens", usage.get("candidatesTokenCount", 0))
 
 
 # ============================================================
-# SYNC MODE — REAL BATCH (N articles per API call)
+# RATE LIMITING — token bucket (MODELS rpm/tpm)
+# ============================================================
+class TokenBucket:
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.tokens = float(per_minute)
+        self.fill_rate = per_minute / 60.0
+        self.updated = time.monotonic()
+
+    def wait_time(self, amount: float, now: float) -> float:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.fill_rate)
+        self.updated = now
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.fill_rate
+
+    def take(self, amount: float) -> None:
+        self.tokens -= min(amount, self.capacity)
+
+
+class RateLimiter:
+    """İstek (rpm) ve token (tpm) bucket'larını birlikte yöneten, thread-safe limiter."""
+
+    def __init__(self, rpm: int = 0, tpm: int = 0):
+        self.rpm = rpm
+        self.tpm = tpm
+        self._lock = threading.Lock()
+        self._req = TokenBucket(rpm) if rpm > 0 else None
+        self._tok = TokenBucket(tpm) if tpm > 0 else None
+
+    def acquire(self, tokens: int = 0) -> float:
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                wait = 0.0
+                if self._req:
+                    wait = max(wait, self._req.wait_time(1, now))
+                if self._tok:
+                    wait = max(wait, self._tok.wait_time(tokens, now))
+                if wait <= 0:
+                    if self._req:
+                        self._req.take(1)
+                    if self._tok:
+                        self._tok.take(tokens)
+                    return waited
+            time.sleep(wait)
+            waited += wait
+
+
+def build_rate_limiter(model_id: str, rpm: Optional[int] = None,
+                       tpm: Optional[int] = None) -> Optional[RateLimiter]:
+    m = MODELS[model_id]
+    rpm = m["rpm"] if rpm is None else rpm
+    tpm = m["tpm"] if tpm is None else tpm
+    if rpm <= 0 and tpm <= 0:
+        return None
+    return RateLimiter(rpm, tpm)
+
+
+# ============================================================
+# KEY POOL — birden çok API key / model arasında kota paylaşımı
+# ============================================================
+# Free tier limitleri proje (API key) × model başınadır. Havuz her (key, model)
+# slotu için son 60 sn'deki istek/token'ı ve günlük istek sayısını tutar; sayaçlar
+# kota dosyasında saklandığından sonraki çalıştırma kaldığı yerden sayar.
+QUOTA_WINDOW_SEC = 60.0
+POOL_COOLDOWN_SEC = 60.0   # RetryInfo / Retry-After gelmeyen 429'da anahtarın dinlenme süresi
+FALLBACK_MODEL_KEY = "_fallbackModel"  # havuzun yanıta eklediği yedek model adı
+POOL_MAX_ROTATIONS = 3     # istek başına anahtar sayısı × bu kadar 429'dan sonra hata verilir
+QUOTA_SAVE_INTERVAL = 5.0  # kota dosyasının en sık yazılma aralığı (saniye)
+try:
+    QUOTA_TZ: Any = zoneinfo.ZoneInfo("America/Los_Angeles")  # RPD Pasifik gece yarısı sıfırlanır
+except zoneinfo.ZoneInfoNotFoundError:
+    QUOTA_TZ = timezone(timedelta(hours=-8))
+
+
+def quota_day(now: float) -> str:
+    return datetime.fromtimestamp(now, QUOTA_TZ).strftime("%Y-%m-%d")
+
+
+def quota_reset_at(now: float) -> datetime:
+    local = datetime.fromtimestamp(now, QUOTA_TZ) + timedelta(days=1)
+    return local.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def key_fingerprint(api_key: str) -> str:
+    # Kota dosyasında ve çıktılarda ham key tutulmaz
+    return hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:12]
+
+
+def load_api_keys(spec: str) -> List[str]:
+    # Virgülle ayrılmış liste ya da satır başına bir key içeren dosya (# ile yorum)
+    if not spec:
+        return []
+    path = Path(spec)
+    text = path.read_text(encoding="utf-8") if path.is_file() else spec.replace(",", "\n")
+    keys = (line.strip() for line in text.splitlines())
+    return list(dict.fromkeys(k for k in keys if k and not k.startswith("#")))
+
+
+def api_keys(args) -> List[str]:
+    return list(dict.fromkeys(k for k in [args.api_key, *load_api_keys(args.api_keys)] if k))
+
+
+@dataclass
+class QuotaSlot:
+    key: str  # key_fingerprint
+    model: str
+    rpm: int = 0
+    rpd: int = 0
+    tpm: int = 0
+    day: str = ""
+    requests: int = 0         # bugünkü istek
+    tokens: int = 0           # bugünkü input token (tahmini)
+    throttled: int = 0        # bugün alınan 429
+    exhausted: bool = False   # API günlük kotanın bittiğini bildirdi
+    cooldown_until: float = 0.0
+    window: List[List[float]] = field(default_factory=list)  # son 60 sn: [zaman, token]
+
+    def roll(self, now: float) -> None:
+        day = quota_day(now)
+        if day != self.day:
+            self.day, self.requests, self.tokens, self.throttled, self.exhausted = day, 0, 0, 0, False
+        cutoff = now - QUOTA_WINDOW_SEC
+        while self.window and self.window[0][0] <= cutoff:
+            self.window.pop(0)
+
+    def left_today(self) -> Optional[int]:
+        if self.exhausted:
+            return 0
+        return max(0, self.rpd - self.requests) if self.rpd else None
+
+    def headroom(self, tokens: int, now: float) -> float:
+        # En dar limitte kalan pay (0-1]; 0 ise slot şu an istek alamaz
+        left = self.left_today()
+        if now < self.cooldown_until or left == 0:
+            return 0.0
+        shares = [1.0]
+        if self.rpd:
+            shares.append(left / self.rpd)
+        if self.rpm:
+            if len(self.window) >= self.rpm:
+                return 0.0
+            shares.append((self.rpm - len(self.window)) / self.rpm)
+        if self.tpm:
+            free = self.tpm - sum(t for _, t in self.window) - min(tokens, self.tpm)
+            if free < 0:
+                return 0.0
+            shares.append(free / self.tpm)
+        return max(min(shares), 1e-6)
+
+    def wait_time(self, tokens: int, now: float) -> float:
+        # Dinlenme ve dakikalık pencere açılana kadar geçecek süre (günlük kota hariç)
+        wait = max(0.0, self.cooldown_until - now)
+        if self.rpm and len(self.window) >= self.rpm:
+            wait = max(wait, self.window[len(self.window) - self.rpm][0] + QUOTA_WINDOW_SEC - now)
+        if self.tpm:
+            over = sum(t for _, t in self.window) + min(tokens, self.tpm) - self.tpm
+            for ts, t in self.window:
+                if over <= 0:
+                    break
+                over -= t
+                wait = max(wait, ts + QUOTA_WINDOW_SEC - now)
+        return wait
+
+    def take(self, tokens: int, now: float) -> None:
+        self.requests += 1
+        self.tokens += tokens
+        self.window.append([now, tokens])
+
+
+class QuotaPool:
+    """API key × model slotlarının RPM/RPD/TPM muhasebesi (kota dosyasında kalıcı)."""
+
+    def __init__(self, path: Path, keys: List[str], models: Iterable[str] = (),
+                 rpm: Optional[int] = None, rpd: Optional[int] = None, tpm: Optional[int] = None):
+        self.path = path
+        self.keys = [key_fingerprint(k) for k in keys]
+        self.models = list(models)  # istenen modelin günlük kotası bitince sırayla kullanılır
+        self.limits = {"rpm": rpm, "rpd": rpd, "tpm": tpm}
+        self.slots: Dict[tuple, QuotaSlot] = {}
+        self._configured: set = set()
+        self._lock = threading.Lock()
+        self._saved = 0.0
+        if path.exists():
+            try:
+                for raw in json.loads(path.read_text(encoding="utf-8")).get("slots", []):
+                    s = QuotaSlot(**raw)
+                    self.slots[(s.key, s.model)] = s
+            except (ValueError, TypeError) as e:
+                print(f"⚠️  Kota dosyası okunamadı ({e}), sayaçlar sıfırdan başlıyor")
+
+    def slot(self, key: str, model_id: str) -> QuotaSlot:
+        s = self.slots.get((key, model_id))
+        if s is None:
+            s = self.slots[(key, model_id)] = QuotaSlot(key, model_id)
+        if (key, model_id) not in self._configured:
+            # Limitler kayıttan değil katalogdan / parametrelerden alınır
+            for name, value in self.limits.items():
+                setattr(s, name, MODELS[model_id][name] if value is None else value)
+            self._configured.add((key, model_id))
+        return s
+
+    def acquire(self, model_id: str, tokens: int) -> QuotaSlot:
+        # En çok boş kotası olan slot seçilir; hiçbiri uygun değilse en erken açılacak
+        # slot beklenir. İstenen model tüm anahtarlarda günlük kotasını bitirdiyse
+        # yedek modellere geçilir.
+        models = [model_id] + [m for m in self.models if m != model_id]
+        while True:
+            with self._lock:
+                now = time.time()
+                wait = None
+                for m in models:
+                    slots = [self.slot(k, m) for k in self.keys]
+                    for s in slots:
+                        s.roll(now)
+                    live = [s for s in slots if s.left_today() != 0]
+                    if not live:
+                        continue
+                    best = max(live, key=lambda s: s.headroom(tokens, now))
+                    if best.headroom(tokens, now) > 0:
+                        best.take(tokens, now)
+                        self._save(now)
+                        return best
+                    wait = max(0.05, min(s.wait_time(tokens, now) for s in live))
+                    break
+                if wait is None:
+                    reset = quota_reset_at(now).astimezone()
+                    raise RuntimeError(f"Havuzdaki tüm API key'lerin günlük kotası doldu "
+                                       f"({', '.join(models)}), sıfırlanma: {reset:%Y-%m-%d %H:%M}")
+            metrics().inc("quota_wait_seconds_total", wait)
+            time.sleep(wait)
+
+    def throttle(self, slot: QuotaSlot, retry_after: float = 0.0, daily: bool = False) -> float:
+        with self._lock:
+            now = time.time()
+            slot.throttled += 1
+            if daily:
+                slot.exhausted = True
+            else:
+                slot.cooldown_until = now + (retry_after or POOL_COOLDOWN_SEC)
+            self._save(now, force=True)
+            return slot.cooldown_until - now
+
+    def status(self, model_id: str) -> str:
+        with self._lock:
+            now = time.time()
+            slots = [self.slot(k, model_id) for k in self.keys]
+            for s in slots:
+                s.roll(now)
+            left = [s.left_today() for s in slots]
+            rpm = "∞" if any(not s.rpm for s in slots) else f"{sum(s.rpm for s in slots):,}"
+        day = "∞" if None in left else f"{sum(left):,}"
+        return f"{model_id}: bugün kalan {day} istek, toplam {rpm} rpm"
+
+    def save(self) -> None:
+        with self._lock:
+            self._save(time.time(), force=True)
+
+    def _save(self, now: float, force: bool = False) -> None:
+        if not force and now - self._saved < QUOTA_SAVE_INTERVAL:
+            return
+        self._saved = now
+        payload = {"updated": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+                   "slots": [asdict(s) for s in self.slots.values()]}
+        _atomic_write(self.path, json.dumps(payload, ensure_ascii=False))
+
+
+class PooledBackend(Backend):
+    """generateContent isteklerini kota havuzundaki en boş API key'e yönlendirir.
+
+    429 alan anahtar dinlenmeye (günlük kota bittiyse gün sonuna kadar) alınır ve
+    istek beklemeden sıradaki anahtarla tekrarlanır. Files / Batch API işlemleri
+    ilk anahtarla yapılır; context cache proje bazlı olduğundan havuzda kullanılmaz.
+    """
+
+    def __init__(self, backends: List[GeminiBackend], pool: QuotaPool):
+        self.backends = {key_fingerprint(b.api_key): b for b in backends}
+        self.primary = backends[0]
+        self.pool = pool
+        self.name = self.primary.name
+
+    def generate_content(self, model_id: str, body: Dict[str, Any]) -> Dict[str, Any]:
+        tokens = estimate_tokens(body["contents"][0]["parts"][0]["text"])
+        throttled = 0
+        while True:
+            slot = self.pool.acquire(model_id, tokens)
+            try:
+                data = self.backends[slot.key].generate_content(slot.model, body)
+            except RateLimited as e:
+                rest = self.pool.throttle(slot, e.retry_after, e.daily)
+                metrics().inc("key_rotations_total", daily=e.daily)
+                throttled += 1
+                if throttled >= len(self.backends) * POOL_MAX_ROTATIONS:
+                    raise
+                print(f"  🔑 key {slot.key[:6]} 429 aldı ("
+                      + ("günlük kota doldu" if e.daily else f"{rest:.0f}s dinlenme")
+                      + "), sonraki anahtara geçiliyor")
+                continue
+            if slot.model != model_id:
+                data[FALLBACK_MODEL_KEY] = slot.model  # maliyet yedek modelin fiyatından yazılır
+            return data
+
+    def create_cached_content(self, body: Dict[str, Any]) -> Dict[str, Any]:
+        raise RuntimeError("context cache proje bazlıdır, API key havuzunda kullanılamaz")
+
+    def upload_file(self, path: Path, display_name: str) -> str:
+        return self.primary.upload_file(path, display_name)
+
+    def create_batch(self, model_id: str, file_name: str, display_name: str) -> str:
+        return self.primary.create_batch(model_id, file_name, display_name)
+
+    def get_batch(self, job_name: str) -> Dict[str, Any]:
+        return self.primary.get_batch(job_name)
+
+    def cancel_batch(self, job_name: str) -> None:
+        self.primary.cancel_batch(job_name)
+
+    def download_file(self, file_name: str, dest: Path) -> None:
+        self.primary.download_file(file_name, dest)
+
+
+def build_backend(args, keys: List[str]) -> Backend:
+    pooled = len(keys) > 1 or bool(args.pool_models)
+    # Havuzda 429 ApiClient'ta beklenmez; PooledBackend anahtar değiştirir
+    client_kwargs: Dict[str, Any] = {"read_timeout": args.timeout, "retries": args.http_retries,
+                                     "gzip_requests": not args.no_gzip}
+    if pooled:
+        client_kwargs["retry_statuses"] = [s for s in RETRY_STATUSES if s != 429]
+    if args.backend == "mock":
+        transport = MockTransport(MockConfig.parse(args.mock))
+        backends = [MockBackend(api_key=k, transport=transport, **client_kwargs)
+                    for k in keys or ["mock"]]
+    elif pooled:
+        client = ApiClient(session=http_client().session, **client_kwargs)
+        backends = [GeminiBackend(k, client) for k in keys]
+    else:
+        return GeminiBackend(keys[0], http_client())
+    if not pooled:
+        return backends[0]
+    pool = QuotaPool(args.quota_file, keys, args.pool_models, args.rpm, args.rpd, args.tpm)
+    atexit.register(pool.save)
+    return PooledBackend(backends, pool)
+
+
+# ============================================================
+# RESPONSE CACHE — (model_id, prompt_hash, sha256(Title+Abstract+Year))
+# ============================================================
+def article_content_hash(article: Article) -> str:
+    text = "\n".join((article.Title, article.Abstract, article.Year))
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """Makale başına parse edilmiş model sonuçlarının SQLite cache'i (LRU, boyut limitli)."""
+
+    def __init__(self, path: Path, model_id: str, prompt_hash: str, max_mb: float = 512):
+        self.path = path
+        self.model_id = model_id
+        self.prompt_hash = prompt_hash
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.db = sqlite3.connect(str(path))
+        self.db.execute("""CREATE TABLE IF NOT EXISTS results (
+            model_id TEXT, prompt_hash TEXT, content_hash TEXT,
+            result TEXT, size INTEGER, last_used REAL,
+            PRIMARY KEY (model_id, prompt_hash, content_hash))""")
+        self.db.execute("CREATE INDEX IF NOT EXISTS results_lru ON results(last_used)")
+        self.db.commit()
+        self.total_bytes = self.db.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+
+    def get_many(self, articles: List[Article], touch: bool = True) -> Dict[str, Dict[str, Any]]:
+        hashes = {article_content_hash(a): a.ID for a in articles}
+        found: Dict[str, Dict[str, Any]] = {}
+        keys = list(hashes)
+        for i in range(0, len(keys), 500):
+            chunk = keys[i:i + 500]
+            rows = self.db.execute(
+                f"SELECT content_hash, result FROM results WHERE model_id=? AND prompt_hash=? "
+                f"AND content_hash IN ({','.join('?' * len(chunk))})",
+                [self.model_id, self.prompt_hash, *chunk]).fetchall()
+            for h, result in rows:
+                found[h] = json.loads(result)
+        if found and touch:
+            now = time.time()
+            self.db.executemany(
+                "UPDATE results SET last_used=? WHERE model_id=? AND prompt_hash=? AND content_hash=?",
+                [(now, self.model_id, self.prompt_hash, h) for h in found])
+            self.db.commit()
+        return {hashes[h]: r for h, r in found.items()}
+
+    def put_many(self, items: List[tuple]) -> None:
+        # items: [(Article, api_result), ...] — sadece gerçek model yanıtları
+        now = time.time()
+        rows = []
+        for article, api_result in items:
+            payload = json.dumps({k: v for k, v in api_result.items() if k != "id"},
+                                 ensure_ascii=False)
+            rows.append((self.model_id, self.prompt_hash, article_content_hash(article),
+                         payload, len(payload.encode("utf-8")), now))
+        if not rows:
+            return
+        self.db.executemany("INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?, ?)", rows)
+        self.db.commit()
+        self.total_bytes += sum(r[4] for r in rows)
+        if self.total_bytes > self.max_bytes:
+            self._evict()
+
+    def _evict(self) -> None:
+        self.total_bytes = self.db.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+        while self.total_bytes > self.max_bytes:
+            rows = self.db.execute(
+                "SELECT rowid, size FROM results ORDER BY last_used LIMIT 1000").fetchall()
+            if not rows:
+                break
+            self.db.executemany("DELETE FROM results WHERE rowid=?", [(r[0],) for r in rows])
+            self.total_bytes -= sum(r[1] for r in rows)
+        self.db.commit()
+
+    def close(self) -> None:
+        self.db.close()
+
+
+def open_cache(args, model_id: str, prompt_hash: str) -> Optional[ResponseCache]:
+    if args.no_cache:
+        return None
+    # Mock yanıtları ayrı bir ad alanında tutulur; gerçek taramaya sonuç olarak dönmez
+    namespace = model_id if args.backend == "gemini" else f"{args.backend}:{model_id}"
+    return ResponseCache(args.cache, namespace, prompt_hash, args.cache_max_mb)
+
+
+def _split_cached(batch: List[Article], cache: Optional[ResponseCache],
+                  state: State) -> tuple:
+    if cache is None:
+        return {}, batch
+    cached = cache.get_many(batch)
+    misses = [a for a in batch if a.ID not in cached]
+    state.cache_hits += len(batch) - len(misses)
+    state.cache_misses += len(misses)
+    return cached, misses
+
+
 # ============================================================
-def call_gemini_sync(model_id: str, api_key: str, prompt: str, retry: int = 0) -> Dict[str, Any]:
-    url = f"{API_BASE}/models/{model_id}:generateContent?key={api_key}"
+# CONTEXT CACHE — talimat bloğu (IC/EC + şema) bir kez cache'lenir
+# ============================================================
+_context_cache_lock = threading.Lock()
+
+
+def ensure_context_cache(state: State, backend: Backend, instructions: str, ttl_sec: int) -> bool:
+    if state.context_cache_name and state.context_cache_expires > time.time() + 120:
+        return True
+    state.context_cache_name = ""
+    spec = MODELS[state.model_id].get("cache")
+    est = estimate_tokens(instructions)
+    if not spec:
+        print(f"ℹ️  {state.model_id} context cache desteklemiyor, talimatlar her istekte gönderilecek")
+        return False
+    if est < spec["min_tokens"]:
+        print(f"ℹ️  Talimat bloğu (~{est:,} token) context cache minimumunun "
+              f"({spec['min_tokens']:,}) altında, talimatlar her istekte gönderilecek")
+        return False
+
     body = {
+        "model": f"models/{state.model_id}",
+        "displayName": f"screening-{state.prompt_hash}",
+        "contents": [{"role": "user", "parts": [{"text": instructions}]}],
+        "ttl": f"{int(ttl_sec)}s",
+    }
+    try:
+        data = backend.create_cached_content(body)
+    except BACKEND_ERRORS as e:
+        print(f"⚠️  Context cache oluşturulamadı ({e}), talimatlar her istekte gönderilecek")
+        return False
+
+    state.context_cache_name = data["name"]
+    state.context_cache_tokens = (data.get("usageMetadata") or {}).get("totalTokenCount", est)
+    state.context_cache_expires = time.time() + ttl_sec
+    # Depolama ücreti TTL süresi boyunca peşin hesaplanır
+    state.total_cost_usd += state.context_cache_tokens / 1e6 * spec["storage_hour"] * ttl_sec / 3600
+    print(f"🧊 Context cache: {state.context_cache_name} "
+          f"({state.context_cache_tokens:,} token, TTL {ttl_sec // 60} dk)")
+    return True
+
+
+def context_cache_ttl(args, mode: str) -> int:
+    if args.context_cache_ttl:
+        return args.context_cache_ttl
+    return 48 * 3600 if mode != "sync" else 3600
+
+
+# ============================================================
+# SYNC MODE — REAL BATCH (N articles per API call)
+# ============================================================
+def call_gemini_sync(backend: Backend, model_id: str, prompt: str, cached_content: str = "",
+                     compact: bool = False, decision_only: bool = False,
+                     temperature: float = 0.2) -> Dict[str, Any]:
+    body: Dict[str, Any] = {
         "contents": [{"parts": [{"text": prompt}]}],
         "generationConfig": {
-            "temperature": 0.2,
+            "temperature": temperature,
             "topK": 40,
             "topP": 0.95,
-            "maxOutputTokens": 8192,
+            "maxOutputTokens": SYNC_MAX_OUTPUT_TOKENS,
             "responseMimeType": "application/json",
+            "responseSchema": response_schema(compact, decision_only),
         },
     }
-    try:
-        resp = requests.post(url, json=body, timeout=180)
-        if not resp.ok:
-            err = (resp.json().get("error", {}).get("message", resp.text)
-                   if resp.headers.get("Content-Type", "").startswith("application/json")
-                   else resp.text)
-            if resp.status_code in (429, 503) and retry < 5:
-                wait = 2 ** retry * 2
-                print(f"  ⏳ Rate limit ({resp.status_code}), {wait}s sonra tekrar... ({retry+1}/5)")
-                time.sleep(wait)
-                return call_gemini_sync(model_id, api_key, prompt, retry + 1)
-            raise RuntimeError(f"API {resp.status_code}: {err}")
-        return resp.json()
-    except requests.RequestException as e:
-        if retry < 5:
-            wait = 2 ** retry * 2
-            print(f"  ⏳ Ağ hatası: {e}, {wait}s sonra tekrar... ({retry+1}/5)")
-            time.sleep(wait)
-            return call_gemini_sync(model_id, api_key, prompt, retry + 1)
-        raise
+    if cached_content:
+        body["cachedContent"] = cached_content
+    return backend.generate_content(model_id, body)
 
 
-def run_sync(articles: List[Article], state: State, api_key: str, instructions: str,
-             batch_size: int, delay_sec: float, save_state_fn) -> List[Result]:
-    results: List[Result] = [Result(**r) for r in state.results]
-    batches = [articles[i:i + batch_size] for i in range(0, len(articles), batch_size)]
-    start_idx = state.last_processed_batch_index + 1
+def _request_sync_batch(state: State, backend: Backend, articles: List[Article], instructions: str,
+                        limiter: Optional[RateLimiter]) -> Dict[str, Any]:
+    cached = state.context_cache_name
+    prompt = build_articles_prompt(articles) if cached else build_batch_prompt(articles, instructions)
+    if limiter:
+        limiter.acquire(estimate_tokens(prompt))
+    try:
+        return call_gemini_sync(backend, state.model_id, prompt, cached_content=cached,
+                                compact=state.compact_response, decision_only=state.decision_only)
+    except ContextCacheGone as e:
+        # Cache süresi dolmuş / silinmiş: talimatlar isteğe geri eklenir. Paralel
+        # isteklerden yalnız ilki state'i günceller, diğerleri yeniden dener.
+        with _context_cache_lock:
+            if state.context_cache_name == cached:
+                print(f"  ⚠️  Context cache kullanılamadı ({e}), talimatlar isteğe ekleniyor")
+                state.context_cache_name = ""
+        return _request_sync_batch(state, backend, articles, instructions, limiter)
+
+
+def _chunked(items: Iterable[Article], size: int) -> Iterator[List[Article]]:
+    it = iter(items)
+    while True:
+        chunk = list(itertools.islice(it, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+# Sabit --batch-size yerine token bütçesine göre batch oluşturur. Girdi WINDOW'luk
+# pencerelerde okunur ve her pencere first-fit-decreasing ile paketlenir. Yanıt
+# MAX_TOKENS ile kesilir veya ID eksik dönerse makale başı çıktı tahmini büyütülür,
+# böylece sonraki batch'ler küçülür.
+class BatchPacker:
+    def __init__(self, instructions: str, max_input_tokens: int = 32_000,
+                 max_output_tokens: int = 6_000, max_articles: int = 50, window: int = 500,
+                 output_per_article: int = OUTPUT_TOKENS_PER_ARTICLE):
+        self.instruction_tokens = estimate_tokens(instructions)
+        self.max_input_tokens = max_input_tokens
+        self.max_output_tokens = min(max_output_tokens, SYNC_MAX_OUTPUT_TOKENS)
+        self.max_articles = max_articles
+        self.window = window
+        self.min_output_per_article = output_per_article
+        self.output_per_article = float(output_per_article)
+
+    @staticmethod
+    def article_tokens(a: Article) -> int:
+        return estimate_tokens(f"### id: {a.ID}\nBaşlık: {a.Title}\nYıl: {a.Year}\nÖzet: {a.Abstract}\n")
+
+    def capacity(self) -> int:
+        return max(1, min(self.max_articles, int(self.max_output_tokens // self.output_per_article)))
+
+    def pack(self, articles: Iterable[Article]) -> Iterator[List[Article]]:
+        for window in _chunked(articles, self.window):
+            yield from self._first_fit_decreasing(window)
+
+    def _first_fit_decreasing(self, window: List[Article]) -> List[List[Article]]:
+        budget = max(1, self.max_input_tokens - self.instruction_tokens)
+        cap = self.capacity()
+        sized = sorted(((self.article_tokens(a), i) for i, a in enumerate(window)), reverse=True)
+        bins: List[List[Any]] = []  # [kullanılan token, [girdi sırası, ...]]
+        for tokens, i in sized:
+            for b in bins:
+                if b[0] + tokens <= budget and len(b[1]) < cap:
+                    b[0] += tokens
+                    b[1].append(i)
+                    break
+            else:
+                bins.append([tokens, [i]])
+        # Batch içi ve batch'ler arası girdi sırası korunur
+        ordered = sorted(sorted(b[1]) for b in bins)
+        return [[window[i] for i in idx] for idx in ordered]
+
+    def feedback(self, requested: int, returned: int, truncated: bool) -> None:
+        if truncated or returned < requested:
+            self.output_per_article = min(self.output_per_article * 1.5, self.max_output_tokens)
+        else:
+            self.output_per_article = max(self.min_output_per_article, self.output_per_article * 0.95)
 
-    for bi in range(start_idx, len(batches)):
-        batch = batches[bi]
-        print(f"[Batch {bi+1}/{len(batches)}] {len(batch)} makale işleniyor "
-              f"(toplam: {len(results)}/{len(articles)})...")
+    def estimate_batches(self, count: int, article_tokens: int) -> int:
+        budget = max(1, self.max_input_tokens - self.instruction_tokens)
+        return max(-(-count // self.capacity()), -(-article_tokens // budget), 1 if count else 0)
 
-        prompt = build_batch_prompt(batch, instructions)
-        try:
-            data = call_gemini_sync(state.model_id, api_key, prompt)
-        except Exception as e:
-            print(f"  ❌ Batch {bi+1} hatası: {e}", file=sys.stderr)
-            print(f"  💾 Mevcut sonuçlar kaydedildi, devam etmek için --resume kullan")
-            save_state_fn(state)
-            break
 
-        usage = data.get("usageMetadata", {})
-        add_usage(state, usage.get("promptTokenCount", 0), usage.get("candidatesTokenCount", 0))
+def build_packer(args, instructions: str,
+                 output_per_article: int = OUTPUT_TOKENS_PER_ARTICLE) -> Optional[BatchPacker]:
+    if not args.pack:
+        return None
+    return BatchPacker(instructions, args.max_input_tokens, args.max_output_tokens,
+                       output_per_article=output_per_article)
 
-        text = (data.get("candidates", [{}])[0].get("content", {})
-                    .get("parts", [{}])[0].get("text", ""))
-        api_results = parse_model_response(text)
+
+def run_sync(articles: Iterable[Article], state: State, backend: Backend, instructions: str,
+             batch_size: int, delay_sec: float, save_state_fn,
+             concurrency: int = 1, limiter: Optional[RateLimiter] = None,
+             cache: Optional[ResponseCache] = None,
+             packer: Optional[BatchPacker] = None, max_retries: int = 2) -> List[Result]:
+    results: List[Result] = [Result(**r) for r in state.results]
+    start_idx = state.last_processed_batch_index + 1
+    concurrency = max(1, concurrency)
+    # Girdi akış olarak okunur; sonucu olan makaleler atlanır, liste hiç oluşturulmaz
+    done_ids = {r["id"] for r in state.results}
+    done_ids.update(q["article"]["ID"] for q in state.retry_queue)
+    remaining = (a for a in articles if a.ID not in done_ids)
+    batches = packer.pack(remaining) if packer else _chunked(remaining, batch_size)
+
+    # Batch'ler paralel gönderilir ama sonuçlar batch sırasıyla işlenir:
+    # last_processed_batch_index her zaman kesintisiz bir öneki gösterir.
+    pool = ThreadPoolExecutor(max_workers=concurrency)
+    pending: Dict[int, Any] = {}
+    next_submit = start_idx
+    requested_any = False
+
+    def finish(bi: int, batch: List[Article], cached: Dict[str, Any], requested: int,
+               data: Dict[str, Any], answered: bool, advance: bool = True) -> None:
+        add_response_usage(state, data)
+
+        candidate = data.get("candidates", [{}])[0]
+        text = candidate.get("content", {}).get("parts", [{}])[0].get("text", "")
+        api_results = parse_model_response(text) if answered else []
 
         api_by_id = {str(r.get("id")): r for r in api_results}
+        if packer and answered:
+            returned = sum(1 for a in batch if a.ID not in cached and str(a.ID) in api_by_id)
+            packer.feedback(requested, returned, candidate.get("finishReason") == "MAX_TOKENS")
+        if cache is not None:
+            cache.put_many([(a, api_by_id[str(a.ID)]) for a in batch
+                            if a.ID not in cached and str(a.ID) in api_by_id])
+        api_by_id.update(cached)
+        queued = 0
         for article in batch:
-            api_r = api_by_id.get(str(article.ID), {
-                "summary_tr": "API yanıtında bulunamadı",
-                "decision": "Uncertain",
-                "confidence": 0,
-                "matched_inclusion_criteria": [],
-                "matched_exclusion_criteria": [],
-                "needs_human_review": True,
-                "rationale": "Modelden yanıt alınamadı",
-            })
+            api_r = api_by_id.get(str(article.ID))
+            if api_r is None:
+                # Yanıtta olmayan makale sonuç yerine retry kuyruğuna gider
+                enqueue_retry(state, article, "API yanıtında bulunamadı")
+                queued += 1
+                continue
             r = merge_result(article, api_r)
             results.append(r)
             state.results.append(asdict(r))
 
-        state.last_processed_batch_index = bi
+        if advance:
+            state.last_processed_batch_index = bi
         save_state_fn(state)
-
-        print(f"  ✓ {len(batch)} sonuç eklendi | "
+        usage = data.get("usageMetadata", {})
+        metrics().inc("articles_done_total", len(batch) - queued)
+        metrics().set("inflight_requests", sum(1 for p in pending.values() if p[3]))
+        metrics().set("retry_queue_depth", len(state.retry_queue))
+        metrics().event("batch", index=bi, articles=len(batch), requested=requested,
+                        cached=len(cached), queued=queued,
+                        input_tokens=usage.get("promptTokenCount", 0),
+                        output_tokens=usage.get("candidatesTokenCount", 0),
+                        retry_queue=len(state.retry_queue),
+                        articles_per_min=round(metrics().articles_per_minute(), 1))
+
+        print(f"  ✓ {len(batch) - queued} sonuç eklendi"
+              + (f", {queued} retry kuyruğunda" if queued else "") + " | "
               f"Token: in={state.total_input_tokens:,} out={state.total_output_tokens:,} | "
-              f"Maliyet: ${state.total_cost_usd:.4f}")
-
-        if bi < len(batches) - 1 and delay_sec > 0:
-            time.sleep(delay_sec)
+              f"Maliyet: ${state.total_cost_usd:.4f}"
+              + (f" | Cache: {state.cache_hits} hit / {state.cache_misses} miss" if cache else ""))
+
+    def drain() -> None:
+        # Hata sonrası: başlamamış istekler iptal edilir, yoldakiler (ücreti ödenmiş)
+        # beklenir ve sonuçları kaydedilir. Önek bozulmasın diye indeks ilerletilmez.
+        for bi in sorted(pending):
+            batch, cached, requested, future = pending.pop(bi)
+            if future is not None and future.cancel():
+                continue
+            try:
+                data = future.result() if future else {}
+            except BACKEND_ERRORS as e:
+                print(f"  ❌ Batch {bi+1} hatası: {e}", file=sys.stderr)
+                continue
+            print(f"[Batch {bi+1}] yoldaki {len(batch)} makale işleniyor...")
+            finish(bi, batch, cached, requested, data, future is not None, advance=False)
 
+    try:
+        for bi in itertools.count(start_idx):
+            while len(pending) < concurrency:
+                chunk = next(batches, None)
+                if chunk is None:
+                    break
+                # Cache'te olan makaleler API'ye gitmez; tamamı cache'teyse istek atılmaz
+                cached, misses = _split_cached(chunk, cache, state)
+                future = None
+                if misses:
+                    # Tek iş parçacığında eski --delay davranışı korunur; paralelde limiter hız ayarlar
+                    if concurrency == 1 and delay_sec > 0 and requested_any:
+                        time.sleep(delay_sec)
+                    requested_any = True
+                    future = pool.submit(_request_sync_batch, state, backend,
+                                         misses, instructions, limiter)
+                pending[next_submit] = (chunk, cached, len(misses), future)
+                next_submit += 1
+            if bi not in pending:
+                break
+
+            batch, cached, requested, future = pending.pop(bi)
+            print(f"[Batch {bi+1}] {len(batch)} makale işleniyor "
+                  f"(toplam: {len(results)}/{state.total_count})...")
+            try:
+                data = future.result() if future else {}
+            except BACKEND_ERRORS as e:
+                print(f"  ❌ Batch {bi+1} hatası: {e}", file=sys.stderr)
+                drain()
+                save_state_fn(state)
+                print("  💾 Mevcut sonuçlar kaydedildi, devam etmek için --resume kullan")
+                return results
+            finish(bi, batch, cached, requested, data, future is not None)
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    retry_size = max(1, (packer.capacity() if packer else batch_size) // 2)
+    results += run_retry_queue(state, backend, instructions, retry_size, save_state_fn,
+                               max_retries, limiter, cache)
     return results
 
 
 # ============================================================
-# ASYNC MODE — BATCH API (50% discount, async, up to 24h)
+# RETRY QUEUE — yanıtta eksik / parse edilemeyen makaleler
 # ============================================================
-def submit_batch_job(model_id: str, api_key: str, articles: List[Article],
-                     instructions: str, state: State) -> str:
-    requests_payload = []
-    for article in articles:
-        key = str(article.ID)
-        state.batch_key_map[key] = asdict(article)
-        requests_payload.append({
-            "key": key,
-            "request": {
-                "contents": [{"parts": [{"text": build_batch_prompt([article], instructions)}]}],
-                "generationConfig": {
-                    "temperature": 0.2,
-                    "maxOutputTokens": 2048,
-                    "responseMimeType": "application/json",
-                },
-            },
-        })
-
-    url = f"{API_BASE}/models/{model_id}:batchGenerateContent?key={api_key}"
-    body = {
-        "batch": {
-            "display_name": f"screening-cli-{int(time.time())}",
-            "input_config": {"requests": {"requests": requests_payload}},
-        }
-    }
-    print(f"  → Submit: {len(requests_payload)} istek (inline)")
-    resp = requests.post(url, json=body, timeout=600)
-    if not resp.ok:
-        err = resp.json().get("error", {}).get("message", resp.text)
-        raise RuntimeError(f"Batch submit {resp.status_code}: {err}")
-    return resp.json()["name"]
-
-
-def fetch_batch_status(api_key: str, job_name: str) -> Dict[str, Any]:
-    url = f"{API_BASE}/{job_name}?key={api_key}"
-    resp = requests.get(url, timeout=60)
-    if not resp.ok:
-        err = resp.json().get("error", {}).get("message", resp.text)
-        raise RuntimeError(f"Status {resp.status_code}: {err}")
-    return resp.json()
+def enqueue_retry(state: State, article: Article, reason: str) -> None:
+    state.retry_queue.append({"article": asdict(article), "attempts": 0, "reason": reason})
+
+
+def run_retry_queue(state: State, backend: Backend, instructions: str, batch_size: int,
+                    save_state_fn, max_retries: int = 2,
+                    limiter: Optional[RateLimiter] = None,
+                    cache: Optional[ResponseCache] = None) -> List[Result]:
+    # Kuyruk, çalışmanın sonunda daha küçük sync batch'lerle işlenir. max_retries
+    # denemeden sonra hâlâ yanıt alınamayan makale incelemeye işaretli sonuç olarak yazılır.
+    done: List[Result] = []
+    if not state.retry_queue:
+        return done
+    print(f"\n🔁 Retry kuyruğu: {len(state.retry_queue)} makale "
+          f"(batch: {batch_size}, en fazla {max_retries} deneme)")
+    while state.retry_queue:
+        chunk, state.retry_queue = state.retry_queue[:batch_size], state.retry_queue[batch_size:]
+        done_before = len(done)
+        articles = [Article(**q["article"]) for q in chunk]
+        try:
+            data = _request_sync_batch(state, backend, articles, instructions, limiter)
+        except BACKEND_ERRORS as e:
+            state.retry_queue = chunk + state.retry_queue
+            print(f"  ❌ Retry hatası: {e}", file=sys.stderr)
+            save_state_fn(state)
+            return done
 
+        add_response_usage(state, data, tier="standard")
+        text = (data.get("candidates", [{}])[0].get("content", {})
+                    .get("parts", [{}])[0].get("text", ""))
+        api_by_id = {str(r.get("id")): r for r in parse_model_response(text)}
+        if cache is not None:
+            cache.put_many([(a, api_by_id[str(a.ID)]) for a in articles if str(a.ID) in api_by_id])
+
+        for q, article in zip(chunk, articles):
+            api_r = api_by_id.get(str(article.ID))
+            if api_r is None:
+                q["attempts"] += 1
+                if q["attempts"] < max_retries:
+                    state.retry_queue.append(q)
+                    continue
+                state.retry_failed += 1
+                api_r = _failed_api_result(f"{q['reason']} ({q['attempts']} retry sonrası)")
+            r = merge_result(article, api_r)
+            done.append(r)
+            state.results.append(asdict(r))
+        save_state_fn(state)
+        metrics().inc("articles_done_total", len(done) - done_before)
+        metrics().set("retry_queue_depth", len(state.retry_queue))
+        metrics().event("retry_batch", articles=len(chunk), retry_queue=len(state.retry_queue),
+                        failed_total=state.retry_failed)
+        print(f"  ✓ Retry: {len(chunk)} makale denendi, kuyrukta {len(state.retry_queue)} kaldı")
+    return done
 
-def poll_batch_job(api_key: str, state: State, save_state_fn,
-                   poll_interval: int = 60) -> Dict[str, Any]:
-    print(f"\n⏳ Batch job polling başlıyor: {state.batch_job_name}")
-    print(f"   Polling aralığı: {poll_interval}s. Ctrl+C ile durdurabilirsin (state kaydedilir).")
 
-    start = state.batch_submitted_at or time.time()
-    while True:
-        try:
-            job = fetch_batch_status(api_key, state.batch_job_name)
-        except Exception as e:
-            print(f"  ⚠️  Status fetch hatası: {e}, 30s sonra tekrar...")
-            time.sleep(30)
+# ============================================================
+# ASYNC MODE — BATCH API (50% discount, async, up to 24h)
+# ============================================================
+BATCH_PROCESSED = "PROCESSED"  # job çıktısı state'e işlendi
+BATCH_SHARD_SIZE = 10_000      # job başına istek sayısı
+DOWNLOAD_SAVE_EVERY = 1000     # çıktı işlenirken kaç satırda bir state kaydedilir
+POLL_MIN_INTERVAL = 5.0        # ilk status sorgusu; --poll-interval'a kadar büyür
+POLL_BACKOFF = 1.5
+POLL_ERROR_MAX = 600.0
+BATCH_DONE_STATES = ("JOB_STATE_SUCCEEDED", "SUCCEEDED")
+BATCH_FAILED_STATES = ("JOB_STATE_FAILED", "FAILED", "JOB_STATE_CANCELLED", "CANCELLED",
+                       "JOB_STATE_EXPIRED", "EXPIRED")
+
+
+def prepare_batch_shards(articles: Iterable[Article], instructions: str, state: State,
+                         shard_base: Path, shard_size: int = BATCH_SHARD_SIZE,
+                         cache: Optional[ResponseCache] = None) -> int:
+    # İstekler bellekte toplanmadan JSONL shard dosyalarına yazılır; her shard
+    # ayrı bir batch job olur. Yüklenmemiş shard'lar resume'da gönderilir.
+    out = None
+    count = 0
+    for chunk in _chunked(articles, 500):
+        cached, misses = _split_cached(chunk, cache, state)
+        for article in chunk:
+            if article.ID in cached:
+                state.results.append(asdict(merge_result(article, cached[article.ID])))
+        for article in misses:
+            if out is None or count >= shard_size:
+                if out is not None:
+                    out.close()
+                path = shard_base.with_name(f"{shard_base.name}.shard{len(state.batch_jobs)}.jsonl")
+                state.batch_jobs.append({"name": "", "state": "", "file": str(path), "requests": 0})
+                out = path.open("w", encoding="utf-8")
+                count = 0
+            out.write(json.dumps(_batch_request_entry(article, instructions, state),
+                                 ensure_ascii=False) + "\n")
+            state.batch_jobs[-1]["requests"] += 1
+            count += 1
+    if out is not None:
+        out.close()
+    return len(state.batch_jobs)
+
+
+def submit_batch_shards(model_id: str, backend: Backend, state: State, save_state_fn) -> None:
+    for i, job in enumerate(state.batch_jobs):
+        if job["name"]:
             continue
-
-        st = (job.get("metadata") or {}).get("state", "UNKNOWN")
-        state.batch_last_state = st
+        path = Path(job["file"])
+        file_name = backend.upload_file(path, f"screening-{state.prompt_hash}-{i}")
+        job["name"] = backend.create_batch(model_id, file_name,
+                                           f"screening-cli-{int(time.time())}-{i}")
+        job["state"] = "JOB_STATE_PENDING"
+        state.batch_submitted_at = state.batch_submitted_at or time.time()
         save_state_fn(state)
+        path.unlink(missing_ok=True)
+        print(f"  ✓ Job {i + 1}/{len(state.batch_jobs)}: {job['name']} ({job['requests']:,} istek)")
 
-        elapsed = int((time.time() - start) / 60)
-        print(f"  [{elapsed:>3} dk] {st}")
 
-        if st in ("JOB_STATE_SUCCEEDED", "SUCCEEDED"):
-            return job
-        if st in ("JOB_STATE_FAILED", "FAILED", "JOB_STATE_CANCELLED", "CANCELLED"):
-            raise RuntimeError(f"Batch job durdu: {st}. {job.get('error', {}).get('message', '')}")
-
-        time.sleep(poll_interval)
+def _batch_request_entry(article: Article, instructions: str, state: State) -> Dict[str, Any]:
+    key = str(article.ID)
+    state.batch_key_map[key] = asdict(article)
+    text = (build_articles_prompt([article]) if state.context_cache_name
+            else build_batch_prompt([article], instructions))
+    request: Dict[str, Any] = {
+        "contents": [{"parts": [{"text": text}]}],
+        "generationConfig": {
+            "temperature": 0.2,
+            "maxOutputTokens": 2048,
+            "responseMimeType": "application/json",
+            "responseSchema": response_schema(state.compact_response, state.decision_only),
+        },
+    }
+    if state.context_cache_name:
+        request["cachedContent"] = state.context_cache_name
+    return {"key": key, "request": request}
 
 
-def process_batch_results(job: Dict[str, Any], state: State, api_key: str) -> List[Result]:
-    results: List[Result] = []
-    inlined = (job.get("response") or {}).get("inlinedResponses", {}).get("inlinedResponses", [])
+def _job_open(job: Dict[str, Any]) -> bool:
+    return job["state"] != BATCH_PROCESSED and job["state"] not in BATCH_FAILED_STATES
 
-    if not inlined:
-        responses_file = (job.get("response") or {}).get("responsesFile")
-        if responses_file:
-            return _process_results_file(responses_file, state, api_key)
 
-    for item in inlined:
-        key = item.get("key", "")
-        article_dict = state.batch_key_map.get(key)
-        if not article_dict:
-            continue
-        article = Article(**article_dict)
+def poll_batch_jobs(backend: Backend, state: State, save_state_fn, poll_interval: int = 60,
+                    cache: Optional[ResponseCache] = None,
+                    stop: Optional[Callable[[List[Dict[str, Any]]], bool]] = None) -> None:
+    # Tüm shard job'ları tek döngüde izlenir. Her job'ın kendi sorgu zamanı vardır:
+    # aralık POLL_MIN_INTERVAL'dan başlayıp --poll-interval'a doğru büyür, hata
+    # alınca ikiye katlanır. State yalnızca bir job'ın durumu değişince yazılır.
+    # stop(açık job'lar) True dönerse izleme job'lar bitmeden bırakılır (hibrit mod).
+    open_jobs = [j for j in state.batch_jobs if j["name"] and _job_open(j)]
+    if not open_jobs:
+        return
+    print(f"\n⏳ Batch job polling başlıyor: {len(open_jobs)} job")
+    print(f"   Polling: {POLL_MIN_INTERVAL:.0f}s → {poll_interval}s. "
+          f"Ctrl+C ile durdurabilirsin (state kaydedilir).")
 
-        response = item.get("response") or {}
-        text = (response.get("candidates", [{}])[0].get("content", {})
-                        .get("parts", [{}])[0].get("text", ""))
+    start = state.batch_submitted_at or time.time()
+    ceiling = max(POLL_MIN_INTERVAL, float(poll_interval))
+    delay = {j["name"]: min(POLL_MIN_INTERVAL, ceiling) for j in open_jobs}
+    due = {j["name"]: 0.0 for j in open_jobs}
+    while open_jobs:
+        changed = False
+        for job in open_jobs:
+            name = job["name"]
+            if due[name] > time.time():
+                continue
+            try:
+                data = backend.get_batch(name)
+            except BACKEND_ERRORS as e:
+                delay[name] = min(POLL_ERROR_MAX, max(delay[name], POLL_MIN_INTERVAL) * 2)
+                due[name] = time.time() + delay[name]
+                print(f"  ⚠️  Status fetch hatası ({name}): {e}, {delay[name]:.0f}s sonra tekrar")
+                continue
+            delay[name] = min(ceiling, delay[name] * POLL_BACKOFF)
+            due[name] = time.time() + delay[name]
+
+            new_state = (data.get("metadata") or {}).get("state", "UNKNOWN")
+            if new_state == job["state"] and new_state not in BATCH_DONE_STATES:
+                continue
+            job["state"] = new_state
+            changed = True
+            if new_state in BATCH_DONE_STATES:
+                try:
+                    process_batch_results(data, job, state, backend, save_state_fn, cache)
+                except (requests.RequestException, RuntimeError) as e:
+                    # Job açık kalır; sonraki turda indirme kaldığı byte'tan sürer
+                    print(f"  ⚠️  Çıktı indirme hatası ({name}): {e}")
+                    save_state_fn(state)
+                    continue
+                job["state"] = BATCH_PROCESSED
+            elif new_state in BATCH_FAILED_STATES:
+                err = (data.get("error") or {}).get("message", "")
+                print(f"  ❌ Batch job durdu: {name} {new_state}. {err}", file=sys.stderr)
+            save_state_fn(state)
 
-        if text:
-            parsed = parse_model_response(text)
-            api_r = parsed[0] if parsed else _failed_api_result("Parse hatası")
-            usage = response.get("usageMetadata", {})
-            add_usage(state, usage.get("promptTokenCount", 0), usage.get("candidatesTokenCount", 0))
-        else:
-            err_msg = (item.get("error") or {}).get("message", "Boş yanıt")
-            api_r = _failed_api_result(err_msg)
+        open_jobs = [j for j in open_jobs if _job_open(j)]
+        if changed:
+            elapsed = int((time.time() - start) / 60)
+            done = len(state.batch_jobs) - len(open_jobs)
+            states = collections.Counter(j["state"] for j in open_jobs)
+            print(f"  [{elapsed:>3} dk] {done}/{len(state.batch_jobs)} job bitti"
+                  + "".join(f" | {k}: {v}" for k, v in states.items()))
+        if open_jobs and stop is not None and stop(open_jobs):
+            return
+        if open_jobs:
+            time.sleep(max(0.0, min(due[j["name"]] for j in open_jobs) - time.time()))
+
+
+def process_batch_results(data: Dict[str, Any], job: Dict[str, Any], state: State,
+                          backend: Backend, save_state_fn,
+                          cache: Optional[ResponseCache] = None) -> int:
+    response = data.get("response") or {}
+    inlined = response.get("inlinedResponses", {}).get("inlinedResponses", [])
+    if not inlined and response.get("responsesFile"):
+        return _process_results_file(response["responsesFile"], job, state, backend,
+                                     save_state_fn, cache)
+    for item in inlined:
+        _consume_batch_item(item, state, cache)
+    return len(inlined)
+
+
+def finish_async(state: State, backend: Backend, instructions: str, args, save_state_fn,
+                 cache: Optional[ResponseCache] = None) -> List[Result]:
+    # Çıktıda yer almayan ya da başarısız job'lardaki makaleler sync retry ile tamamlanır
+    done = {str(r["id"]) for r in state.results}
+    done.update(str(q["article"]["ID"]) for q in state.retry_queue)
+    missing = [k for k in state.batch_key_map if k not in done]
+    for key in missing:
+        enqueue_retry(state, Article(**state.batch_key_map[key]), "Batch çıktısında yok")
+    if missing:
+        save_state_fn(state)
+    limiter = build_rate_limiter(state.model_id, args.rpm, args.tpm)
+    run_retry_queue(state, backend, instructions, args.batch_size, save_state_fn,
+                    args.max_retries, limiter, cache)
+    return [Result(**r) for r in state.results]
+
+
+def _job_output_path(job: Dict[str, Any]) -> Path:
+    if job.get("file"):
+        return Path(job["file"]).with_suffix(".out.jsonl")
+    return Path(f".screening_{job['name'].replace('/', '_')}.out.jsonl")
+
+
+def _process_results_file(file_name: str, job: Dict[str, Any], state: State, backend: Backend,
+                          save_state_fn, cache: Optional[ResponseCache] = None) -> int:
+    # job["offset"]: işlenmiş son satırın bittiği byte. Sonuçlar ve offset aynı
+    # kayıtla kalıcı olur; kesintide ne tekrar işlenir ne de atlanır.
+    dest = _job_output_path(job)
+    if not job.get("downloaded"):
+        backend.download_file(file_name, dest)
+        job["downloaded"] = True
+        save_state_fn(state)
 
-        r = merge_result(article, api_r)
-        results.append(r)
-        state.results.append(asdict(r))
+    consumed = 0
+    with dest.open("rb") as f:
+        f.seek(job.get("offset", 0))
+        for raw in f:
+            line = raw.strip()
+            try:
+                item = json.loads(line) if line else None
+            except json.JSONDecodeError:
+                item = None
+            if item is not None:
+                _consume_batch_item(item, state, cache)
+                consumed += 1
+            job["offset"] = job.get("offset", 0) + len(raw)
+            if item is not None and consumed % DOWNLOAD_SAVE_EVERY == 0:
+                save_state_fn(state)
+    save_state_fn(state)
+    dest.unlink(missing_ok=True)
+    return consumed
+
+
+def _consume_batch_item(item: Dict[str, Any], state: State,
+                        cache: Optional[ResponseCache] = None) -> Optional[Result]:
+    key = item.get("key", "")
+    article_dict = state.batch_key_map.get(key)
+    if not article_dict:
+        return None
+    article = Article(**article_dict)
 
-    return results
+    response = item.get("response") or {}
+    text = (response.get("candidates", [{}])[0].get("content", {})
+                    .get("parts", [{}])[0].get("text", ""))
 
+    parsed = []
+    if text:
+        parsed = parse_model_response(text)
+        add_response_usage(state, response, tier="batch")
+    if not parsed:
+        reason = "Parse hatası" if text else (item.get("error") or {}).get("message", "Boş yanıt")
+        enqueue_retry(state, article, reason)
+        return None
+    api_r = parsed[0]
+    if cache is not None:
+        cache.put_many([(article, api_r)])
 
-def _process_results_file(file_name: str, state: State, api_key: str) -> List[Result]:
-    print(f"  → Output file indiriliyor: {file_name}")
-    url = f"{API_BASE}/{file_name}:download?alt=media&key={api_key}"
-    resp = requests.get(url, timeout=600)
-    if not resp.ok:
-        raise RuntimeError(f"File fetch {resp.status_code}")
-    results: List[Result] = []
-    for line in resp.text.split("\n"):
-        line = line.strip()
-        if not line:
-            continue
-        try:
-            item = json.loads(line)
-        except json.JSONDecodeError:
-            continue
-        key = item.get("key", "")
-        article_dict = state.batch_key_map.get(key)
-        if not article_dict:
-            continue
-        article = Article(**article_dict)
-        response = item.get("response") or {}
-        text = (response.get("candidates", [{}])[0].get("content", {})
-                        .get("parts", [{}])[0].get("text", ""))
-        if text:
-            parsed = parse_model_response(text)
-            api_r = parsed[0] if parsed else _failed_api_result("Parse hatası")
-            usage = response.get("usageMetadata", {})
-            add_usage(state, usage.get("promptTokenCount", 0), usage.get("candidatesTokenCount", 0))
-        else:
-            err_msg = (item.get("error") or {}).get("message", "Boş yanıt")
-            api_r = _failed_api_result(err_msg)
-        r = merge_result(article, api_r)
-        results.append(r)
-        state.results.append(asdict(r))
-    return results
+    r = merge_result(article, api_r)
+    state.results.append(asdict(r))
+    metrics().inc("articles_done_total")
+    return r
 
 
 def _failed_api_result(reason: str) -> Dict[str, Any]:
@@ -657,39 +2576,400 @@ def _failed_api_result(reason: str) -> Dict[str, Any]:
 
 
 # ============================================================
-# COST ESTIMATION (PRE-RUN)
+# HYBRID MODE — öncelikli dilim sync, kalan Batch API; hedef süreye göre bölme
 # ============================================================
-def estimate_tokens(text: str) -> int:
-    return max(1, len(text) // 4)
+BATCH_ETA_MIN = 24 * 60       # Batch API'nin hedef tamamlanma süresi (dakika, SLA)
+SYNC_REQUEST_SECONDS = 20.0   # planlamada bir sync isteğin varsayılan süresi
+TAKEOVER_MARGIN = 1.2         # devralma, kalan sync süresinin bu katı kadar önce başlar
+RATE_MIN_SAMPLE = 20          # ölçülen sync hızının plana yazılması için en az makale
+
+
+def sync_throughput(args, model_id: str, per_request: int, keys: int = 1) -> float:
+    # Makale/dakika: paralel istek sayısı ve rpm limitinin (key başına) darı belirler
+    rpm = MODELS[model_id]["rpm"] if args.rpm is None else args.rpm
+    requests_per_min = max(1, args.concurrency) * 60 / SYNC_REQUEST_SECONDS
+    if rpm:
+        requests_per_min = min(requests_per_min, rpm * keys)
+    return requests_per_min * per_request
+
+
+def plan_hybrid(count: int, rate: float, priority: int, deadline_min: float = 0,
+                batch_eta_min: float = BATCH_ETA_MIN) -> int:
+    # Sync'e gidecek makale sayısı. Batch %50 ucuz olduğundan hedef süre içinde
+    # bitmesi bekleniyorsa yalnız öncelikli dilim sync taranır; beklenmiyorsa
+    # hedef süreye sığan kadar makale sync'e alınır, kalanı yine batch'e gider.
+    n = min(priority, count)
+    if not deadline_min or batch_eta_min <= deadline_min:
+        return n
+    return min(count, max(n, int(rate * deadline_min)))
+
+
+def should_take_over(left: int, rate: float, deadline: float, batch_due: float,
+                     now: float) -> bool:
+    # Açık job'lar yalnız sync kalan makaleleri hedef süreden önce bitirebiliyorsa ve
+    # batch beklenen süresinin gerisindeyse (hedefe yetişmesi beklenmiyor ya da beklenen
+    # bitişi geçti) iptal edilir; devralma son güvenli ana kadar ertelenir. Sync de
+    # yetişemeyecekse job'lar %50 ucuz fiyatla çalışmaya devam eder.
+    sync_sec = left / max(rate, 1e-9) * 60
+    if now + sync_sec > deadline:
+        return False
+    behind = batch_due > deadline or now > batch_due
+    return behind and now + sync_sec * TAKEOVER_MARGIN >= deadline
+
+
+def print_hybrid_plan(plan: Dict[str, Any], count: int, deadline_min: float,
+                      batch_eta_min: float) -> None:
+    n, rate = plan["sync_count"], plan["rate"]
+    print(f"🔀 Hibrit: {n:,} makale sync (öncelikli dilim), {count - n:,} makale Batch API "
+          f"| tahmini sync hızı ~{rate:,.0f} makale/dk")
+    if not deadline_min:
+        return
+    if n / max(rate, 1e-9) > deadline_min:
+        print(f"⚠️  Sync dilimi hedef süreye sığmıyor (~{n / rate:,.0f} dk > {deadline_min:g} dk)")
+    if batch_eta_min > deadline_min and n < count:
+        print(f"⚠️  Batch API'nin {batch_eta_min:g} dk içinde bitmesi beklenmiyor ve sync kapasitesi "
+              f"yetmiyor: {count - n:,} makale hedef süreden sonra bitebilir")
+    elif n < count:
+        print(f"   Batch job'lar {deadline_min:g} dk hedefine yetişmezse kalan makaleleri sync devralır")
+
+
+def dedupe_results(state: State) -> int:
+    # Sync ve batch'ten gelen sonuçlar ID'ye göre tekilleştirilir (ilk gelen kalır)
+    seen: set = set()
+    kept = []
+    for r in state.results:
+        if r["id"] not in seen:
+            seen.add(r["id"])
+            kept.append(r)
+    removed = len(state.results) - len(kept)
+    if removed:
+        state.results = kept
+    return removed
+
 
+# ============================================================
+# TWO-PASS SCREENING — ucuz modelle yalnız karar, seçilenlerde ayrıntılı tarama
+# ============================================================
+def needs_second_pass(result: Dict[str, Any], threshold: float) -> bool:
+    # Yalnız yüksek güvenli Exclude kararları 1. geçişte kesinleşir; ön eleme ve önceki
+    # çıktıdan aktarılan sonuçlar zaten kesindir
+    if str(result.get("rationale", "")).startswith(PREFILTER_TAG) or result.get("provenance"):
+        return False
+    conf = result.get("confidence")
+    return result.get("decision") != "Exclude" or conf is None or conf < threshold
+
+
+def start_second_pass(state: State, prompt_hash: str) -> int:
+    # 1. geçiş kapanır: kesinleşen sonuçlar kalır, diğerleri state'ten çıkarılır ve
+    # run_sync / prepare_batch_shards tarafından "işlenmemiş" olarak yeniden taranır.
+    kept: List[Dict[str, Any]] = []
+    for r in state.results:
+        if not needs_second_pass(r, state.second_pass_threshold):
+            r["rationale"] = r.get("rationale") or f"{FIRST_PASS_TAG} · {state.model_id}] yalnız karar taraması"
+            r["prompt_version"] = r.get("prompt_version") or state.prompt_hash
+            kept.append(r)
+    state.first_pass = {
+        "model_id": state.model_id,
+        "prompt_hash": state.prompt_hash,
+        "input_tokens": state.total_input_tokens,
+        "output_tokens": state.total_output_tokens,
+        "cost_usd": state.total_cost_usd,
+        "screened": len(state.results),
+        "escalated": len(state.results) - len(kept),
+    }
+    state.results = kept
+    state.screening_pass = 2
+    state.model_id = state.second_pass_model
+    state.prompt_hash = prompt_hash
+    state.last_processed_batch_index = -1
+    state.batch_jobs, state.batch_key_map, state.batch_submitted_at = [], {}, 0.0
+    state.context_cache_name, state.context_cache_tokens, state.context_cache_expires = "", 0, 0.0
+    metrics().event("second_pass", **state.first_pass)
+    return state.first_pass["escalated"]
 
-def print_cost_estimate(articles: List[Article], state: State, instructions: str,
-                        batch_size: int) -> None:
+
+# ============================================================
+# ENSEMBLE — düşük güvenli kararlarda çoklu örnekle oylama (self-consistency)
+# ============================================================
+# Tarama bitince güveni eşiğin altındaki / Uncertain makaleler için k örnek
+# (model × sıcaklık) yalnız-karar şemasıyla paralel istenir; ilk karar da bir oy
+# sayılır. Oylanan satırlar gerekçe önekiyle işaretlenir, resume'da atlanır.
+def ensemble_voters(models: List[str], temperatures: List[float], k: int) -> List[List[Any]]:
+    # [model, sıcaklık] çiftleri: ardışık örnekler hem model hem sıcaklıkta farklılaşır,
+    # tüm kombinasyonlar bitmeden tekrar yapılmaz
+    step = math.lcm(len(models), len(temperatures))
+    combos = [[models[d % len(models)], temperatures[(d + d // step) % len(temperatures)]]
+              for d in range(len(models) * len(temperatures))]
+    return [combos[i % len(combos)] for i in range(k)]
+
+
+def needs_vote(result: Dict[str, Any], threshold: float) -> bool:
+    # Ön eleme, önceki çıktıdan aktarılan, zaten oylanmış ve hata satırları oylanmaz
+    rationale = str(result.get("rationale", ""))
+    if (result.get("provenance") or rationale.startswith((PREFILTER_TAG, ENSEMBLE_TAG))
+            or result.get("summary_tr") == "Hata"):
+        return False
+    conf = result.get("confidence")
+    return result.get("decision") == "Uncertain" or conf is None or conf < threshold
+
+
+def aggregate_votes(votes: List[Dict[str, Any]], method: str) -> tuple:
+    # (karar, kazananın oy payı); eşitlikte Uncertain. weighted: oy ağırlığı = güven
+    weight: collections.Counter = collections.Counter()
+    for v in votes:
+        if v.get("decision") not in DECISIONS:
+            continue
+        conf = v.get("confidence")
+        weight[v["decision"]] += ((conf if isinstance(conf, (int, float)) else 0.5)
+                                  if method == "weighted" else 1)
+    total = sum(weight.values())
+    if not total:
+        return "Uncertain", 0.0
+    ranked = weight.most_common(2)
+    decision = ranked[0][0] if len(ranked) == 1 or ranked[0][1] > ranked[1][1] else "Uncertain"
+    return decision, round(weight[decision] / total, 2)
+
+
+def apply_votes(result: Dict[str, Any], samples: List[Dict[str, Any]], method: str,
+                threshold: float) -> bool:
+    # Sonucu yerinde günceller; karar değiştiyse True
+    votes = [result] + samples
+    decision, share = aggregate_votes(votes, method)
+    agree = [v for v in votes if v.get("decision") == decision]
+
+    def codes(key: str) -> List[str]:
+        # Kazanan kararı veren oyların en az yarısında geçen ölçütler
+        counts = collections.Counter(c for v in agree for c in v.get(key) or [])
+        return [c for c, n in counts.items() if 2 * n >= len(agree)]
+
+    tally = collections.Counter(v.get("decision") for v in votes)
+    tag = (f"{ENSEMBLE_TAG} {len(agree)}/{len(votes)} · "
+           + ", ".join(f"{d} {n}" for d, n in tally.most_common()) + "]")
+    previous = result["decision"]
+    result.update(
+        decision=decision,
+        confidence=share,
+        matched_inclusion_criteria=codes("matched_inclusion_criteria") if agree else [],
+        matched_exclusion_criteria=codes("matched_exclusion_criteria") if agree else [],
+        needs_human_review=decision == "Uncertain" or share < threshold,
+        rationale=f"{tag} " + (f"ilk karar {previous}; " if decision != previous else "")
+                  + str(result.get("rationale", "")),
+    )
+    return decision != previous
+
+
+def _request_vote(backend: Backend, model_id: str, temperature: float, articles: List[Article],
+                  instructions: str, compact: bool,
+                  limiter: Optional[RateLimiter]) -> Dict[str, Any]:
+    prompt = build_batch_prompt(articles, instructions)
+    if limiter:
+        limiter.acquire(estimate_tokens(prompt))
+    return call_gemini_sync(backend, model_id, prompt, compact=compact, decision_only=True,
+                            temperature=temperature)
+
+
+def run_ensemble(args, state: State, backend: Backend, inclusion: List[Dict],
+                 exclusion: List[Dict], save_fn) -> int:
+    cfg = state.ensemble
+    # Satırlar yerinde güncellenir; indeksleri journal'a değişiklik kaydı olarak yazılır
+    pending = [(i, r) for i, r in enumerate(state.results) if needs_vote(r, cfg["threshold"])]
+    if not pending:
+        return 0
+    voters = cfg["voters"]
+    instructions = build_instructions(inclusion, exclusion, state.compact_response, decision_only=True)
+    # Havuz kullanılıyorsa hız sınırı anahtar başına havuzda uygulanır
+    limiters = {m: None if isinstance(backend, PooledBackend) else build_rate_limiter(m, args.rpm, args.tpm)
+                for m, _ in voters}
+    workers = max(1, args.concurrency) * len(voters)
+    print(f"\n🗳️  Oylama: {len(pending):,} makale (güven < {cfg['threshold']:g} / Uncertain) × "
+          f"{len(voters)} örnek ({', '.join(f'{m}@{t:g}' for m, t in voters)}) | "
+          f"{cfg['method']} | paralel istek: {workers}")
+
+    batches = list(_chunked(pending, args.batch_size))
+    pool = ThreadPoolExecutor(max_workers=workers)
+    try:
+        futures = [[pool.submit(_request_vote, backend, m, t,
+                                [Article(r["id"], r["title"], r["abstract"], r["authors"], r["year"])
+                                 for _, r in batch],
+                                instructions, state.compact_response, limiters[m])
+                    for m, t in voters] for batch in batches]
+        for bi, (batch, batch_futures) in enumerate(zip(batches, futures)):
+            samples: Dict[str, List[Dict[str, Any]]] = collections.defaultdict(list)
+            for (model_id, _), future in zip(voters, batch_futures):
+                try:
+                    data = future.result()
+                except BACKEND_ERRORS as e:
+                    print(f"  ⚠️  Oy isteği başarısız ({model_id}): {e}", file=sys.stderr)
+                    continue
+                cost = state.total_cost_usd
+                usage = data.get("usageMetadata", {})
+                add_usage(state, usage.get("promptTokenCount", 0), usage.get("candidatesTokenCount", 0),
+                          "standard", usage.get("cachedContentTokenCount", 0),
+                          data.get(FALLBACK_MODEL_KEY) or model_id)
+                cfg["cost_usd"] += state.total_cost_usd - cost
+                cfg["requests"] += 1
+                text = data.get("candidates", [{}])[0].get("content", {}).get("parts", [{}])[0].get("text", "")
+                for s in map(expand_compact, parse_model_response(text)):
+                    samples[str(s.get("id"))].append(s)
+            changed, updated = 0, []
+            for i, r in batch:
+                # Hiç oy dönmeyen makale işaretlenmez, sonraki çalıştırmada yeniden denenir
+                if samples.get(r["id"]):
+                    changed += apply_votes(r, samples[r["id"]], cfg["method"], cfg["threshold"])
+                    cfg["voted"] += 1
+                    updated.append(i)
+            cfg["changed"] += changed
+            save_fn(state, updated)
+            metrics().event("ensemble_batch", index=bi, articles=len(batch), changed=changed,
+                            requests=cfg["requests"], cost_usd=round(cfg["cost_usd"], 6))
+            print(f"  [Oylama {bi + 1}/{len(batches)}] {len(batch)} makale, {changed} karar değişti "
+                  f"| Oylama maliyeti: ${cfg['cost_usd']:.4f}")
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+    print(f"🗳️  Oylama tamamlandı: {cfg['voted']:,} makale, {cfg['changed']:,} karar değişti")
+    return cfg["voted"]
+
+
+# ============================================================
+# COST ESTIMATION (PRE-RUN)
+# ============================================================
+@dataclass
+class ArticleStats:
+    count: int = 0
+    article_tokens: int = 0
+    file_hash: str = ""
+    cached: int = 0
+    prefiltered: int = 0
+    carried: int = 0
+
+
+def summarize_articles(articles: Iterable[Article],
+                       cache: Optional[ResponseCache] = None,
+                       skip: Optional[set] = None,
+                       carried: Optional[set] = None) -> ArticleStats:
+    # Tek geçişte sayım + token tahmini + dosya hash'i (girdi belleğe alınmaz).
+    # skip: ön elemeyle, carried: önceki çıktıdan aktarılarak API'ye gitmeyecek ID'ler
+    # (sayılır ama token/cache'e girmez)
+    stats = ArticleStats()
+    h = hashlib.sha256()
+    for chunk in _chunked(articles, 500):
+        for a in chunk:
+            stats.count += 1
+            h.update((a.ID + a.Title).encode("utf-8"))
+        if skip:
+            kept = [a for a in chunk if a.ID not in skip]
+            stats.prefiltered += len(chunk) - len(kept)
+            chunk = kept
+        if carried:
+            kept = [a for a in chunk if a.ID not in carried]
+            stats.carried += len(chunk) - len(kept)
+            chunk = kept
+        for a in chunk:
+            stats.article_tokens += estimate_tokens(a.Title + a.Abstract + a.Year)
+        if cache is not None and chunk:
+            stats.cached += len(cache.get_many(chunk, touch=False))
+    stats.file_hash = h.hexdigest()[:16]
+    return stats
+
+
+def _pass_cost(model_id: str, sync_input: int, async_input: int, output_total: int) -> tuple:
+    m = MODELS[model_id]
+    return ((sync_input / 1e6) * m["standard"]["input"] + (output_total / 1e6) * m["standard"]["output"],
+            (async_input / 1e6) * m["batch"]["input"] + (output_total / 1e6) * m["batch"]["output"])
+
+
+def print_cost_estimate(stats: ArticleStats, state: State, instructions: str,
+                        batch_size: int, packer: Optional[BatchPacker] = None,
+                        context_cache_ttl: int = 0, second_pass_instructions: str = "",
+                        hybrid_share: Optional[float] = None,
+                        ensemble_instructions: str = "") -> None:
     instr_tokens = estimate_tokens(instructions)
-    avg_article_tokens = sum(estimate_tokens(a.Title + a.Abstract + a.Year)
-                             for a in articles) // max(1, len(articles))
-    n = len(articles)
-    num_batches = (n + batch_size - 1) // batch_size
+    avg_article_tokens = stats.article_tokens // max(1, stats.count - stats.prefiltered - stats.carried)
+    # cache'teki / ön elenen / önceki çıktıdan aktarılan makaleler API'ye gitmez
+    n = stats.count - stats.cached - stats.prefiltered - stats.carried
+    num_batches = (packer.estimate_batches(n, n * avg_article_tokens) if packer
+                   else (n + batch_size - 1) // batch_size)
 
     sync_input = num_batches * instr_tokens + n * avg_article_tokens
     async_input = n * (instr_tokens + avg_article_tokens)
-    output_total = n * 200
+    output_per_article = output_tokens_per_article(state.compact_response, state.decision_only)
+    output_total = n * output_per_article
 
     m = MODELS[state.model_id]
-    sync_cost = (sync_input / 1e6) * m["standard"]["input"] + (output_total / 1e6) * m["standard"]["output"]
-    batch_cost = (async_input / 1e6) * m["batch"]["input"] + (output_total / 1e6) * m["batch"]["output"]
+    sync_cost, batch_cost = _pass_cost(state.model_id, sync_input, async_input, output_total)
 
     print("\n" + "═" * 60)
     print("💰 MALİYET TAHMİNİ")
     print("═" * 60)
-    print(f"Toplam makale:          {n:,}")
+    print(f"Toplam makale:          {stats.count:,}")
+    if stats.prefiltered:
+        print(f"Ön elemeyle Exclude:    {stats.prefiltered:,} (BM25, API'ye gitmez)")
+    if stats.carried:
+        print(f"Önceki çıktıdan:        {stats.carried:,} (aktarılır, API'ye gitmez)")
+    if stats.cached or stats.prefiltered or stats.carried:
+        print(f"Cache'te (ücretsiz):    {stats.cached:,} → API'ye gidecek: {n:,}")
     print(f"Tahmini input token:    ~{sync_input:,} (sync) / ~{async_input:,} (async)")
     print(f"Tahmini output token:   ~{output_total:,}")
+    if state.compact_response and not state.decision_only:
+        saved = 1 - output_per_article / OUTPUT_TOKENS_PER_ARTICLE
+        print(f"Kompakt yanıt:          ~{output_per_article} output token/makale "
+              f"(tam anahtarlı şemaya göre -%{saved * 100:.0f})")
+    print(f"Sync istek sayısı:      ~{num_batches:,}" + (" (token bütçeli paketleme)" if packer else ""))
     print(f"")
     sel_marker = "← seçili" if state.mode == "sync" else ""
     print(f"Sync (Standard tier):   ${sync_cost:.4f}  {sel_marker}")
     sel_marker = "← seçili" if state.mode == "async" else ""
     print(f"Async Batch API (-%50): ${batch_cost:.4f}  {sel_marker}")
+    if hybrid_share is not None:
+        n_sync = round(n * hybrid_share)
+        print(f"{f'Hibrit ({n_sync:,} sync):':<24}"
+              f"${sync_cost * hybrid_share + batch_cost * (1 - hybrid_share):.4f}  ← seçili")
+    if context_cache_ttl:
+        spec = m.get("cache")
+        if not spec or instr_tokens < spec["min_tokens"]:
+            print(f"Context cache:          kullanılamaz (talimat ~{instr_tokens:,} token, "
+                  f"model minimumu: {spec['min_tokens'] if spec else '—'})")
+        else:
+            # Talimat tokenları istek başına cache fiyatından + TTL boyunca depolama ücreti
+            storage = instr_tokens / 1e6 * spec["storage_hour"] * context_cache_ttl / 3600
+            sync_saved = num_batches * instr_tokens / 1e6 * (m["standard"]["input"] - spec["input"])
+            batch_saved = n * instr_tokens / 1e6 * (m["batch"]["input"] - spec["input"])
+            print(f"Context cache ile:      ${sync_cost - sync_saved + storage:.4f} (sync) / "
+                  f"${batch_cost - batch_saved + storage:.4f} (async), depolama ~${storage:.4f}")
+    if state.decision_only:
+        # 2. geçiş: Include/Uncertain ve düşük güvenli makaleler, tam şema ve --model ile
+        instr2 = estimate_tokens(second_pass_instructions)
+        out2 = output_tokens_per_article(state.compact_response)
+        n2 = math.ceil(n * SECOND_PASS_SHARE)
+        batches2 = (n2 + batch_size - 1) // batch_size
+        sync2, batch2 = _pass_cost(state.second_pass_model,
+                                   batches2 * instr2 + n2 * avg_article_tokens,
+                                   n2 * (instr2 + avg_article_tokens), n2 * out2)
+        batches1 = (n + batch_size - 1) // batch_size
+        single_sync, single_batch = _pass_cost(state.second_pass_model,
+                                               batches1 * instr2 + n * avg_article_tokens,
+                                               n * (instr2 + avg_article_tokens), n * out2)
+        print()
+        print(f"İki geçişli tarama (2. geçişe ~%{SECOND_PASS_SHARE * 100:.0f} makale varsayımıyla):")
+        print(f"  1. geçiş (yalnız karar):  ${sync_cost:.4f} (sync) / ${batch_cost:.4f} (async)  "
+              f"{state.model_id}, ~{output_per_article} output token/makale")
+        print(f"  {f'2. geçiş (~{n2:,} makale):':<25} ${sync2:.4f} (sync) / ${batch2:.4f} (async)  "
+              f"{state.second_pass_model}")
+        print(f"  Toplam:                   ${sync_cost + sync2:.4f} (sync) / "
+              f"${batch_cost + batch2:.4f} (async)")
+        print(f"  Tek geçiş karşılığı:      ${single_sync:.4f} (sync) / ${single_batch:.4f} (async)")
+    if state.ensemble:
+        # Oylar her zaman sync, yalnız karar şemasıyla; ilk karar da oy sayılır
+        instr3 = estimate_tokens(ensemble_instructions)
+        out3 = output_tokens_per_article(state.compact_response, True)
+        n3 = math.ceil(n * ENSEMBLE_SHARE)
+        batches3 = (n3 + batch_size - 1) // batch_size
+        vote_cost = sum(_pass_cost(model_id, batches3 * instr3 + n3 * avg_article_tokens, 0,
+                                   n3 * out3)[0] for model_id, _ in state.ensemble["voters"])
+        print()
+        print(f"Oylama (~%{ENSEMBLE_SHARE * 100:.0f} makale güven < {state.ensemble['threshold']:g} "
+              f"varsayımıyla, {len(state.ensemble['voters'])} örnek): ~{n3:,} makale, "
+              f"~{batches3 * len(state.ensemble['voters']):,} istek, ${vote_cost:.4f} (sync)")
     if m["free_tier"]:
         print(f"\n✓ Free Tier kotanızdaysa: $0 (RPD limitine kadar ücretsiz)")
     else:
@@ -700,27 +2980,148 @@ def print_cost_estimate(articles: List[Article], state: State, instructions: str
 # ============================================================
 # STATE PERSISTENCE
 # ============================================================
-def save_state(state: State, path: Path) -> None:
-    path.write_text(json.dumps(asdict(state), ensure_ascii=False, indent=2),
-                    encoding="utf-8")
+# Header (`.screening_state.json`) küçük alanları tutar ve atomik yazılır.
+# Sonuçlar yanındaki `.journal` dosyasına batch başına bir JSONL kaydı olarak
+# eklenir; her kayıt o anki skaler alanları da taşır, böylece header yazılmadan
+# önce çökme olsa bile replay en güncel sayaçları geri getirir. Async istek
+# anahtarı → makale eşlemesi (tüm özetler) yalnız değiştiğinde `.keys` dosyasına yazılır.
+JOURNAL_SKIP_FIELDS = ("results", "batch_key_map", "retry_queue")
+HEADER_SKIP_FIELDS = ("results", "batch_key_map")
 
 
-def load_state(path: Path) -> Optional[State]:
-    if not path.exists():
-        return None
-    try:
-        data = json.loads(path.read_text(encoding="utf-8"))
-        return State(**data)
-    except Exception as e:
-        print(f"⚠️  State yükleme hatası: {e}", file=sys.stderr)
-        return None
+def _journal_path(path: Path) -> Path:
+    return path.with_name(path.name + ".journal")
 
 
-def file_hash_from_articles(articles: List[Article]) -> str:
-    h = hashlib.sha256()
-    for a in articles:
-        h.update((a.ID + a.Title).encode("utf-8"))
-    return h.hexdigest()[:16]
+def _keys_path(path: Path) -> Path:
+    return path.with_name(path.name + ".keys")
+
+
+def _atomic_write(path: Path, text: str) -> None:
+    tmp = path.with_name(path.name + ".tmp")
+    with tmp.open("w", encoding="utf-8") as f:
+        f.write(text)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def _state_scalars(state: State) -> Dict[str, Any]:
+    # asdict() sonuç listesini de derin kopyalar; her kayıtta O(n) olmaması için alanlar doğrudan okunur
+    return {f.name: getattr(state, f.name) for f in fields(state)
+            if f.name not in JOURNAL_SKIP_FIELDS}
+
+
+class StateStore:
+    """Append-only journal + atomik header ile state kalıcılığı."""
+
+    def __init__(self, path: Path, compact_every: int = 200):
+        self.path = path
+        self.journal = _journal_path(path)
+        self.keys = _keys_path(path)
+        self.compact_every = compact_every
+        self._journal_id = ""
+        self._journaled = 0      # journal'a yazılmış sonuç sayısı
+        self._records = 0        # son compaction'dan beri eklenen kayıt
+        self._last_header = ""
+        self._keys_written: tuple = ()  # (id, uzunluk): eşleme yalnız shard hazırlanırken büyür
+
+    def load(self) -> Optional[State]:
+        if not self.path.exists():
+            return None
+        try:
+            data = json.loads(self.path.read_text(encoding="utf-8"))
+            journal_id = data.pop("_journal", "")
+            results = data.pop("results", [])  # eski (tek dosya) format
+            legacy_job = data.pop("batch_job_name", "")  # eski tek-job format
+            legacy_job_state = data.pop("batch_last_state", "")
+            state = State(**data)
+            state.results = results
+            if not state.batch_key_map and self.keys.exists():
+                keys = json.loads(self.keys.read_text(encoding="utf-8"))
+                if keys.get("journal") == journal_id:
+                    state.batch_key_map = keys["map"]
+            if legacy_job and not state.batch_jobs:
+                state.batch_jobs = [{"name": legacy_job, "state": legacy_job_state,
+                                     "file": "", "requests": len(state.batch_key_map)}]
+        except (OSError, ValueError, TypeError, KeyError) as e:
+            # Okunamayan / bozuk JSON ya da State'e uymayan alanlar
+            print(f"⚠️  State yükleme hatası: {e}", file=sys.stderr)
+            return None
+
+        if journal_id and self.journal.exists() and self._replay(state, journal_id):
+            self._journal_id = journal_id
+            self._journaled = len(state.results)
+        return state
+
+    def _replay(self, state: State, journal_id: str) -> bool:
+        with self.journal.open("r", encoding="utf-8") as f:
+            for i, line in enumerate(f):
+                try:
+                    rec = json.loads(line)
+                except json.JSONDecodeError:
+                    break  # yarım kalmış son satır
+                if i == 0 and rec.get("journal") != journal_id:
+                    print("⚠️  Journal başka bir çalışmaya ait, yok sayılıyor", file=sys.stderr)
+                    return False
+                if rec.get("snapshot"):
+                    state.results = []
+                for i, row in (rec.get("update") or {}).items():
+                    state.results[int(i)] = row
+                state.results.extend(rec.get("results", []))
+                for k, v in (rec.get("state") or {}).items():
+                    if hasattr(state, k):
+                        setattr(state, k, v)
+        return True
+
+    def save(self, state: State, updated: Iterable[int] = ()) -> None:
+        # updated: yerinde değiştirilen (ör. oylanan) sonuç satırlarının indeksleri
+        if not self._journal_id or len(state.results) < self._journaled:
+            self._journal_id = self._journal_id or uuid.uuid4().hex
+            self._write_header(state)
+            self.compact(state)
+            return
+        new = state.results[self._journaled:]
+        rec: Dict[str, Any] = {"results": new, "state": _state_scalars(state)}
+        rows = {i: state.results[i] for i in updated if i < self._journaled}
+        if rows:
+            rec["update"] = rows
+        with self.journal.open("a", encoding="utf-8") as f:
+            f.write(json.dumps(rec, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        self._journaled = len(state.results)
+        self._records += 1
+        self._write_header(state)
+        if self._records >= self.compact_every:
+            self.compact(state)
+
+    def compact(self, state: State) -> None:
+        rec = {"journal": self._journal_id, "snapshot": True,
+               "results": state.results, "state": _state_scalars(state)}
+        _atomic_write(self.journal, json.dumps(rec, ensure_ascii=False) + "\n")
+        self._journaled = len(state.results)
+        self._records = 0
+
+    def _write_header(self, state: State) -> None:
+        signature = (id(state.batch_key_map), len(state.batch_key_map))
+        if signature != self._keys_written and (state.batch_key_map or self.keys.exists()):
+            # Header'dan önce yazılır: header'ın gösterdiği eşleme her zaman diskte
+            _atomic_write(self.keys, json.dumps({"journal": self._journal_id,
+                                                 "map": state.batch_key_map}, ensure_ascii=False))
+            self._keys_written = signature
+        header = {f.name: getattr(state, f.name) for f in fields(state)
+                  if f.name not in HEADER_SKIP_FIELDS}
+        header["_journal"] = self._journal_id
+        text = json.dumps(header, ensure_ascii=False)
+        if text != self._last_header:
+            _atomic_write(self.path, text)
+            self._last_header = text
+
+    def delete(self) -> None:
+        self.path.unlink(missing_ok=True)
+        self.journal.unlink(missing_ok=True)
+        self.keys.unlink(missing_ok=True)
 
 
 # ============================================================
@@ -750,62 +3151,358 @@ def main() -> int:
 """,
     )
     parser.add_argument("-i", "--input", type=Path, help="CSV/TSV/XLSX girdi dosyası")
-    parser.add_argument("-o", "--output", type=Path, help="Çıktı dosyası (CSV veya XLSX)")
+    parser.add_argument("-o", "--output", type=Path,
+                        help="Çıktı dosyası (CSV, XLSX, Parquet veya Arrow/Feather)")
     parser.add_argument("--inclusion", type=Path, help="IC kriterleri (her satır = bir kriter)")
     parser.add_argument("--exclusion", type=Path, help="EC kriterleri (her satır = bir kriter)")
     parser.add_argument("--model", default="gemini-3.1-flash-lite-preview",
                         choices=list(MODELS.keys()))
-    parser.add_argument("--mode", default="sync", choices=["sync", "async"])
+    parser.add_argument("--mode", default="sync", choices=["sync", "async", "hybrid"],
+                        help="hybrid: öncelikli dilim sync, kalanı Batch API (--priority, --deadline)")
+    parser.add_argument("--priority", type=int, default=0,
+                        help="Hibrit modda hemen sync taranacak ilk N makale "
+                             "(--prefilter-sort ile en ilgili N makale)")
+    parser.add_argument("--deadline", type=float, default=0,
+                        help="Hibrit modda hedef bitiş süresi (dakika, 0 = yok): sync/batch bölmesi "
+                             "buna göre seçilir, yetişmeyen batch job'ların makalelerini sync devralır")
+    parser.add_argument("--batch-eta", type=float, default=BATCH_ETA_MIN,
+                        help="Hibrit planlamada Batch API'nin beklenen tamamlanma süresi (dakika)")
     parser.add_argument("--batch-size", type=int, default=5,
                         help="Sync modda tek istekte makale sayısı")
     parser.add_argument("--delay", type=float, default=2.0,
-                        help="Sync modda batch arası bekleme (saniye)")
+                        help="Sync modda batch arası bekleme (saniye, sadece --concurrency 1)")
+    parser.add_argument("--concurrency", type=int, default=1,
+                        help="Sync modda aynı anda gönderilen batch isteği sayısı")
+    parser.add_argument("--rpm", type=int, default=None,
+                        help="Dakika başına istek limiti (varsayılan: model kataloğu, 0 = limitsiz)")
+    parser.add_argument("--tpm", type=int, default=None,
+                        help="Dakika başına token limiti (varsayılan: model kataloğu, 0 = limitsiz)")
+    parser.add_argument("--rpd", type=int, default=None,
+                        help="API key havuzunda key başına günlük istek limiti "
+                             "(varsayılan: model kataloğu, 0 = limitsiz)")
+    parser.add_argument("--pack", action="store_true",
+                        help="Sync batch'leri token bütçesine göre paketle (--batch-size yerine)")
+    parser.add_argument("--max-input-tokens", type=int, default=32_000,
+                        help="Paketlemede istek başı hedef input token")
+    parser.add_argument("--max-output-tokens", type=int, default=6_000,
+                        help="Paketlemede istek başı hedef output token")
+    parser.add_argument("--max-retries", type=int, default=2,
+                        help="Yanıtta eksik/parse edilemeyen makaleler için en fazla tekrar deneme")
+    parser.add_argument("--prefilter-threshold", type=float, default=0.0,
+                        help="Yerel BM25 ön eleme: IC benzerliği bu eşiğin altındaki makaleler "
+                             "API'ye gönderilmeden Exclude (0-1, 0 = kapalı)")
+    parser.add_argument("--prefilter-sort", action="store_true",
+                        help="Tarama kuyruğunu IC benzerliğine göre sırala (en ilgili makaleler önce)")
+    parser.add_argument("--incremental", type=Path, default=None,
+                        help="Önceki çıktı dosyası: yalnız yeni/değişen makaleler ve kararı değişen "
+                             "ölçütlere bağlı olabilecek makaleler yeniden taranır, kalanı aktarılır")
+    parser.add_argument("--two-pass", action="store_true",
+                        help="İki geçişli tarama: ucuz modelle yalnız karar, Include/Uncertain ve "
+                             "düşük güvenli makaleler --model ile ayrıntılı (özet + gerekçe)")
+    parser.add_argument("--first-pass-model", default=FIRST_PASS_MODEL, choices=list(MODELS.keys()),
+                        help="İki geçişli taramada yalnız karar geçişinin modeli")
+    parser.add_argument("--second-pass-threshold", type=float, default=0.85,
+                        help="Bu güvenin altındaki Exclude kararları da 2. geçişe gider")
+    parser.add_argument("--ensemble", type=int, default=0, metavar="K",
+                        help="Oylama: güveni --ensemble-threshold altındaki / Uncertain makaleler için "
+                             "K ek örnek (yalnız karar) paralel istenir, çoğunluk kararı yazılır")
+    parser.add_argument("--ensemble-threshold", type=float, default=0.7,
+                        help="Bu güvenin altındaki kararlar oylamaya gider")
+    parser.add_argument("--ensemble-models", default="",
+                        help="Oylayan modeller (virgülle; varsayılan --model), örnekler dönüşümlü dağıtılır")
+    parser.add_argument("--ensemble-temperatures", default="0.2,0.7,1.0",
+                        help="Oylama örneklerinin sıcaklıkları (virgülle)")
+    parser.add_argument("--ensemble-method", choices=["majority", "weighted"], default="majority",
+                        help="majority: oy çokluğu | weighted: oylar model güveniyle ağırlıklı")
+    parser.add_argument("--compact", action="store_true",
+                        help="Kompakt yanıt şeması: kısa anahtarlar, karar kodu (I/E/U), kriter numaraları")
+    parser.add_argument("--context-cache", action="store_true",
+                        help="Talimat bloğunu (IC/EC + şema) Gemini context cache'e bir kez yükle")
+    parser.add_argument("--context-cache-ttl", type=int, default=0,
+                        help="Context cache ömrü (saniye; varsayılan sync 3600, async 172800)")
+    parser.add_argument("--timeout", type=float, default=180,
+                        help="API istekleri için okuma zaman aşımı (saniye)")
+    parser.add_argument("--http-retries", type=int, default=5,
+                        help="Ağ hatası / 429 / 5xx için en fazla tekrar (jitter'lı exponential backoff)")
+    parser.add_argument("--no-gzip", action="store_true",
+                        help="Büyük istek gövdelerini gzip ile sıkıştırma")
+    parser.add_argument("--metrics-file", type=Path, default=None,
+                        help="İstek/batch metriklerini JSONL olarak bu dosyaya ekle")
+    parser.add_argument("--metrics-port", type=int, default=0,
+                        help="Prometheus metriklerini http://127.0.0.1:PORT/metrics üzerinden yayınla")
+    parser.add_argument("--backend", default="gemini", choices=["gemini", "mock"],
+                        help="API backend'i (mock: ağsız simülasyon, benchmark/test için)")
+    parser.add_argument("--mock", default="",
+                        help="Mock backend ayarları, ör. 'latency=0.3,p429=0.05,burst=3,drop=0.01,"
+                             "malformed=0.02,batch_seconds=10,seed=1'")
+    parser.add_argument("--no-partial", action="store_true",
+                        help="Çalışma sırasında <çıktı>.partial.csv ara sonuç dosyası yazma")
     parser.add_argument("--api-key", default=os.environ.get("GEMINI_API_KEY", ""),
                         help="Gemini API key (veya GEMINI_API_KEY env)")
+    parser.add_argument("--api-keys", default=os.environ.get("GEMINI_API_KEYS", ""),
+                        help="API key havuzu: virgülle ayrılmış key'ler ya da satır başına bir key "
+                             "içeren dosya (veya GEMINI_API_KEYS env); istekler en boş key'e gider")
+    parser.add_argument("--pool-models", default="",
+                        help="Havuzda yedek modeller (virgülle): --model tüm key'lerde günlük "
+                             "kotasını bitirince sırayla kullanılır")
+    parser.add_argument("--quota-file", type=Path, default=Path(".screening_quota.json"),
+                        help="API key havuzunun RPM/RPD/TPM sayaçları (çalıştırmalar arası kalıcı)")
+    parser.add_argument("--analyze", type=Path, default=None,
+                        help="Tarama yapmadan çıktı dosyasını analiz et: kalibrasyon, eşik başına "
+                             "recall/precision, WSS@95, needs_human_review eşik önerisi")
+    parser.add_argument("--labels", type=Path, default=None,
+                        help="--analyze için insan etiketli alt küme (ID + Etiket/Label/Karar sütunu)")
+    parser.add_argument("--compare", type=Path, action="append", default=None,
+                        help="--analyze için Cohen's kappa hesaplanacak başka bir çıktı (tekrarlanabilir)")
+    parser.add_argument("--target-recall", type=float, default=0.95,
+                        help="Eşik önerisinde hedeflenen Include recall'u")
     parser.add_argument("--state-file", type=Path, default=Path(".screening_state.json"))
     parser.add_argument("--resume", action="store_true",
                         help="State dosyasından devam et")
     parser.add_argument("--estimate-only", action="store_true",
                         help="Sadece maliyet tahmini, analiz başlatma")
     parser.add_argument("--poll-interval", type=int, default=60,
-                        help="Async polling aralığı (saniye)")
+                        help="Async polling için üst aralık (saniye; 5 sn'den başlayıp buna kadar büyür)")
+    parser.add_argument("--shard-size", type=int, default=BATCH_SHARD_SIZE,
+                        help="Async modda job başına istek sayısı (büyük girdiler birden çok job'a bölünür)")
+    parser.add_argument("--no-dedup", action="store_true",
+                        help="Tekrar (duplicate) makale tespitini kapat")
+    parser.add_argument("--dedup-threshold", type=float, default=0.85,
+                        help="Yakın tekrar için MinHash Jaccard eşiği (0-1)")
+    parser.add_argument("--cache", type=Path, default=Path(".screening_cache.sqlite"),
+                        help="Makale bazlı yanıt cache dosyası (SQLite)")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="Yanıt cache'ini kullanma")
+    parser.add_argument("--cache-max-mb", type=float, default=512,
+                        help="Cache boyut limiti (MB, LRU ile silinir)")
     args = parser.parse_args()
+    args.pool_models = [m.strip() for m in args.pool_models.split(",") if m.strip()]
+    args.ensemble_models = [m.strip() for m in args.ensemble_models.split(",") if m.strip()]
+    unknown = [m for m in args.pool_models + args.ensemble_models if m not in MODELS]
+    if unknown:
+        parser.error(f"Bilinmeyen model: {', '.join(unknown)}")
+    try:
+        args.ensemble_temperatures = [float(t) for t in args.ensemble_temperatures.split(",") if t.strip()]
+    except ValueError:
+        parser.error("--ensemble-temperatures virgülle ayrılmış sayılar olmalı")
+    if args.analyze:
+        return analyze_outputs(args)
+    configure_http(args)
+    configure_metrics(args)
+    try:
+        return run(args, parser)
+    finally:
+        metrics().close()
+
+
+def screen_articles(args, state: State, backend: Backend, instructions: str,
+                    articles: Iterable[Article], cache: Optional[ResponseCache],
+                    save_fn) -> List[Result]:
+    # Tek bir tarama geçişi; resume'da da aynı yol izlenir (sonucu olan makaleler atlanır)
+    if isinstance(backend, PooledBackend):
+        state.key_pool = len(backend.backends)
+    if (args.context_cache or state.context_cache_name) and (state.mode != "async" or not state.batch_jobs):
+        ensure_context_cache(state, backend, instructions, context_cache_ttl(args, state.mode))
+    if state.mode == "hybrid":
+        return screen_hybrid(args, state, backend, instructions, articles, cache, save_fn)
+    if state.mode == "async":
+        start_batch(args, state, backend, instructions, articles, cache, save_fn)
+        poll_batch_jobs(backend, state, save_fn, args.poll_interval, cache)
+        return finish_async(state, backend, instructions, args, save_fn, cache)
+
+    limiter = sync_limiter(args, state, backend)
+    print("🚀 Sync analiz başlıyor...\n")
+    return _run_sync_pass(args, state, backend, instructions, articles, cache, save_fn, limiter)
+
+
+def screen_hybrid(args, state: State, backend: Backend, instructions: str,
+                  articles: Iterable[Article], cache: Optional[ResponseCache],
+                  save_fn) -> List[Result]:
+    # Batch job'lar sunucuda işlenirken kuyruğun ilk sync_count makalesi sync taranır.
+    # Hedef süreye yetişmeyecek job'lar iptal edilir, makalelerini sync devralır.
+    plan = state.hybrid
+    # Dilim, önceki aşamalarda kesinleşenler (ön eleme, 1. geçiş) dışındaki kuyruğun
+    # başıdır; bu sayede resume'da aynı makaleleri kapsar
+    carried = {r["id"] for r in state.results
+               if r["rationale"].startswith((PREFILTER_TAG, FIRST_PASS_TAG)) or r.get("provenance")}
+    queue = (a for a in articles if a.ID not in carried)
+    head = list(itertools.islice(queue, plan["sync_count"]))
+    start_batch(args, state, backend, instructions, queue, cache, save_fn)
+
+    limiter = sync_limiter(args, state, backend)
+    print(f"\n⚡ Öncelikli dilim sync taranıyor: {len(head):,} makale\n")
+    t0, before = time.time(), len(state.results)
+    _run_sync_pass(args, state, backend, instructions, head, cache, save_fn, limiter)
+    screened = len(state.results) - before
+    if screened >= RATE_MIN_SAMPLE:
+        # Devralma zamanlaması tahmin yerine ölçülen hızla yapılır
+        plan["rate"] = screened / max(1e-9, (time.time() - t0) / 60)
+
+    deadline = plan.get("deadline", 0)
+    batch_due = state.batch_submitted_at + plan.get("batch_eta", BATCH_ETA_MIN) * 60
+
+    def late(open_jobs: List[Dict[str, Any]]) -> bool:
+        left = sum(j["requests"] for j in open_jobs)
+        return should_take_over(left, plan["rate"], deadline, batch_due, time.time())
+
+    poll_batch_jobs(backend, state, save_fn, args.poll_interval, cache, late if deadline else None)
+    running = [j for j in state.batch_jobs
+               if j["name"] and _job_open(j) and j["state"] not in BATCH_DONE_STATES]
+    if running:
+        print(f"\n⏰ Hedef süreye yetişmek için {len(running)} batch job iptal ediliyor")
+        for job in running:
+            try:
+                backend.cancel_batch(job["name"])
+            except BACKEND_ERRORS as e:
+                print(f"  ⚠️  Job iptal edilemedi ({job['name']}): {e}")
+            job["state"] = "JOB_STATE_CANCELLED"
+        plan["taken_over"] = plan.get("taken_over", 0) + sum(j["requests"] for j in running)
+        save_fn(state)
+
+    # Öncelikli dilimde kalanlar ile iptal edilen / başarısız job'ların makaleleri
+    done = {str(r["id"]) for r in state.results}
+    done.update(str(q["article"]["ID"]) for q in state.retry_queue)
+    taken = [Article(**a) for k, a in state.batch_key_map.items() if k not in done]
+    leftover = [a for a in head if str(a.ID) not in done] + taken
+    if leftover:
+        print(f"\n⚡ {len(leftover):,} makale sync taranıyor "
+              f"({len(taken):,} batch job'larından)\n")
+    # Boş listede yalnız retry kuyruğu (batch çıktısında parse edilemeyenler) işlenir
+    _run_sync_pass(args, state, backend, instructions, leftover, cache, save_fn, limiter)
+    removed = dedupe_results(state)
+    if removed:
+        print(f"  ↺ {removed:,} tekrar sonuç (aynı ID) birleştirildi")
+    save_fn(state)
+    return [Result(**r) for r in state.results]
+
+
+def start_batch(args, state: State, backend: Backend, instructions: str,
+                articles: Iterable[Article], cache: Optional[ResponseCache], save_fn) -> None:
+    # Shard'lar yalnızca ilk seferde hazırlanır; resume'da yüklenmemiş olanlar gönderilir
+    if not state.batch_jobs:
+        print("🚀 Async Batch job gönderiliyor...")
+        done = {r["id"] for r in state.results}
+        done.update(q["article"]["ID"] for q in state.retry_queue)
+        shards = prepare_batch_shards((a for a in articles if a.ID not in done), instructions,
+                                      state, args.state_file, args.shard_size, cache)
+        save_fn(state)
+        if shards:
+            print(f"  → {len(state.batch_key_map):,} istek, {shards} job (JSONL dosyası)")
+        else:
+            print(f"  ✓ Tüm makaleler cache'te ({state.cache_hits}), job gönderilmedi")
+    submit_batch_shards(state.model_id, backend, state, save_fn)
+
+
+def sync_limiter(args, state: State, backend: Backend) -> Optional[RateLimiter]:
+    if isinstance(backend, PooledBackend):
+        # Hız sınırı anahtar başına havuzda uygulanır
+        print(f"🔑 API key havuzu: {state.key_pool} anahtar | "
+              f"{backend.pool.status(state.model_id)} | Paralel istek: {max(1, args.concurrency)}")
+        for m in backend.pool.models:
+            if m != state.model_id:
+                print(f"   yedek {backend.pool.status(m)}")
+        return None
+    limiter = build_rate_limiter(state.model_id, args.rpm, args.tpm)
+    if limiter:
+        print(f"🚦 Rate limit: {limiter.rpm or '∞'} rpm / {limiter.tpm or '∞'} tpm "
+              f"| Paralel istek: {max(1, args.concurrency)}")
+    return limiter
+
+
+def _run_sync_pass(args, state: State, backend: Backend, instructions: str,
+                   articles: Iterable[Article], cache: Optional[ResponseCache], save_fn,
+                   limiter: Optional[RateLimiter]) -> List[Result]:
+    packer = build_packer(args, instructions,
+                          output_tokens_per_article(state.compact_response, state.decision_only))
+    return run_sync(articles, state, backend, instructions,
+                    args.batch_size, args.delay, save_fn,
+                    args.concurrency, limiter, cache, packer, args.max_retries)
+
+
+def run_screening(args, state: State, backend: Backend, inclusion: List[Dict],
+                  exclusion: List[Dict], source, save_fn) -> List[Result]:
+    # İki geçişli taramada 1. geçiş tamamlanınca aynı state ile 2. geçişe geçilir
+    while True:
+        instructions = build_instructions(inclusion, exclusion, state.compact_response,
+                                          state.decision_only)
+        cache = open_cache(args, state.model_id, state.prompt_hash)
+        results = screen_articles(args, state, backend, instructions, source(), cache, save_fn)
+        complete = len(state.results) >= state.total_count and not state.retry_queue
+        if not state.decision_only or not complete:
+            if complete and state.ensemble and run_ensemble(args, state, backend, inclusion,
+                                                            exclusion, save_fn):
+                results = [Result(**r) for r in state.results]
+            return results
+        full = build_instructions(inclusion, exclusion, state.compact_response)
+        escalated = start_second_pass(state, prompt_version(full))
+        save_fn(state)
+        print(f"\n🔀 1. geçiş tamamlandı (${state.first_pass['cost_usd']:.4f}): "
+              f"{len(state.results):,} makale kesinleşti, {escalated:,} makale "
+              f"{state.model_id} ile ayrıntılı taranacak\n")
+        if not escalated:
+            return [Result(**r) for r in state.results]
+
+
+def build_save_fn(store: StateStore, partial: Optional[PartialWriter]):
+    if partial is None:
+        return store.save
+
+    def save(state: State, updated: Iterable[int] = ()) -> None:
+        store.save(state, updated)
+        partial.update(state)
+    return save
+
+
+def run(args, parser: argparse.ArgumentParser) -> int:
 
     # ----- Resume path
     if args.resume:
-        state = load_state(args.state_file)
+        store = StateStore(args.state_file)
+        state = store.load()
         if not state:
             sys.exit(f"❌ State dosyası bulunamadı: {args.state_file}")
-        api_key = args.api_key or os.environ.get("GEMINI_API_KEY", "")
-        if not api_key:
-            sys.exit("❌ API key gerekli (--api-key veya GEMINI_API_KEY)")
+        keys = api_keys(args)
+        if not keys and args.backend == "gemini":
+            sys.exit("❌ API key gerekli (--api-key, --api-keys veya GEMINI_API_KEY)")
+        backend = build_backend(args, keys)
         if not args.input or not args.output or not args.inclusion or not args.exclusion:
             sys.exit("❌ Resume için --input, --output, --inclusion, --exclusion gerekli")
 
-        articles = read_articles(args.input)
+        dedup = None if args.no_dedup else find_duplicates(iter_articles(args.input),
+                                                           args.dedup_threshold)
         inclusion = code_criteria(load_criteria(args.inclusion), "IC")
         exclusion = code_criteria(load_criteria(args.exclusion), "EC")
-        instructions = build_instructions(inclusion, exclusion)
 
-        print(f"▶️  Devam ediliyor: {state.mode} | Model: {state.model_id}")
+        print(f"▶️  Devam ediliyor: {state.mode} | Model: {state.model_id}"
+              + (f" | {state.screening_pass}. geçiş" if state.screening_pass else ""))
         print(f"   İşlenen: {len(state.results)}/{state.total_count}")
 
-        save_fn = lambda s: save_state(s, args.state_file)
-        if state.mode == "async":
-            try:
-                job = poll_batch_job(api_key, state, save_fn, args.poll_interval)
-                results = process_batch_results(job, state, api_key)
-            except KeyboardInterrupt:
-                print("\n⏸️  Polling durduruldu, state kaydedildi.")
-                save_fn(state)
-                return 0
-        else:
-            results = run_sync(articles, state, api_key, instructions,
-                               args.batch_size, args.delay, save_fn)
-        write_results(results, state, instructions, inclusion, exclusion, args.output)
+        prefilter = None
+        if state.prefilter.get("sort"):
+            prefilter = score_articles(iter_unique(iter_articles(args.input), dedup),
+                                       inclusion, exclusion)
+
+        def queue() -> Iterator[Article]:
+            articles = iter_unique(iter_articles(args.input), dedup)
+            return order_by_relevance(articles, prefilter) if prefilter is not None else articles
+
+        partial = None if args.no_partial else PartialWriter(partial_output_path(args.output))
+        save_fn = build_save_fn(store, partial)
+        try:
+            results = run_screening(args, state, backend, inclusion, exclusion, queue, save_fn)
+        except KeyboardInterrupt:
+            print("\n⏸️  Durduruldu, state kaydedildi.")
+            save_fn(state)
+            return 0
+        instructions = build_instructions(inclusion, exclusion, state.compact_response,
+                                          state.decision_only)
+        write_results(results, state, instructions, inclusion, exclusion, args.output,
+                      dedup, iter_articles(args.input))
+        if partial is not None:
+            partial.delete()
         print(f"✅ Sonuçlar yazıldı: {args.output}")
         if len(state.results) >= state.total_count:
-            args.state_file.unlink(missing_ok=True)
+            store.delete()
         return 0
 
     # ----- Fresh run
@@ -814,80 +3511,157 @@ def main() -> int:
     if not args.inclusion or not args.exclusion:
         parser.error("--inclusion ve --exclusion gerekli")
 
-    articles = read_articles(args.input)
-    if not articles:
-        sys.exit("❌ Dosyada makale bulunamadı.")
-
     inclusion = code_criteria(load_criteria(args.inclusion), "IC")
     exclusion = code_criteria(load_criteria(args.exclusion), "EC")
-    instructions = build_instructions(inclusion, exclusion)
-    prompt_hash = hashlib.sha256(instructions.encode("utf-8")).hexdigest()[:8]
+    # İki geçişli taramada önce ucuz modelle yalnız karar alınır
+    model_id = args.first_pass_model if args.two_pass else args.model
+    instructions = build_instructions(inclusion, exclusion, args.compact, args.two_pass)
+    prompt_hash = prompt_version(instructions)
+
+    dedup = None if args.no_dedup else find_duplicates(iter_articles(args.input),
+                                                       args.dedup_threshold)
+
+    def source() -> Iterator[Article]:
+        return iter_unique(iter_articles(args.input), dedup)
+
+    prefilter = None
+    if args.prefilter_threshold or args.prefilter_sort:
+        prefilter = score_articles(source(), inclusion, exclusion)
+    skip = (prefilter.below(args.prefilter_threshold)
+            if prefilter is not None and args.prefilter_threshold else None)
+
+    carried: List[Result] = []
+    incremental: Dict[str, Any] = {}
+    if args.incremental:
+        if not args.incremental.exists():
+            sys.exit(f"❌ Önceki çıktı bulunamadı: {args.incremental}")
+        prior = read_prior_results(args.incremental)
+        diff = diff_criteria(prior, inclusion, exclusion)
+        carried, reasons, matched = plan_incremental(source(), prior, diff, skip)
+        print_incremental_summary(prior, diff, len(carried), reasons, matched)
+        incremental = {"prior": prior.path.name, "prior_prompt": prior.prompt_hash,
+                       "carried": len(carried), "rescreen": dict(reasons.most_common()),
+                       "criteria": diff.describe()}
+
+    cache = open_cache(args, model_id, prompt_hash)
+    stats = summarize_articles(source(), cache, skip, {r.id for r in carried})
+    if not stats.count:
+        sys.exit("❌ Dosyada makale bulunamadı.")
 
-    fhash = file_hash_from_articles(articles)
     state = State(
-        model_id=args.model,
+        model_id=model_id,
         mode=args.mode,
-        file_hash=fhash,
-        total_count=len(articles),
+        file_hash=stats.file_hash,
+        total_count=stats.count,
         prompt_hash=prompt_hash,
+        duplicate_count=dedup.count if dedup else 0,
+        compact_response=args.compact,
+        screening_pass=1 if args.two_pass else 0,
+        second_pass_model=args.model if args.two_pass else "",
+        second_pass_threshold=args.second_pass_threshold if args.two_pass else 0.0,
+        prefilter=({"method": "bm25", "threshold": args.prefilter_threshold,
+                    "sort": args.prefilter_sort} if prefilter is not None else {}),
+        incremental=incremental,
+        ensemble=({"threshold": args.ensemble_threshold, "method": args.ensemble_method,
+                   "voters": ensemble_voters(args.ensemble_models or [args.model],
+                                             args.ensemble_temperatures or [0.2], args.ensemble),
+                   "voted": 0, "changed": 0, "requests": 0, "cost_usd": 0.0}
+                  if args.ensemble > 0 else {}),
     )
 
-    print(f"\n📚 {len(articles):,} makale yüklendi")
+    print(f"\n📚 {stats.count + state.duplicate_count:,} makale yüklendi")
+    if state.duplicate_count:
+        print(f"🔁 {state.duplicate_count:,} tekrar makale bulundu "
+              f"({len(dedup.rep_ids):,} küme) → {stats.count:,} benzersiz makale taranacak")
     print(f"📋 IC: {len(inclusion)} kriter | EC: {len(exclusion)} kriter")
-    print(f"🤖 Model: {MODELS[args.model]['label']} ({args.model})")
+    if args.two_pass:
+        print(f"🤖 Model: 1. geçiş {MODELS[model_id]['label']} ({model_id}) → "
+              f"2. geçiş {MODELS[args.model]['label']} ({args.model})")
+    else:
+        print(f"🤖 Model: {MODELS[args.model]['label']} ({args.model})")
     print(f"⚙️  Mod: {args.mode} | Prompt versiyon: {prompt_hash}")
-
-    print_cost_estimate(articles, state, instructions, args.batch_size)
+    if prefilter is not None:
+        print_prefilter_summary(prefilter, args.prefilter_threshold)
+
+    packer = build_packer(args, instructions,
+                          output_tokens_per_article(args.compact, args.two_pass))
+    hybrid_share = None
+    if args.mode == "hybrid":
+        queued = stats.count - stats.prefiltered - stats.carried
+        rate = sync_throughput(args, model_id, packer.capacity() if packer else args.batch_size,
+                               max(1, len(api_keys(args))))
+        state.hybrid = {
+            "sync_count": plan_hybrid(queued, rate, args.priority, args.deadline, args.batch_eta),
+            "rate": rate,
+            "deadline": time.time() + args.deadline * 60 if args.deadline else 0,
+            "batch_eta": args.batch_eta,
+        }
+        hybrid_share = state.hybrid["sync_count"] / max(1, queued)
+        print_hybrid_plan(state.hybrid, queued, args.deadline, args.batch_eta)
+    cc_ttl = context_cache_ttl(args, args.mode) if args.context_cache else 0
+    print_cost_estimate(stats, state, instructions, args.batch_size, packer, cc_ttl,
+                        build_instructions(inclusion, exclusion, args.compact) if args.two_pass else "",
+                        hybrid_share,
+                        build_instructions(inclusion, exclusion, args.compact, decision_only=True)
+                        if args.ensemble > 0 else "")
 
     if args.estimate_only:
         return 0
 
     if not args.output:
         parser.error("--output gerekli (analiz için)")
-    api_key = args.api_key
-    if not api_key:
-        sys.exit("❌ API key gerekli (--api-key veya GEMINI_API_KEY)")
-
-    save_fn = lambda s: save_state(s, args.state_file)
+    if args.output.suffix.lower() in ARROW_SUFFIXES and importlib.util.find_spec("pyarrow") is None:
+        sys.exit("❌ Parquet/Arrow yazmak için pyarrow gerekli: pip install pyarrow")
+    keys = api_keys(args)
+    if not keys and args.backend == "gemini":
+        sys.exit("❌ API key gerekli (--api-key, --api-keys veya GEMINI_API_KEY)")
+    backend = build_backend(args, keys)
+    if backend.name != "gemini":
+        print(f"🧪 Backend: {backend.name} (ağ isteği yapılmaz)")
+
+    store = StateStore(args.state_file)
+    partial = None if args.no_partial else PartialWriter(partial_output_path(args.output))
+    save_fn = build_save_fn(store, partial)
+    if partial is not None:
+        print(f"📝 Ara sonuçlar: {partial.path} (batch'ler tamamlandıkça eklenir)")
+    if skip:
+        apply_prefilter(state, source(), prefilter, args.prefilter_threshold, exclusion)
+    state.results.extend(asdict(r) for r in carried)
     save_fn(state)
 
-    if args.mode == "async":
-        print("🚀 Async Batch job gönderiliyor...")
-        try:
-            job_name = submit_batch_job(args.model, api_key, articles, instructions, state)
-            state.batch_job_name = job_name
-            state.batch_submitted_at = time.time()
-            save_fn(state)
-            print(f"✓ Job gönderildi: {job_name}\n")
-
-            try:
-                job = poll_batch_job(api_key, state, save_fn, args.poll_interval)
-                results = process_batch_results(job, state, api_key)
-            except KeyboardInterrupt:
-                print("\n⏸️  Polling durduruldu. Devam etmek için: python cli.py --resume ...")
-                save_fn(state)
-                return 0
-        except Exception as e:
-            print(f"❌ Async batch hatası: {e}", file=sys.stderr)
-            save_fn(state)
-            return 1
-    else:
-        print("🚀 Sync analiz başlıyor...\n")
-        try:
-            results = run_sync(articles, state, api_key, instructions,
-                               args.batch_size, args.delay, save_fn)
-        except KeyboardInterrupt:
-            print("\n⏸️  Durduruldu. Devam etmek için: python cli.py --resume ...")
-            save_fn(state)
-            return 0
+    def queue() -> Iterator[Article]:
+        if prefilter is not None and args.prefilter_sort:
+            return order_by_relevance(source(), prefilter)
+        return source()
 
-    write_results(results, state, instructions, inclusion, exclusion, args.output)
-    print(f"\n✅ Tamamlandı! {len(results):,} sonuç yazıldı: {args.output}")
+    try:
+        results = run_screening(args, state, backend, inclusion, exclusion, queue, save_fn)
+    except KeyboardInterrupt:
+        print("\n⏸️  Durduruldu. Devam etmek için: python cli.py --resume ...")
+        save_fn(state)
+        return 0
+    except Exception as e:
+        if state.mode == "sync":
+            raise
+        print(f"❌ Async batch hatası: {e}", file=sys.stderr)
+        save_fn(state)
+        return 1
+
+    instructions = build_instructions(inclusion, exclusion, state.compact_response,
+                                      state.decision_only)
+    write_results(results, state, instructions, inclusion, exclusion, args.output,
+                  dedup, iter_articles(args.input))
+    if partial is not None:
+        partial.delete()
+    print(f"\n✅ Tamamlandı! {len(results) + state.duplicate_count:,} sonuç yazıldı: {args.output}")
     print(f"📊 Toplam token: {state.total_input_tokens:,} input + {state.total_output_tokens:,} output")
-    print(f"💰 Toplam maliyet: ${state.total_cost_usd:.4f}")
+    print(f"💰 Toplam maliyet: ${state.total_cost_usd:.4f}"
+          + (f" (1. geçiş ${state.first_pass['cost_usd']:.4f})" if state.first_pass else ""))
+    if cache is not None:
+        print(f"🗄️  Cache: {state.cache_hits:,} hit / {state.cache_misses:,} miss")
 
     if len(state.results) >= state.total_count:
-        args.state_file.unlink(missing_ok=True)
+        store.delete()
 
     return 0
 
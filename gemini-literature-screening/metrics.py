@@ -0,0 +1,186 @@
+"""Çalışma metrikleri: istek gecikmesi, retry/429, token, kuyruk derinliği.
+
+Olaylar JSONL dosyasına yazılır; istenirse Prometheus text formatında sunulur.
+"""
+
+from __future__ import annotations
+
+import collections
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120, 300)
+TOKEN_BUCKETS = (500, 1000, 2500, 5000, 10_000, 25_000, 50_000, 100_000, 250_000)
+
+
+class Histogram:
+    def __init__(self, buckets: Iterable[float]):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # son hücre: +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        i = 0
+        while i < len(self.buckets) and value > self.buckets[i]:
+            i += 1
+        self.counts[i] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q: float) -> float:
+        # Kova sınırları arasında doğrusal interpolasyonla yaklaşık değer
+        if not self.count:
+            return 0.0
+        target = q * self.count
+        seen = 0
+        for i, c in enumerate(self.counts):
+            if seen + c >= target and c:
+                lo = self.buckets[i - 1] if i else 0.0
+                hi = self.buckets[i] if i < len(self.buckets) else lo * 2 or 1.0
+                return lo + (hi - lo) * (target - seen) / c
+            seen += c
+        return self.buckets[-1]
+
+
+class Metrics:
+    """Çalışma metrikleri: JSONL olay dosyası + opsiyonel Prometheus endpoint'i."""
+
+    def __init__(self, path: Optional[Path] = None):
+        self.lock = threading.Lock()
+        self.started = time.time()
+        self.counters: Dict[tuple, float] = collections.defaultdict(float)
+        self.gauges: Dict[str, float] = {}
+        self.histograms: Dict[str, Histogram] = {
+            "http_request_seconds": Histogram(LATENCY_BUCKETS),
+            "request_input_tokens": Histogram(TOKEN_BUCKETS),
+            "request_output_tokens": Histogram(TOKEN_BUCKETS),
+        }
+        self.file = path.open("a", encoding="utf-8") if path else None
+        self.server: Optional[ThreadingHTTPServer] = None
+
+    def inc(self, name: str, value: float = 1, **labels) -> None:
+        with self.lock:
+            self.counters[(name, tuple(sorted((k, str(v)) for k, v in labels.items())))] += value
+
+    def set(self, name: str, value: float) -> None:
+        with self.lock:
+            self.gauges[name] = value
+
+    def observe(self, name: str, value: float) -> None:
+        with self.lock:
+            self.histograms[name].observe(value)
+
+    def counter(self, name: str, **labels) -> float:
+        with self.lock:
+            if labels:
+                return self.counters.get((name, tuple(sorted((k, str(v)) for k, v in labels.items()))), 0)
+            return sum(v for (n, _), v in self.counters.items() if n == name)
+
+    def event(self, kind: str, **fields) -> None:
+        if self.file is None:
+            return
+        line = json.dumps({"ts": round(time.time(), 3), "event": kind, **fields}, ensure_ascii=False)
+        with self.lock:
+            self.file.write(line + "\n")
+            self.file.flush()
+
+    def articles_per_minute(self) -> float:
+        minutes = max(1e-9, (time.time() - self.started) / 60)
+        return self.counter("articles_done_total") / minutes
+
+    def summary(self) -> List[List[Any]]:
+        lat = self.histograms["http_request_seconds"]
+        tin = self.histograms["request_input_tokens"]
+        tout = self.histograms["request_output_tokens"]
+        elapsed = time.time() - self.started
+        http_429 = int(self.counter("http_responses_total", status=429))
+        http_5xx = int(sum(self.counter("http_responses_total", status=c) for c in (500, 502, 503, 504)))
+        return [
+            ["Süre (dk)", round(elapsed / 60, 2)],
+            ["HTTP istek", lat.count],
+            ["Gecikme ort. / p50 / p95 (sn)",
+             (f"{(lat.sum / lat.count if lat.count else 0):.2f} / "
+              f"{lat.quantile(0.5):.2f} / {lat.quantile(0.95):.2f}")],
+            ["HTTP retry", int(self.counter("http_retries_total"))],
+            ["429 / 5xx yanıt", f"{http_429} / {http_5xx}"],
+            ["Ağ hatası", int(self.counter("http_network_errors_total"))],
+            ["Parse hatası", int(self.counter("parse_failures_total"))],
+            ["İstek başı input / output token (ort.)",
+             (f"{(tin.sum / tin.count if tin.count else 0):,.0f} / "
+              f"{(tout.sum / tout.count if tout.count else 0):,.0f}")],
+            ["Makale / dakika", round(self.articles_per_minute(), 1)],
+        ]
+
+    def prometheus(self) -> str:
+        out: List[str] = []
+        with self.lock:
+            names = sorted({n for n, _ in self.counters})
+            for name in names:
+                out.append(f"# TYPE screening_{name} counter")
+                for (n, labels), v in sorted(self.counters.items()):
+                    if n == name:
+                        lab = ",".join(f'{k}="{val}"' for k, val in labels)
+                        out.append(f"screening_{n}{{{lab}}} {v:g}" if lab else f"screening_{n} {v:g}")
+            for name, v in sorted(self.gauges.items()):
+                out += [f"# TYPE screening_{name} gauge", f"screening_{name} {v:g}"]
+            for name, h in self.histograms.items():
+                out.append(f"# TYPE screening_{name} histogram")
+                cum = 0
+                for b, c in zip(self.buckets_with_inf(h), h.counts):
+                    cum += c
+                    out.append(f'screening_{name}_bucket{{le="{b}"}} {cum}')
+                out += [f"screening_{name}_sum {h.sum:g}", f"screening_{name}_count {h.count}"]
+        out += ["# TYPE screening_articles_per_minute gauge",
+                f"screening_articles_per_minute {self.articles_per_minute():.2f}"]
+        return "\n".join(out) + "\n"
+
+    @staticmethod
+    def buckets_with_inf(h: Histogram) -> List[str]:
+        return [f"{b:g}" for b in h.buckets] + ["+Inf"]
+
+    def serve(self, port: int) -> None:
+        registry = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                body = registry.prometheus().encode("utf-8")
+                self.send_response(200 if self.path.startswith("/metrics") else 404)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        print(f"📈 Prometheus metrikleri: http://127.0.0.1:{port}/metrics")
+
+    def close(self) -> None:
+        self.event("summary", **{k: v for k, v in self.summary()})
+        if self.server is not None:
+            self.server.shutdown()
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+
+_metrics = Metrics()
+
+
+def metrics() -> Metrics:
+    return _metrics
+
+
+def configure_metrics(args) -> Metrics:
+    global _metrics
+    _metrics = Metrics(args.metrics_file)
+    if args.metrics_port:
+        _metrics.serve(args.metrics_port)
+    return _metrics
@@ -0,0 +1,45 @@
+"""Model yanıtının alanları ve kompakt (kısa anahtarlı) biçim dönüşümleri."""
+
+from __future__ import annotations
+
+import re
+from typing import Any, Dict
+
+ARTICLE_FIELDS = ("authors", "title", "year", "abstract")  # dosyadan gelir, API döndürmez
+NON_MODEL_FIELDS = ("prompt_version", "provenance")  # araç doldurur, modelden istenmez
+DECISIONS = ("Include", "Exclude", "Uncertain")
+COMPACT_KEYS = {
+    "id": "i", "summary_tr": "s", "decision": "d", "confidence": "c",
+    "matched_inclusion_criteria": "ic", "matched_exclusion_criteria": "ec",
+    "needs_human_review": "h", "rationale": "r",
+}
+COMPACT_DECISIONS = {"I": "Include", "E": "Exclude", "U": "Uncertain"}
+CRITERIA_PREFIX = {"matched_inclusion_criteria": "IC", "matched_exclusion_criteria": "EC"}
+FREE_TEXT_FIELDS = ("summary_tr", "rationale")  # ön tarama (yalnız karar) geçişinde istenmez
+
+
+def expand_compact(api_result: Dict[str, Any]) -> Dict[str, Any]:
+    # Kompakt yanıtı tam anahtarlara açar; zaten tam olan yanıt aynen döner
+    if "decision" in api_result or "d" not in api_result:
+        return api_result
+    full = {name: api_result[key] for name, key in COMPACT_KEYS.items() if key in api_result}
+    code = str(full.get("decision") or "U").strip().upper()[:1]
+    full["decision"] = COMPACT_DECISIONS.get(code, "Uncertain")
+    for name, prefix in CRITERIA_PREFIX.items():
+        full[name] = [_criterion_code(prefix, x) for x in full.get(name) or []]
+    return full
+
+
+def compact_api_result(api_result: Dict[str, Any]) -> Dict[str, Any]:
+    out = {COMPACT_KEYS[k]: v for k, v in api_result.items()
+           if k in COMPACT_KEYS and k not in NON_MODEL_FIELDS}
+    out["d"] = str(api_result.get("decision", "Uncertain"))[:1]
+    for name, prefix in CRITERIA_PREFIX.items():
+        out[COMPACT_KEYS[name]] = [int(c[len(prefix):]) for c in api_result.get(name) or []
+                                   if str(c)[len(prefix):].isdigit()]
+    return out
+
+
+def _criterion_code(prefix: str, value: Any) -> str:
+    text = str(value).strip()
+    return f"{prefix}{int(float(text))}" if re.fullmatch(r"\d+(\.0)?", text) else text
@@ -0,0 +1,946 @@
+"""MockBackend üzerinden uçtan uca tarama testleri (ağ ve API key gerekmez)."""
+import csv
+import json
+import sys
+import time
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+import analysis
+import cli
+import metrics
+
+N_ARTICLES = 40
+INCLUSION = "Randomized controlled trial design\nHuman participants\n"
+EXCLUSION = "Animal study\nConference abstract only\n"
+
+
+def _articles(n: int = N_ARTICLES):
+    # Başlık ve özetler birbirinden farklı: dedup hiçbir makaleyi birleştirmez
+    return [cli.Article(ID=str(i), Title=f"Study {i} of topic t{i * 7919 % 1009}",
+                        Abstract=" ".join(f"w{(i * 31 + j * 17) % 997}" for j in range(40)),
+                        Authors=f"Author{i}", Year=str(2000 + i % 20))
+            for i in range(1, n + 1)]
+
+
+@pytest.fixture
+def inputs(tmp_path: Path):
+    src = tmp_path / "in.csv"
+    with src.open("w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["ID", "Title", "Abstract", "Authors", "Year"])
+        writer.writerows([a.ID, a.Title, a.Abstract, a.Authors, a.Year] for a in _articles())
+    (tmp_path / "ic.txt").write_text(INCLUSION, encoding="utf-8")
+    (tmp_path / "ec.txt").write_text(EXCLUSION, encoding="utf-8")
+    return tmp_path
+
+
+def _main(monkeypatch, workdir: Path, *extra: str) -> int:
+    argv = ["cli.py", "--backend", "mock", "--rpm", "0", "--delay", "0", "--no-cache",
+            "--no-partial", "--max-retries", "5",
+            "-i", str(workdir / "in.csv"), "-o", str(workdir / "out.csv"),
+            "--inclusion", str(workdir / "ic.txt"), "--exclusion", str(workdir / "ec.txt"),
+            "--state-file", str(workdir / "state.json"), *extra]
+    monkeypatch.setattr(sys, "argv", argv)
+    return cli.main()
+
+
+def _output_ids(path: Path):
+    with path.open(encoding="utf-8-sig", newline="") as f:
+        rows = list(csv.DictReader(line for line in f if not line.startswith("#")))
+    return [r["ID"] for r in rows]
+
+
+def _instructions(compact: bool) -> str:
+    inclusion = cli.code_criteria([{"text": t} for t in INCLUSION.split("\n") if t], "IC")
+    exclusion = cli.code_criteria([{"text": t} for t in EXCLUSION.split("\n") if t], "EC")
+    return cli.build_instructions(inclusion, exclusion, compact)
+
+
+def _state(compact: bool, n: int = N_ARTICLES) -> cli.State:
+    return cli.State(model_id="gemini-3.1-flash-lite-preview", mode="sync", file_hash="test",
+                     total_count=n, compact_response=compact)
+
+
+# ============================================================
+# INPUT
+# ============================================================
+def test_chunked_csv_reader_numbers_rows_across_chunks(tmp_path):
+    # ID sütunu yoksa satır numarası parçalar boyunca kesintisiz sürer
+    src = tmp_path / "in.csv"
+    src.write_text("Title;Abstract;Year\n" + "".join(f"T{i};A{i};{2000 + i}\n" for i in range(7))
+                   + ";;\n", encoding="utf-8")
+    articles = list(cli.iter_articles(src, chunk_rows=3))
+    assert [a.ID for a in articles] == [str(i) for i in range(1, 8)]
+    assert articles[4] == cli.Article("5", "T4", "A4", "", "2004")
+
+
+# ============================================================
+# DEDUP
+# ============================================================
+_ABSTRACT = ("We randomized adult participants with chronic pain to a structured exercise "
+             "programme or usual care and measured pain intensity over twelve months.")
+
+
+def test_find_duplicates_exact_and_near():
+    articles = [
+        cli.Article("10.1000/xyz.1", "Exercise for chronic pain", _ABSTRACT, "Smith J", "2020"),
+        cli.Article("https://doi.org/10.1000/XYZ.1", "Different title", "Other text.", "", ""),
+        cli.Article("3", "Exercise for chronic pain", "Short.", "Smith J; Doe A", "2020"),
+        # Yazar/yıl farklı, özet bir kelime uzun: yalnız MinHash yakalar
+        cli.Article("4", "Exercise for Chronic Pain.", _ABSTRACT + " Abstract.", "Smyth J", "2021"),
+        cli.Article("5", "Editorial", "Editorial note.", "Smith J", "2020"),
+        cli.Article("6", "Editorial", "Another editorial.", "Smith J", "2020"),
+        cli.Article("7", "Unrelated", "Rainfall and temperature patterns over several decades "
+                    "in coastal regions of northern Europe.", "Lee K", "2019"),
+    ]
+    dedup = cli.find_duplicates(articles)
+    assert dedup.member_index == {1: 0, 2: 0, 3: 0}
+    assert dedup.rep_ids == {0: "10.1000/xyz.1"}
+    assert [a.ID for a in cli.iter_unique(articles, dedup)] == ["10.1000/xyz.1", "5", "6", "7"]
+
+
+def test_exact_keys_need_year_and_author():
+    assert cli._exact_keys(cli.Article("1", "Exercise for chronic pain", "x", "", "")) == []
+    assert cli._exact_keys(cli.Article("1", "Exercise for chronic pain", "", "Smith J", "2020")) == [
+        "title:exercise for chronic pain|2020|smith"]
+
+
+def test_expand_duplicates_copies_representative_result():
+    articles = [cli.Article("1", "A", "x", "Smith", "2020"), cli.Article("2", "A", "x", "Doe", "2021")]
+    dedup = cli.DedupResult(member_index={1: 0}, rep_ids={0: "1"})
+    result = cli.Result(id="1", authors="Smith", title="A", year="2020", abstract="x",
+                        summary_tr="", decision="Include", confidence=0.9,
+                        matched_inclusion_criteria=["IC1"], matched_exclusion_criteria=[],
+                        needs_human_review=False, rationale="uygun")
+    expanded = cli.expand_duplicates([result], dedup, articles)
+    assert [(r.id, r.authors, r.decision) for r in expanded] == [
+        ("1", "Smith", "Include"), ("2", "Doe", "Include")]
+    assert expanded[1].rationale == "[Tekrar → 1] uygun"
+
+
+def test_dedup_cli_run(monkeypatch, inputs):
+    # Yinelenen satır API'ye gitmez ama çıktıda temsilcinin kararıyla yer alır
+    with (inputs / "in.csv").open("a", encoding="utf-8", newline="") as f:
+        a = _articles(1)[0]
+        csv.writer(f).writerow(["dup", a.Title, a.Abstract, a.Authors, a.Year])
+    assert _main(monkeypatch, inputs) == 0
+    with (inputs / "out.csv").open(encoding="utf-8-sig", newline="") as f:
+        rows = {r["ID"]: r for r in csv.DictReader(line for line in f if not line.startswith("#"))}
+    assert len(rows) == N_ARTICLES + 1
+    assert rows["dup"]["Gerekçe"].startswith("[Tekrar → 1]")
+    assert rows["dup"]["Karar"] == rows["1"]["Karar"]
+
+
+# ============================================================
+# RESPONSE PARSING
+# ============================================================
+def _result_json(i: int) -> str:
+    return (f'{{"id": "{i}", "summary_tr": "özet {{}}", "decision": "Include", "confidence": 0.9, '
+            f'"matched_inclusion_criteria": ["IC1"], "matched_exclusion_criteria": [], '
+            f'"needs_human_review": false, "rationale": "r"}}')
+
+
+def test_parse_model_response_skips_fences_and_prose():
+    text = f'Sonuçlar:\n```json\n{{"results": [{_result_json(1)}, {_result_json(2)}]}}\n```\nbitti'
+    assert [r["id"] for r in cli.parse_model_response(text)] == ["1", "2"]
+
+
+def test_truncated_response_keeps_complete_objects():
+    # MAX_TOKENS: son nesne yarıda kesildi; özetteki '{}' ayrıştırmayı şaşırtmaz
+    text = '{"results": [' + ", ".join(_result_json(i) for i in range(1, 4)) + ', {"id": "4", "summ'
+    results = cli.parse_model_response(text)
+    assert [r["id"] for r in results] == ["1", "2", "3"]
+    assert results[0]["summary_tr"] == "özet {}"
+
+
+def test_recover_objects_expands_compact_and_skips_broken():
+    text = '{"results": [{"i": "1", "d": "E", "ec": [2]}, {"i": "2", "d": }, {"i": "3", "d": "I", "ic": [1]}'
+    results = cli.parse_model_response(text)
+    assert [(r["id"], r["decision"]) for r in results] == [("1", "Exclude"), ("3", "Include")]
+    assert results[0]["matched_exclusion_criteria"] == ["EC2"]
+    assert cli.parse_model_response("tamamen bozuk") == []
+
+
+def test_response_schema_lists_only_model_fields():
+    item = cli.response_schema()["properties"]["results"]["items"]
+    assert item["required"] == ["id", "summary_tr", "decision", "confidence",
+                                "matched_inclusion_criteria", "matched_exclusion_criteria",
+                                "needs_human_review", "rationale"]
+    assert item["properties"]["decision"]["enum"] == list(cli.DECISIONS)
+    compact = cli.response_schema(compact=True, decision_only=True)["properties"]["results"]["items"]
+    assert compact["required"] == ["i", "d", "c", "ic", "ec", "h"]
+    assert compact["properties"]["ec"]["items"]["type"] == "INTEGER"
+
+
+def test_compact_round_trip():
+    full = {"id": "7", "summary_tr": "özet", "decision": "Uncertain", "confidence": 0.5,
+            "matched_inclusion_criteria": ["IC1", "IC3"], "matched_exclusion_criteria": [],
+            "needs_human_review": True, "rationale": "belirsiz"}
+    compact = cli.compact_api_result(full)
+    assert compact["d"] == "U"
+    assert compact["ic"] == [1, 3]
+    assert cli.expand_compact(compact) == full
+    assert cli.expand_compact(full) is full
+    assert cli.output_tokens_per_article(compact=True) < cli.output_tokens_per_article()
+
+
+def test_malformed_responses_cli_run(monkeypatch, inputs):
+    # Bozuk yanıtlardan kurtarılamayan makaleler retry kuyruğunda tamamlanır
+    assert _main(monkeypatch, inputs, "--mock", "malformed=0.5,seed=3", "--max-retries", "20") == 0
+    ids = _output_ids(inputs / "out.csv")
+    assert sorted(map(int, ids)) == list(range(1, N_ARTICLES + 1))
+
+
+# ============================================================
+# SYNC
+# ============================================================
+@pytest.mark.parametrize("compact", [False, True])
+def test_run_sync_drains_retry_queue(compact):
+    # Düşürülen ve bozuk yanıtlar retry kuyruğuna gider, kuyruk sonunda boşalır
+    backend = cli.MockBackend(cli.MockConfig(drop=0.15, malformed=0.1, seed=7))
+    state = _state(compact)
+    results = cli.run_sync(_articles(), state, backend, _instructions(compact),
+                           batch_size=5, delay_sec=0, save_state_fn=lambda s: None,
+                           max_retries=5)
+    ids = [r.id for r in results]
+    assert len(ids) == N_ARTICLES
+    assert len(set(ids)) == N_ARTICLES
+    assert state.retry_queue == []
+    assert state.retry_failed == 0
+    assert all(r.decision for r in results)
+
+
+def test_retry_queue_survives_a_failed_retry():
+    # Retry isteği hata alırsa makaleler kuyruğa geri döner (sonraki --resume'da denenir)
+    backend = cli.MockBackend(cli.MockConfig(p503=1.0, burst=99), retries=0)
+    state = _state(False, 5)
+    state.retry_queue = [{"article": cli.asdict(a), "attempts": 0, "reason": "test"}
+                         for a in _articles(5)]
+    done = cli.run_retry_queue(state, backend, _instructions(False), 5, lambda s: None)
+    assert done == []
+    assert [q["article"]["ID"] for q in state.retry_queue] == ["1", "2", "3", "4", "5"]
+
+
+@pytest.mark.parametrize("compact", [False, True])
+def test_sync_cli_run(monkeypatch, inputs, compact):
+    extra = ["--mock", "drop=0.1,seed=3"] + (["--compact"] if compact else [])
+    assert _main(monkeypatch, inputs, *extra) == 0
+    ids = _output_ids(inputs / "out.csv")
+    assert len(ids) == N_ARTICLES
+    assert len(set(ids)) == N_ARTICLES
+    # Tamamlanan çalışmanın state dosyaları silinir
+    assert not (inputs / "state.json").exists()
+
+
+class _FailFirstBatch(cli.MockBackend):
+    # İlk batch hemen hata verir, diğerleri gecikmeyle yanıtlanır (yolda kalırlar)
+    def __init__(self):
+        super().__init__(cli.MockConfig())
+        self.calls = 0
+
+    def generate_content(self, model_id, body):
+        self.calls += 1
+        if "### id: 1\n" in body["contents"][0]["parts"][0]["text"]:
+            raise RuntimeError("API 500: boom")
+        time.sleep(0.2)
+        return super().generate_content(model_id, body)
+
+
+def test_run_sync_keeps_in_flight_batches_after_error():
+    backend = _FailFirstBatch()
+    state = _state(False)
+    results = cli.run_sync(_articles(), state, backend, _instructions(False),
+                           batch_size=5, delay_sec=0, save_state_fn=lambda s: None,
+                           concurrency=4)
+    # Batch 1 hatası: yoldaki 2-4 beklenir ve kaydedilir, yeni istek atılmaz
+    assert backend.calls == 4
+    assert sorted(int(r.id) for r in results) == list(range(6, 21))
+    assert state.last_processed_batch_index == -1
+
+
+def test_expired_context_cache_falls_back_once(capsys):
+    # Paralel isteklerin hepsi 403 alır; state bir kez güncellenir, hepsi talimatla tekrarlanır
+    backend = cli.MockBackend(cli.MockConfig(latency=0.05))
+    state = _state(False)
+    state.context_cache_name = "cachedContents/expired"
+    results = cli.run_sync(_articles(), state, backend, _instructions(False),
+                           batch_size=5, delay_sec=0, save_state_fn=lambda s: None,
+                           concurrency=4)
+    assert len(results) == N_ARTICLES
+    assert state.context_cache_name == ""
+    assert capsys.readouterr().out.count("Context cache kullanılamadı") == 1
+
+
+def test_packer_respects_token_budget_and_order():
+    # Uzunlukları farklı makaleler: en uzunlar önce yerleşir, her batch girdi sırasını korur
+    articles = [cli.Article(str(i), f"T{i}", "x" * (400 * (i % 5 + 1))) for i in range(30)]
+    packer = cli.BatchPacker("i" * 400, max_input_tokens=1_200, max_output_tokens=2_000)
+    budget = packer.max_input_tokens - packer.instruction_tokens
+    batches = list(packer.pack(articles))
+    assert sorted(a.ID for b in batches for a in b) == sorted(a.ID for a in articles)
+    for b in batches:
+        assert len(b) <= packer.capacity()
+        assert sum(map(packer.article_tokens, b)) <= budget
+        assert [int(a.ID) for a in b] == sorted(int(a.ID) for a in b)
+    # Tahmin alt sınırdır: kapasite ve toplam token bütçesinden az batch olamaz
+    assert len(batches) >= packer.estimate_batches(
+        len(articles), sum(map(packer.article_tokens, articles)))
+
+
+def test_packer_feedback_shrinks_and_recovers_capacity():
+    packer = cli.BatchPacker("", max_output_tokens=2_000, max_articles=50)
+    assert packer.capacity() == 10
+    packer.feedback(requested=10, returned=10, truncated=True)
+    assert packer.capacity() == 6
+    for _ in range(20):
+        packer.feedback(requested=6, returned=6, truncated=False)
+    assert packer.output_per_article == cli.OUTPUT_TOKENS_PER_ARTICLE
+    assert packer.capacity() == 10
+
+
+def test_packed_cli_run(monkeypatch, inputs):
+    assert _main(monkeypatch, inputs, "--pack", "--max-input-tokens", "4000") == 0
+    ids = _output_ids(inputs / "out.csv")
+    assert sorted(map(int, ids)) == list(range(1, N_ARTICLES + 1))
+
+
+# ============================================================
+# ASYNC
+# ============================================================
+@pytest.mark.parametrize("compact", [False, True])
+def test_async_sharded_run(monkeypatch, inputs, capsys, compact):
+    extra = ["--mode", "async", "--shard-size", "12", "--poll-interval", "0",
+             "--mock", "batch_seconds=0,drop=0.05,seed=5"] + (["--compact"] if compact else [])
+    assert _main(monkeypatch, inputs, *extra) == 0
+    assert f"{N_ARTICLES:,} istek, 4 job" in capsys.readouterr().out
+    ids = _output_ids(inputs / "out.csv")
+    assert len(ids) == N_ARTICLES
+    assert len(set(ids)) == N_ARTICLES
+
+
+def test_async_poll_recovers_from_status_errors(monkeypatch, inputs):
+    # Status sorgusundaki ağ hatası job'ı düşürmez; sorgu daha sonra tekrarlanır
+    monkeypatch.setattr(cli, "POLL_MIN_INTERVAL", 0.0)
+    get_batch = cli.MockBackend.get_batch
+    failures = []
+
+    def flaky(self, name):
+        if len(failures) < 2:
+            failures.append(name)
+            raise cli.requests.ConnectionError("bağlantı koptu")
+        return get_batch(self, name)
+
+    monkeypatch.setattr(cli.MockBackend, "get_batch", flaky)
+    extra = ["--mode", "async", "--poll-interval", "0", "--mock", "batch_seconds=0"]
+    assert _main(monkeypatch, inputs, *extra) == 0
+    assert len(failures) == 2
+    assert len(_output_ids(inputs / "out.csv")) == N_ARTICLES
+
+
+# ============================================================
+# OUTPUT
+# ============================================================
+def test_parquet_output(monkeypatch, inputs):
+    pq = pytest.importorskip("pyarrow.parquet")
+    assert _main(monkeypatch, inputs, "-o", str(inputs / "out.parquet")) == 0
+    table = pq.read_table(inputs / "out.parquet")
+    assert table.num_rows == N_ARTICLES
+    assert table.schema.field("confidence").type == "double"
+    assert table.column("matched_inclusion_criteria").type.value_type == "string"
+    meta = dict(json.loads(table.schema.metadata[b"screening_metadata"]))
+    assert meta["Toplam makale"] == N_ARTICLES
+
+
+def test_xlsx_output(monkeypatch, inputs):
+    openpyxl = pytest.importorskip("openpyxl")
+    assert _main(monkeypatch, inputs, "-o", str(inputs / "out.xlsx")) == 0
+    wb = openpyxl.load_workbook(inputs / "out.xlsx", read_only=True)
+    rows = list(wb["Screening"].values)
+    assert list(rows[0]) == cli.EXCEL_COLUMNS
+    assert sorted(int(r[0]) for r in rows[1:]) == list(range(1, N_ARTICLES + 1))
+    meta = dict(list(wb["Metadata"].values)[1:])
+    assert meta["Toplam makale"] == N_ARTICLES
+
+
+def test_partial_writer_appends_and_rebuilds(tmp_path):
+    path = tmp_path / "out.partial.csv"
+    writer = cli.PartialWriter(path)
+    state = _state(False, 3)
+    row = {"id": "1", "authors": "", "title": "T", "year": "", "abstract": "", "summary_tr": "",
+           "decision": "Include", "confidence": 0.9, "matched_inclusion_criteria": ["IC1"],
+           "matched_exclusion_criteria": [], "needs_human_review": False, "rationale": ""}
+    state.results = [row, {**row, "id": "2"}]
+    writer.update(state)
+    state.results.append({**row, "id": "3"})
+    writer.update(state)
+    assert _output_ids(path) == ["1", "2", "3"]
+    # İkinci geçiş sonuçları küçültür: dosya baştan kurulur
+    state.results = [{**row, "id": "2"}]
+    writer.update(state)
+    assert _output_ids(path) == ["2"]
+    writer.delete()
+    assert not path.exists()
+
+
+# ============================================================
+# RESUME
+# ============================================================
+def test_resume_from_state_store(tmp_path):
+    path = tmp_path / "state.json"
+    backend = cli.MockBackend(cli.MockConfig(drop=0.1, seed=11))
+    instructions = _instructions(False)
+    store = cli.StateStore(path)
+    saves = 0
+
+    def interrupted_save(state: cli.State) -> None:
+        nonlocal saves
+        store.save(state)
+        saves += 1
+        if saves == 3:
+            raise KeyboardInterrupt
+
+    with pytest.raises(KeyboardInterrupt):
+        cli.run_sync(_articles(), _state(False), backend, instructions, batch_size=5,
+                     delay_sec=0, save_state_fn=interrupted_save, max_retries=5)
+
+    store = cli.StateStore(path)
+    state = store.load()
+    assert state is not None
+    done = len(state.results)
+    assert 0 < done < N_ARTICLES
+    results = cli.run_sync(_articles(), state, backend, instructions, batch_size=5,
+                           delay_sec=0, save_state_fn=store.save, max_retries=5)
+    ids = [r.id for r in results]
+    assert len(ids) == N_ARTICLES
+    assert len(set(ids)) == N_ARTICLES
+    assert state.retry_queue == []
+
+    reloaded = cli.StateStore(path).load()
+    assert sorted(r["id"] for r in reloaded.results) == sorted(ids)
+
+
+def test_state_store_keeps_key_map_out_of_header(tmp_path):
+    path = tmp_path / "state.json"
+    state = _state(False)
+    state.batch_key_map = {"1": {"ID": "1"}}
+    cli.StateStore(path).save(state)
+    assert "batch_key_map" not in path.read_text(encoding="utf-8")
+    assert cli.StateStore(path).load().batch_key_map == {"1": {"ID": "1"}}
+
+
+def test_state_store_rejects_corrupt_header(tmp_path, capsys):
+    path = tmp_path / "state.json"
+    path.write_text('{"model_id": "x", "unknown_field": 1}', encoding="utf-8")
+    assert cli.StateStore(path).load() is None
+    path.write_text("{yarım", encoding="utf-8")
+    assert cli.StateStore(path).load() is None
+    assert capsys.readouterr().err.count("State yükleme hatası") == 2
+
+
+# ============================================================
+# TWO-PASS
+# ============================================================
+def test_start_second_pass_keeps_only_confident_excludes():
+    state = _state(False, 5)
+    state.screening_pass, state.second_pass_model, state.second_pass_threshold = \
+        1, "gemini-2.5-flash", 0.85
+    state.total_cost_usd = 0.5
+    state.context_cache_name = "cachedContents/first"
+    state.results = [
+        {"id": "1", "decision": "Exclude", "confidence": 0.95},
+        {"id": "2", "decision": "Exclude", "confidence": 0.6},
+        {"id": "3", "decision": "Include", "confidence": 0.99},
+        {"id": "4", "decision": "Uncertain", "confidence": None},
+        {"id": "5", "decision": "Exclude", "confidence": None,
+         "rationale": f"{cli.PREFILTER_TAG} IC benzerliği 0.01 < eşik 0.10"},
+    ]
+    assert cli.start_second_pass(state, "p2") == 3
+    assert [r["id"] for r in state.results] == ["1", "5"]
+    assert state.results[0]["rationale"].startswith(cli.FIRST_PASS_TAG)
+    assert state.results[1]["rationale"].startswith(cli.PREFILTER_TAG)
+    assert state.first_pass["screened"] == 5
+    assert state.first_pass["cost_usd"] == 0.5
+    assert (state.screening_pass, state.model_id, state.prompt_hash) == (2, "gemini-2.5-flash", "p2")
+    assert state.context_cache_name == ""
+
+
+def test_two_pass_cli_run(monkeypatch, inputs, capsys):
+    assert _main(monkeypatch, inputs, "--two-pass") == 0
+    assert "1. geçiş tamamlandı" in capsys.readouterr().out
+    with (inputs / "out.csv").open(encoding="utf-8-sig", newline="") as f:
+        rows = list(csv.DictReader(line for line in f if not line.startswith("#")))
+    assert sorted(int(r["ID"]) for r in rows) == list(range(1, N_ARTICLES + 1))
+    for r in rows:
+        if r["Gerekçe"].startswith(cli.FIRST_PASS_TAG):
+            assert r["Karar"] == "Exclude"
+        else:
+            assert r["Türkçe Özet"]
+
+
+# ============================================================
+# ENSEMBLE
+# ============================================================
+def _ensemble_args(**kw):
+    return SimpleNamespace(**{"rpm": 0, "tpm": 0, "concurrency": 1, "batch_size": 5, **kw})
+
+
+def _low_confidence_state(n: int = 20) -> cli.State:
+    state = _state(False, n)
+    state.ensemble = {"threshold": 0.7, "method": "majority",
+                      "voters": [["gemini-3.1-flash-lite-preview", 1.0]] * 3,
+                      "voted": 0, "changed": 0, "requests": 0, "cost_usd": 0.0}
+    for a in _articles(n):
+        r = cli.merge_result(a, {"id": a.ID, "summary_tr": "s", "decision": "Uncertain",
+                                 "confidence": 0.3, "matched_inclusion_criteria": [],
+                                 "matched_exclusion_criteria": [], "needs_human_review": True,
+                                 "rationale": "r"})
+        state.results.append(cli.asdict(r))
+    return state
+
+
+def test_ensemble_voters_cycle_models_and_temperatures():
+    voters = cli.ensemble_voters(["a", "b"], [0.2, 1.0], 5)
+    assert voters[:4] == [["a", 0.2], ["b", 1.0], ["a", 1.0], ["b", 0.2]]
+    assert voters[4] == voters[0]
+
+
+@pytest.mark.parametrize("method, decision, share", [
+    ("majority", "Exclude", 0.67),
+    ("weighted", "Include", 0.54),
+])
+def test_aggregate_votes(method, decision, share):
+    votes = [{"decision": "Include", "confidence": 0.95},
+             {"decision": "Exclude", "confidence": 0.4},
+             {"decision": "Exclude", "confidence": 0.4}]
+    assert cli.aggregate_votes(votes, method) == (decision, share)
+    # Eşitlik: Uncertain, hiçbir oy onu desteklemediği için güven 0
+    assert cli.aggregate_votes(votes[:2], "majority") == ("Uncertain", 0.0)
+
+
+def test_apply_votes_keeps_criteria_of_the_majority():
+    result = {"decision": "Include", "confidence": 0.4, "rationale": "ilk",
+              "matched_inclusion_criteria": ["IC1"], "matched_exclusion_criteria": []}
+    samples = [{"decision": "Exclude", "matched_exclusion_criteria": ["EC1", "EC2"]},
+               {"decision": "Exclude", "matched_exclusion_criteria": ["EC1"]}]
+    assert cli.apply_votes(result, samples, "majority", 0.7)
+    assert (result["decision"], result["confidence"]) == ("Exclude", 0.67)
+    assert result["matched_exclusion_criteria"] == ["EC1", "EC2"]
+    assert result["matched_inclusion_criteria"] == []
+    assert result["needs_human_review"]
+    assert result["rationale"].startswith(f"{cli.ENSEMBLE_TAG} 2/3 · Exclude 2, Include 1] "
+                                          "ilk karar Include; ilk")
+    assert not cli.needs_vote(result, 0.7)
+
+
+def test_ensemble_resume_keeps_votes(tmp_path):
+    # Oylanan satırlar journal'a yazılır: resume aynı makaleleri yeniden oylamaz
+    path = tmp_path / "state.json"
+    backend = cli.MockBackend(cli.MockConfig(seed=2))
+    state = _low_confidence_state()
+    store = cli.StateStore(path)
+    store.save(state)
+    saves = 0
+
+    def interrupted_save(state: cli.State, updated=()) -> None:
+        nonlocal saves
+        store.save(state, updated)
+        saves += 1
+        if saves == 2:
+            raise KeyboardInterrupt
+
+    with pytest.raises(KeyboardInterrupt):
+        cli.run_ensemble(_ensemble_args(), state, backend, [], [], interrupted_save)
+
+    store = cli.StateStore(path)
+    resumed = store.load()
+    tagged = [r for r in resumed.results if r["rationale"].startswith(cli.ENSEMBLE_TAG)]
+    assert len(tagged) == resumed.ensemble["voted"] == 10
+    assert resumed.ensemble["requests"] == 2 * 3
+
+    cli.run_ensemble(_ensemble_args(), resumed, backend, [], [], store.save)
+    assert resumed.ensemble["voted"] == 20
+    assert resumed.ensemble["requests"] == 4 * 3
+    final = cli.StateStore(path).load()
+    assert all(r["rationale"].startswith(cli.ENSEMBLE_TAG) for r in final.results)
+    assert final.ensemble == resumed.ensemble
+
+
+def test_ensemble_cli_run(monkeypatch, inputs, capsys):
+    assert _main(monkeypatch, inputs, "--ensemble", "3", "--ensemble-threshold", "0.9") == 0
+    capsys.readouterr()
+    with (inputs / "out.csv").open(encoding="utf-8-sig", newline="") as f:
+        rows = list(csv.DictReader(line for line in f if not line.startswith("#")))
+    assert len(rows) == N_ARTICLES
+    voted = [r for r in rows if r["Gerekçe"].startswith(cli.ENSEMBLE_TAG)]
+    assert voted
+    assert all("/4 · " in r["Gerekçe"] for r in voted)
+
+
+# ============================================================
+# METRICS
+# ============================================================
+class _FailingSession:
+    # requests gibi hata mesajına tam URL'yi koyar
+    def __init__(self):
+        self.calls = []
+
+    def request(self, method, url, headers=None, **kwargs):
+        self.calls.append((url, dict(headers or {})))
+        raise cli.requests.ConnectionError(f"Max retries exceeded with url: {url}")
+
+
+def test_api_key_not_in_metrics_file(tmp_path, monkeypatch):
+    path = tmp_path / "metrics.jsonl"
+    monkeypatch.setattr(metrics, "_metrics", metrics.Metrics(path))
+    session = _FailingSession()
+    backend = cli.GeminiBackend("AIzaSECRET", cli.ApiClient(session=session, retries=0))
+    with pytest.raises(cli.requests.ConnectionError):
+        backend.generate_content("gemini-2.5-flash", {"contents": []})
+    cli.metrics().close()
+    text = path.read_text(encoding="utf-8")
+    assert '"event": "request"' in text
+    assert "AIzaSECRET" not in text
+    url, headers = session.calls[0]
+    assert "AIzaSECRET" not in url
+    assert headers["x-goog-api-key"] == "AIzaSECRET"
+
+
+# ============================================================
+# BACKEND
+# ============================================================
+def test_backend_requires_every_operation():
+    class Partial(cli.Backend):
+        def generate_content(self, model_id, body):
+            return {}
+
+    with pytest.raises(TypeError):
+        Partial()
+
+
+def test_metrics_summary_and_prometheus():
+    m = metrics.Metrics()
+    for seconds in (0.1, 0.2, 0.4, 3.0):
+        m.observe("http_request_seconds", seconds)
+    m.inc("http_responses_total", status=429)
+    m.inc("http_responses_total", 2, status=503)
+    m.inc("http_responses_total", 5, status=200)
+    summary = dict(m.summary())
+    assert summary["HTTP istek"] == 4
+    assert summary["429 / 5xx yanıt"] == "1 / 2"
+    assert summary["Gecikme ort. / p50 / p95 (sn)"].startswith("0.93 / ")
+    text = m.prometheus()
+    assert 'http_responses_total{status="503"} 2' in text
+    assert "http_request_seconds_count 4" in text
+
+
+# ============================================================
+# USAGE
+# ============================================================
+def test_model_version_alias_is_not_a_fallback():
+    state = _state(False)
+    usage = {"promptTokenCount": 1000, "candidatesTokenCount": 100}
+    cli.add_response_usage(state, {"usageMetadata": usage,
+                                   "modelVersion": "gemini-3.1-flash-lite-preview-06-17"})
+    cli.add_response_usage(state, {"usageMetadata": usage, "modelVersion": "gemini-2.5-flash"})
+    assert state.fallback_requests == {}
+    expected = _state(False)
+    cli.add_usage(expected, 2000, 200)
+    assert state.total_cost_usd == pytest.approx(expected.total_cost_usd)
+
+
+def test_pool_fallback_is_counted_and_priced():
+    state = _state(False)
+    usage = {"promptTokenCount": 1000, "candidatesTokenCount": 100}
+    cli.add_response_usage(state, {"usageMetadata": usage,
+                                   cli.FALLBACK_MODEL_KEY: "gemini-2.5-flash"})
+    assert state.fallback_requests == {"gemini-2.5-flash": 1}
+    expected = _state(False)
+    cli.add_usage(expected, 1000, 100, model_id="gemini-2.5-flash")
+    assert state.total_cost_usd == pytest.approx(expected.total_cost_usd)
+
+
+# ============================================================
+# KEY POOL
+# ============================================================
+def test_load_api_keys_from_list_and_file(tmp_path):
+    assert cli.load_api_keys("a, b,a,,c") == ["a", "b", "c"]
+    keys = tmp_path / "keys.txt"
+    keys.write_text("# ekip\nk1\n\nk2\nk1\n", encoding="utf-8")
+    assert cli.load_api_keys(str(keys)) == ["k1", "k2"]
+
+
+def test_quota_pool_balances_keys_and_falls_back(tmp_path):
+    model, fallback = "gemini-3.1-flash-lite-preview", "gemini-2.5-flash"
+    path = tmp_path / "quota.json"
+    pool = cli.QuotaPool(path, ["k1", "k2"], [fallback], rpm=0, rpd=2, tpm=0)
+    taken = [pool.acquire(model, 100) for _ in range(4)]
+    assert sorted(s.key for s in taken) == sorted(2 * [cli.key_fingerprint("k1"),
+                                                        cli.key_fingerprint("k2")])
+    assert {s.model for s in taken} == {model}
+    # İstenen modelin günlük kotası bitti: yedek model kullanılır
+    assert pool.acquire(model, 100).model == fallback
+    pool.save()
+    # Sayaçlar çalıştırmalar arası kalıcı; ham key dosyaya yazılmaz
+    assert '"k1"' not in path.read_text(encoding="utf-8")
+    reloaded = cli.QuotaPool(path, ["k1", "k2"], rpm=0, rpd=2, tpm=0)
+    with pytest.raises(RuntimeError, match="günlük kotası doldu"):
+        reloaded.acquire(model, 100)
+
+
+def test_quota_pool_skips_throttled_key(tmp_path):
+    model = "gemini-3.1-flash-lite-preview"
+    pool = cli.QuotaPool(tmp_path / "quota.json", ["k1", "k2"], rpm=0, rpd=0, tpm=0)
+    first = pool.acquire(model, 100)
+    pool.throttle(first, retry_after=60)
+    assert all(pool.acquire(model, 100).key != first.key for _ in range(3))
+
+
+def test_key_pool_cli_run_rotates_on_429(monkeypatch, inputs, capsys):
+    # 429 alan key dinlenmeye alınır, istek beklemeden sıradaki key'le tekrarlanır
+    quota = inputs / "quota.json"
+    assert _main(monkeypatch, inputs, "--api-keys", "k1,k2,k3", "--batch-size", "5",
+                 "--mock", "p429=0.3,retry_delay=0.01,seed=2", "--quota-file", str(quota)) == 0
+    assert "sonraki anahtara geçiliyor" in capsys.readouterr().out
+    assert sorted(map(int, _output_ids(inputs / "out.csv"))) == list(range(1, N_ARTICLES + 1))
+    slots = json.loads(quota.read_text(encoding="utf-8"))["slots"]
+    assert len(slots) == 3
+    assert sum(s["throttled"] for s in slots) > 0
+    assert min(s["requests"] for s in slots) > 0
+
+
+# ============================================================
+# INCREMENTAL
+# ============================================================
+def _prior(inclusion, exclusion, rows=()):
+    return cli.PriorResults(Path("prev.csv"), {r.id: r for r in rows},
+                            {f"IC{i}": t for i, t in enumerate(inclusion, 1)},
+                            {f"EC{i}": t for i, t in enumerate(exclusion, 1)})
+
+
+def test_diff_criteria_renumbers_moved_criteria():
+    prior = _prior(["Adults", "RCT"], ["Animal study"])
+    inclusion = cli.code_criteria([{"text": "Children"}, {"text": "adults "}, {"text": "RCT"}], "IC")
+    diff = cli.diff_criteria(prior, inclusion, cli.code_criteria([{"text": "Animal  study"}], "EC"))
+    assert diff.ic_map == {"IC1": "IC2", "IC2": "IC3"}
+    assert diff.ec_map == {"EC1": "EC1"}
+    assert (diff.added_ic, diff.removed_ic, diff.added_ec, diff.removed_ec) == (["IC1"], [], [], [])
+    assert diff.describe() == "+IC1"
+
+
+def _prior_row(decision, ec=(), **kw):
+    a = _articles(1)[0]
+    return cli.Result(id=a.ID, authors=a.Authors, title=a.Title, year=a.Year, abstract=a.Abstract,
+                      summary_tr="özet", decision=decision, confidence=0.9,
+                      matched_inclusion_criteria=[], matched_exclusion_criteria=list(ec),
+                      needs_human_review=False, rationale=kw.get("rationale", "r"))
+
+
+@pytest.mark.parametrize("row, added_ic, added_ec, removed_ec, reason", [
+    (None, [], [], [], "yeni makale"),
+    (_prior_row("Include"), [], [], [], ""),
+    (_prior_row("Include", rationale=cli.PREFILTER_TAG + " IC"), [], [], [], "önceki sonuç kullanılamaz"),
+    (_prior_row("Exclude", ["EC1"]), ["IC3"], ["EC3"], [], ""),
+    (_prior_row("Exclude", ["EC2"]), [], [], ["EC2"], "ölçüt değişti"),
+    (_prior_row("Uncertain"), [], ["EC3"], [], "ölçüt değişti"),
+    (_prior_row("Include"), [], ["EC3"], [], "ölçüt değişti"),
+    (_prior_row("Exclude"), [], ["EC3"], [], ""),
+    (_prior_row("Exclude"), ["IC3"], [], [], "ölçüt değişti"),
+])
+def test_rescreen_reason(row, added_ic, added_ec, removed_ec, reason):
+    ec_map = {c: c for c in ("EC1", "EC2") if c not in removed_ec}
+    diff = cli.CriteriaDiff({"IC1": "IC1", "IC2": "IC2"}, ec_map, added_ic, [], added_ec, removed_ec)
+    assert cli.rescreen_reason(_articles(1)[0], row, diff) == reason
+
+
+def test_rescreen_reason_detects_changed_content():
+    article = _articles(1)[0]
+    article.Abstract += " (corrected)"
+    diff = cli.CriteriaDiff({}, {}, [], [], [], [])
+    assert cli.rescreen_reason(article, _prior_row("Include"), diff) == "içerik değişti"
+
+
+def test_incremental_cli_run(monkeypatch, inputs, capsys):
+    assert _main(monkeypatch, inputs) == 0
+    (inputs / "ec.txt").write_text("Case report\n" + EXCLUSION, encoding="utf-8")
+    assert _main(monkeypatch, inputs, "--incremental", str(inputs / "out.csv"),
+                 "-o", str(inputs / "out2.csv"), "--state-file", str(inputs / "state2.json")) == 0
+    assert "Artımlı tarama: out.csv" in capsys.readouterr().out
+    with (inputs / "out.csv").open(encoding="utf-8-sig", newline="") as f:
+        before = {r["ID"]: r for r in csv.DictReader(line for line in f if not line.startswith("#"))}
+    with (inputs / "out2.csv").open(encoding="utf-8-sig", newline="") as f:
+        after = {r["ID"]: r for r in csv.DictReader(line for line in f if not line.startswith("#"))}
+    assert set(after) == set(before)
+    carried_ids = {i for i, r in after.items() if r["Kaynak"].startswith(cli.CARRIED_TAG)}
+    assert 0 < len(carried_ids) < N_ARTICLES
+    for article_id, r in after.items():
+        old = before[article_id]
+        carried = article_id in carried_ids
+        assert carried == (old["Karar"] == "Exclude" and bool(old["EC"]))
+        if carried:
+            # EC1 → EC2, EC2 → EC3: yeni ölçüt başa eklendi
+            assert r["EC"] == ";".join(f"EC{int(c[2:]) + 1}" for c in old["EC"].split(";"))
+
+
+# ============================================================
+# ANALYSIS
+# ============================================================
+def test_cohen_kappa():
+    a, b = analysis.np.array([0, 0, 1, 1]), analysis.np.array([0, 1, 1, 1])
+    kappa, m = analysis.cohen_kappa(a, b, 2)
+    assert kappa == pytest.approx(0.5)
+    assert m.tolist() == [[1, 1], [0, 2]]
+    assert analysis.cohen_kappa(a, a, 2)[0] == pytest.approx(1.0)
+
+
+def test_wss_at():
+    y = analysis.np.array([True, True] + [False] * 8)
+    # Include'lar en üstte: 2 makale okunur, 8'i okunmadan kalır
+    assert analysis.wss_at(analysis.np.linspace(1, 0, 10), y) == pytest.approx(0.8 - 0.05)
+    assert analysis.wss_at(analysis.np.linspace(0, 1, 10), y) == pytest.approx(-0.05)
+    assert analysis.np.isnan(analysis.wss_at(analysis.np.ones(3), analysis.np.zeros(3, dtype=bool)))
+
+
+def test_calibration_curve():
+    n, mean_conf, accuracy, ece = analysis.calibration_curve(
+        analysis.np.array([0.95, 0.95, 0.15, 0.15]), analysis.np.array([1.0, 0.0, 1.0, 1.0]), bins=10)
+    assert n[9] == 2 and n[1] == 2 and n.sum() == 4
+    assert accuracy[9] == pytest.approx(0.5)
+    assert ece == pytest.approx((0.45 * 2 + 0.85 * 2) / 4)
+
+
+def test_review_curve_thresholds():
+    arr = analysis.decision_arrays(["1", "2", "3", "4"], ["Include", "Exclude", "Exclude", "Uncertain"],
+                              [0.9, 0.95, 0.6, 0.3], [False] * 4)
+    rows = analysis.np.arange(4)
+    y = analysis.np.array([True, False, True, True])
+    grid = analysis.np.array([0.0, 0.7, 1.0])
+    curve = analysis.review_curve(arr, rows, y, grid)
+    # Eşik 0: yalnız Uncertain incelenir, güveni 0.6 olan Include kaçar
+    assert curve["recall"].tolist() == pytest.approx([2 / 3, 1.0, 1.0])
+    assert curve["workload"].tolist() == pytest.approx([0.25, 0.5, 1.0])
+    assert curve["auto_accuracy"][0] == pytest.approx(2 / 3)
+
+
+def test_read_labels(tmp_path):
+    path = tmp_path / "labels.csv"
+    path.write_text("ID;Etiket\n1;Dahil\n2;exclude\n3;Maybe\n4;?\n", encoding="utf-8")
+    assert analysis.read_labels(path) == {"1": 1, "2": 0, "3": 1}
+
+
+def test_analyze_cli_run(monkeypatch, inputs, capsys):
+    assert _main(monkeypatch, inputs) == 0
+    out = inputs / "out.csv"
+    with out.open(encoding="utf-8-sig", newline="") as f:
+        rows = list(csv.DictReader(line for line in f if not line.startswith("#")))
+    labels = inputs / "labels.csv"
+    labels.write_text("ID,Label\n" + "".join(f"{r['ID']},{r['Karar']}\n" for r in rows),
+                      encoding="utf-8")
+    capsys.readouterr()
+    monkeypatch.setattr(sys, "argv", ["cli.py", "--analyze", str(out), "--labels", str(labels),
+                                      "--compare", str(out)])
+    assert cli.main() == 0
+    report = capsys.readouterr().out
+    assert f"ile uyum ({N_ARTICLES:,} ortak ID): Cohen's κ = 1.000" in report
+    assert "Cohen's κ = 1.000" in report.split("İnsan ile uyum")[1]
+    assert "Önerilen needs_human_review eşiği" in report
+
+
+# ============================================================
+# CACHE
+# ============================================================
+def test_mock_results_not_served_to_real_backend(tmp_path):
+    args = SimpleNamespace(no_cache=False, cache=tmp_path / "cache.sqlite", cache_max_mb=16,
+                           backend="mock")
+    articles = _articles(3)
+    mock_cache = cli.open_cache(args, "gemini-2.5-flash", "p1")
+    mock_cache.put_many([(a, {"id": a.ID, "decision": "Include"}) for a in articles])
+    assert len(mock_cache.get_many(articles)) == 3
+
+    args.backend = "gemini"
+    real_cache = cli.open_cache(args, "gemini-2.5-flash", "p1")
+    assert real_cache.get_many(articles) == {}
+
+
+# ============================================================
+# PREFILTER
+# ============================================================
+def _prefilter_articles():
+    return [
+        cli.Article("1", "Randomized controlled trial", "Human participants were randomized.",
+                    "A", "2020"),
+        cli.Article("2", "Mouse model", "An animal study of mice in a laboratory.", "B", "2021"),
+        cli.Article("3", "Weather patterns", "Rainfall and temperature over decades.", "C", "2022"),
+    ]
+
+
+def _prefilter_criteria():
+    inclusion = cli.code_criteria([{"text": t} for t in INCLUSION.split("\n") if t], "IC")
+    exclusion = cli.code_criteria([{"text": t} for t in EXCLUSION.split("\n") if t], "EC")
+    return inclusion, exclusion
+
+
+def test_prefilter_scores_inclusion_coverage():
+    inclusion, exclusion = _prefilter_criteria()
+    result = cli.score_articles(_prefilter_articles(), inclusion, exclusion)
+    assert result.ids == ["1", "2", "3"]
+    assert result.ic_score("1") > result.ic_score("2") >= result.ic_score("3") == 0
+    assert all(0 <= v <= 1 for v in result.ic)
+    assert exclusion[int(result.best_ec[1])]["code"] == "EC1"
+    assert result.below(0.2) == {"2", "3"}
+
+
+def test_apply_prefilter_excludes_below_threshold():
+    inclusion, exclusion = _prefilter_criteria()
+    articles = _prefilter_articles()
+    result = cli.score_articles(articles, inclusion, exclusion)
+    state = _state(False, len(articles))
+    assert cli.apply_prefilter(state, articles, result, 0.2, exclusion) == 2
+    assert state.prefilter["excluded"] == 2
+    by_id = {r["id"]: r for r in state.results}
+    assert set(by_id) == {"2", "3"}
+    assert {r["decision"] for r in by_id.values()} == {"Exclude"}
+    assert by_id["2"]["matched_exclusion_criteria"] == ["EC1"]
+    assert by_id["3"]["matched_exclusion_criteria"] == []
+    assert by_id["2"]["rationale"].startswith(cli.PREFILTER_TAG)
+
+
+def test_prefilter_cli_run(monkeypatch, inputs):
+    # Sentetik özetler ölçüt terimlerini içermez: hepsi API'ye gitmeden Exclude olur
+    assert _main(monkeypatch, inputs, "--prefilter-threshold", "0.1") == 0
+    with (inputs / "out.csv").open(encoding="utf-8-sig", newline="") as f:
+        rows = list(csv.DictReader(line for line in f if not line.startswith("#")))
+    assert len(rows) == N_ARTICLES
+    assert {r["Karar"] for r in rows} == {"Exclude"}
+    assert all(r["Gerekçe"].startswith(cli.PREFILTER_TAG) for r in rows)
+
+
+# ============================================================
+# HYBRID
+# ============================================================
+def test_take_over_only_when_sync_can_finish():
+    # 1000 makale, 10 makale/dk: sync 100 dk sürer, 60 dk'lık hedefe yetişmez
+    assert not cli.should_take_over(1000, 10, deadline=3600, batch_due=1800, now=3000)
+    assert not cli.should_take_over(1000, 10, deadline=3600, batch_due=7200, now=3500)
+
+
+def test_take_over_waits_for_the_batch_eta():
+    # 100 makale sync'te 10 dk: devralma en geç 3600 - 600 * marj anında başlar
+    assert not cli.should_take_over(100, 10, deadline=3600, batch_due=1800, now=0)
+    assert not cli.should_take_over(100, 10, deadline=3600, batch_due=3200, now=3000)
+    assert cli.should_take_over(100, 10, deadline=3600, batch_due=1800, now=3000)
+    # Batch hedefe yetişmesi beklenmiyorsa son güvenli anda devralınır
+    assert not cli.should_take_over(100, 10, deadline=3600, batch_due=7200, now=0)
+    assert cli.should_take_over(100, 10, deadline=3600, batch_due=7200, now=2900)
+
+
+def test_hybrid_cli_run(monkeypatch, inputs, capsys):
+    extra = ["--mode", "hybrid", "--priority", "10", "--shard-size", "12", "--poll-interval", "0",
+             "--mock", "batch_seconds=0,seed=4"]
+    assert _main(monkeypatch, inputs, *extra) == 0
+    assert "Öncelikli dilim sync taranıyor: 10 makale" in capsys.readouterr().out
+    ids = _output_ids(inputs / "out.csv")
+    assert len(ids) == N_ARTICLES
+    assert len(set(ids)) == N_ARTICLES